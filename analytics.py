@@ -0,0 +1,358 @@
+"""
+Analytics Rollups: time-bucketed aggregates over decision history.
+Updated incrementally as history entries are added, so dashboard queries
+cost O(buckets) instead of a scan over every stored decision. Saves are
+throttled to one per save_interval seconds (and flushed at exit), so a burst
+of decisions does not rewrite rollups.json once per entry. Backfill from
+existing history runs over its columnar segments (rebuild_segments).
+
+With a writer_id (multi-writer history), each writer saves only its own
+increments to rollups.json.<writer>.delta and readers merge rollups.json with
+every delta file; fold_deltas() moves dead writers' deltas into rollups.json.
+prune() records its cutoff in rollups.json, and every reader drops buckets
+older than it, so pruned buckets do not come back from other writers' deltas.
+"""
+
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+
+
+DIMENSIONS = ("agent", "action", "risk", "decision")
+
+_open_stores = weakref.WeakSet()   # flushed once at exit, without pinning stores
+
+
+@atexit.register
+def _flush_open_stores():
+    for store in list(_open_stores):
+        store.flush()
+
+
+class RollupStore:
+    def __init__(self, rollup_file="rollups.json", bucket_seconds=3600, max_paths_per_bucket=50,
+                 save_interval=1.0, writer_id=None):
+        self.rollup_file = rollup_file
+        self.bucket_seconds = bucket_seconds
+        self.max_paths_per_bucket = max_paths_per_bucket
+        self.save_interval = save_interval
+        self.writer_id = writer_id
+        self._own = {}              # multi-writer mode: this writer's increments only
+        self._seen = None           # (file, mtime) signature of the last merge
+        self._dirty = False
+        self._saved_at = 0.0
+        self._pruned_before = None  # buckets starting before this (epoch s) are dropped on read
+        self.buckets = self._load()
+        _open_stores.add(self)
+
+    @property
+    def delta_file(self) -> str:
+        return f"{self.rollup_file}.{self.writer_id.replace(':', '+')}.delta"
+
+    def _delta_files(self) -> list[str]:
+        return glob.glob(glob.escape(self.rollup_file) + ".*.delta")
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("bucket_seconds") == self.bucket_seconds:
+                if path == self.rollup_file:
+                    self._pruned_before = data.get("pruned_before")
+                cutoff = self._pruned_before
+                return {int(k): v for k, v in data.get("buckets", {}).items()
+                        if cutoff is None or int(k) >= cutoff}
+        except Exception:
+            pass
+        return {}
+
+    def _write(self, path: str, buckets: dict):
+        data = {"bucket_seconds": self.bucket_seconds, "buckets": buckets}
+        if path == self.rollup_file and self._pruned_before is not None:
+            data["pruned_before"] = self._pruned_before
+        tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"   # concurrent writers
+        with open(tmp_file, 'w') as f:
+            f.write(json.dumps(data, separators=(",", ":")))   # one-shot: C encoder
+        os.replace(tmp_file, path)
+
+    def _signature(self) -> tuple:
+        sig = []
+        for path in [self.rollup_file] + sorted(self._delta_files()):
+            try:
+                sig.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+        return tuple(sig)
+
+    def _load(self) -> dict:
+        buckets = self._read(self.rollup_file)
+        if self.writer_id is not None:
+            self._seen = self._signature()
+            for path in self._delta_files():
+                if path != self.delta_file:
+                    _merge(buckets, self._read(path))
+            _merge(buckets, self._own)
+        return buckets
+
+    def _refresh(self):
+        """Multi-writer mode: re-merge when another writer has saved since the last merge."""
+        if self.writer_id is not None and self._signature() != self._seen:
+            self.flush()
+            self.buckets = self._load()
+
+    def _save(self):
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if self.writer_id is None:
+            self._write(self.rollup_file, self.buckets)
+        else:
+            self._write(self.delta_file, self._own)
+
+    # ─────────────── Ingestion ───────────────
+
+    def record(self, entry: dict, save: bool = True):
+        """Fold a single history entry into its time bucket."""
+        self._apply(self.buckets, entry)
+        if self.writer_id is not None:
+            self._apply(self._own, entry)
+        self._dirty = True
+        if save and time.monotonic() - self._saved_at >= self.save_interval:
+            self._save()
+
+    def _apply(self, buckets: dict, entry: dict):
+        bucket = self._bucket_for(buckets, entry.get("timestamp"))
+        bucket["total"] += 1
+        for dim in DIMENSIONS:
+            value = entry.get(dim) or "N/A"
+            counts = bucket[dim]
+            counts[value] = counts.get(value, 0) + 1
+
+        agent = entry.get("agent") or "N/A"
+        path = entry.get("path") or "N/A"
+        if entry.get("decision") == "BLOCKED":
+            _incr(bucket["blocked_by_agent"], agent)
+            _incr(bucket["blocked_paths"], path)
+            if len(bucket["blocked_paths"]) > 2 * self.max_paths_per_bucket:
+                bucket["blocked_paths"] = _top(bucket["blocked_paths"], self.max_paths_per_bucket)
+        if entry.get("risk") == "HIGH":
+            _incr(bucket["high_by_prefix"], path_prefix(path))
+
+    def flush(self):
+        """Write pending changes held back by the save throttle."""
+        if self._dirty:
+            self._save()
+
+    def rebuild(self, entries: list):
+        """Recompute all buckets from raw history (used once, for backfill)."""
+        buckets = {}
+        for entry in entries:
+            self._apply(buckets, entry)
+        self._replace(buckets)
+
+    def rebuild_segments(self, segments):
+        """Recompute all buckets from columnar history (ColumnSegment batches), for backfill."""
+        buckets = {}
+        for segment in segments:
+            _merge(buckets, self._segment_buckets(segment))
+        for bucket in buckets.values():
+            if len(bucket["blocked_paths"]) > 2 * self.max_paths_per_bucket:
+                bucket["blocked_paths"] = _top(bucket["blocked_paths"], self.max_paths_per_bucket)
+        self._replace(buckets)
+
+    def _replace(self, buckets: dict):
+        self.buckets = buckets
+        self._write(self.rollup_file, self.buckets)
+        self._own = {}
+        self._seen = self._signature() if self.writer_id is not None else None
+
+    def _segment_buckets(self, segment) -> dict:
+        """Buckets for one segment, counted per (bucket, dictionary code) with NumPy."""
+        import numpy as np
+        keys, rows_bucket = np.unique(self._bucket_keys(segment.ts), return_inverse=True)
+        buckets = {int(key): _empty_bucket() for key in keys}
+        for key, n in zip(keys, np.bincount(rows_bucket, minlength=len(keys))):
+            buckets[int(key)]["total"] = int(n)
+
+        def count(field, column, rows=None, label=lambda value: value):
+            names = [label(_value(v)) for v in segment.dicts[column]]
+            codes, where = segment.codes[column], rows_bucket
+            if rows is not None:
+                codes, where = codes[rows], where[rows]
+            pairs, counts = np.unique(where.astype(np.int64) * len(names) + codes, return_counts=True)
+            for pair, n in zip(pairs.tolist(), counts.tolist()):
+                index, code = divmod(pair, len(names))
+                target = buckets[int(keys[index])][field]
+                target[names[code]] = target.get(names[code], 0) + n
+
+        for dim in DIMENSIONS:
+            count(dim, dim)
+        blocked = segment.mask(decision="BLOCKED")
+        count("blocked_by_agent", "agent", blocked)
+        count("blocked_paths", "path", blocked)
+        count("high_by_prefix", "path", segment.mask(risk="HIGH"), path_prefix)
+        return buckets
+
+    def _bucket_keys(self, ts):
+        """Bucket start (epoch seconds) per archive timestamp, matching _bucket_for."""
+        import numpy as np
+        from history_archive import NO_TIMESTAMP
+        seconds = np.full(len(ts), int(datetime.now().timestamp()), dtype=np.int64)
+        stamped = ts != NO_TIMESTAMP
+        if stamped.any():
+            # Archive timestamps are naive local time: shift by the UTC offset of each hour
+            naive = ts[stamped] // 10**6
+            hours, inverse = np.unique(naive // 3600, return_inverse=True)
+            offsets = np.array([h * 3600 - int((_EPOCH + timedelta(hours=h)).timestamp())
+                                for h in hours.tolist()], dtype=np.int64)
+            seconds[stamped] = naive - offsets[inverse]
+        return seconds // self.bucket_seconds * self.bucket_seconds
+
+    def prune(self, before: datetime):
+        """Drop buckets that end before the retention cutoff."""
+        cutoff = before.timestamp() - self.bucket_seconds
+        stale = False
+        for buckets in (self.buckets, self._own):
+            for key in [key for key in buckets if key < cutoff]:
+                del buckets[key]
+                stale = True
+        if self.writer_id is not None:
+            # rollups.json holds folded deltas and the cutoff every reader applies
+            with open(self.rollup_file + ".lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                base = self._read(self.rollup_file)
+                if self._pruned_before is None or cutoff > self._pruned_before:
+                    self._pruned_before = cutoff
+                    self._write(self.rollup_file, {k: v for k, v in base.items() if k >= cutoff})
+        else:
+            self._pruned_before = max(cutoff, self._pruned_before or cutoff)
+        if stale:
+            self._save()
+
+    def fold_deltas(self, is_dead) -> int:
+        """
+        Merge delta files of writers for which is_dead(writer_id) holds into rollups.json
+        (under an flock, claimed by rename). Returns the number of files folded.
+        """
+        prefix = self.rollup_file + "."
+        own = self.delta_file if self.writer_id is not None else None
+        claimed = []
+        for path in self._delta_files():
+            writer = path[len(prefix):-len(".delta")].replace("+", ":")
+            if path == own or not is_dead(writer):
+                continue
+            target = f"{path}.{os.getpid()}.folding"
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        if not claimed:
+            return 0
+        with open(self.rollup_file + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            base = self._read(self.rollup_file)
+            for path in claimed:
+                _merge(base, self._read(path))
+            self._write(self.rollup_file, base)
+            for path in claimed:
+                os.remove(path)
+        return len(claimed)
+
+    def _bucket_for(self, buckets: dict, timestamp: str | None) -> dict:
+        try:
+            epoch = datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            epoch = datetime.now().timestamp()
+        key = int(epoch // self.bucket_seconds) * self.bucket_seconds
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _empty_bucket()
+        return bucket
+
+    # ─────────────── Queries ───────────────
+
+    def _window(self, since: datetime | None = None, until: datetime | None = None):
+        self._refresh()
+        lo = since.timestamp() - self.bucket_seconds if since else None
+        hi = until.timestamp() if until else None
+        for key in sorted(self.buckets):
+            if lo is not None and key <= lo:
+                continue
+            if hi is not None and key >= hi:
+                continue
+            yield key, self.buckets[key]
+
+    def total(self, since: datetime | None = None, until: datetime | None = None) -> int:
+        return sum(b["total"] for _, b in self._window(since, until))
+
+    def counts(self, field: str, since: datetime | None = None,
+               until: datetime | None = None) -> dict:
+        """
+        Totals for one rollup field over the window, e.g. counts("decision").
+        field: any of DIMENSIONS, 'blocked_by_agent', 'blocked_paths' or 'high_by_prefix'.
+        """
+        totals = {}
+        for _, bucket in self._window(since, until):
+            for key, n in bucket.get(field, {}).items():
+                totals[key] = totals.get(key, 0) + n
+        return totals
+
+    def series(self, field: str, since: datetime | None = None,
+               until: datetime | None = None) -> list[tuple[str, dict]]:
+        """Per-bucket counts for one field: [(bucket_start_iso, {key: count}), ...] oldest first."""
+        return [
+            (datetime.fromtimestamp(key).isoformat(timespec="minutes"), dict(bucket.get(field, {})))
+            for key, bucket in self._window(since, until)
+        ]
+
+    def top_blocked_paths(self, n: int = 10, since: datetime | None = None) -> list[tuple[str, int]]:
+        return sorted(self.counts("blocked_paths", since).items(), key=lambda kv: -kv[1])[:n]
+
+
+def path_prefix(path: str, depth: int = 2) -> str:
+    """Leading path components used for prefix rollups ('src -> dst' uses src)."""
+    path = path.split(" -> ", 1)[0].strip("/")
+    return "/".join(path.split("/")[:depth]) or "N/A"
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _value(value: str) -> str:
+    """An archive dictionary value as _apply sees it (absent or empty is 'N/A')."""
+    from history_archive import MISSING
+    return "N/A" if value in (MISSING, "") else str(value)
+
+
+def _empty_bucket() -> dict:
+    bucket = {"total": 0, "blocked_by_agent": {}, "blocked_paths": {}, "high_by_prefix": {}}
+    for dim in DIMENSIONS:
+        bucket[dim] = {}
+    return bucket
+
+
+def _merge(into: dict, buckets: dict):
+    """Add every count in buckets to into (bucket-wise, key-wise)."""
+    for key, bucket in buckets.items():
+        target = into.setdefault(key, _empty_bucket())
+        target["total"] += bucket.get("total", 0)
+        for field, counts in bucket.items():
+            if field == "total":
+                continue
+            merged = target.setdefault(field, {})
+            for value, n in counts.items():
+                merged[value] = merged.get(value, 0) + n
+
+
+def _incr(counts: dict, key: str):
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _top(counts: dict, n: int) -> dict:
+    return dict(sorted(counts.items(), key=lambda kv: -kv[1])[:n])
@@ -10,8 +10,10 @@ import os
 import io
 import sys
 import time
+from datetime import datetime, timedelta
 
 from supervisor import Supervisor
+from workspace_snapshot import format_summary
 
 # ─────────────────────────────────────────────────────────────
 # Page Config (MUST be first Streamlit call)
@@ -383,12 +385,41 @@ with detail_col:
                 """, unsafe_allow_html=True)
                 for line in r.get("explanation", []):
                     st.caption(f"• {line}")
+                if r.get("served_by"):
+                    st.caption(f"↳ Coalesced: served by {r['served_by']}")
                 if r.get("exec_output"):
                     st.code(r["exec_output"], language=None)
+                if r.get("diff"):
+                    diff = r["diff"]
+                    (st.caption if diff["verified"] else st.error)(f"Changes: {format_summary(diff)}")
+                    if diff["changes"]:
+                        st.caption(" · ".join(diff["changes"]) + (f" (+{diff['more']} more)" if diff.get("more") else ""))
                 st.markdown("---")
     else:
         st.markdown('<span style="color:#484f58; font-size:13px">Run a command to see decision details here.</span>', unsafe_allow_html=True)
 
+# ─────────────────────────────────────────────────────────────
+# Row 3b: Background Jobs (polled while any job is active)
+# ─────────────────────────────────────────────────────────────
+jobs = sup.jobs.list_jobs(limit=20)
+if jobs:
+    st.markdown("---")
+    st.markdown('<div class="section-header">Background Jobs</div>', unsafe_allow_html=True)
+    for job in jobs:
+        action = job["action"]
+        target = action.get("path") or f"{action.get('source', '')} → {action.get('dest', '')}"
+        job_col, ctl_col = st.columns([5, 1])
+        with job_col:
+            st.markdown(f"`{job['id']}` **{job['status'].upper()}** — `{job['agent']}` {action.get('action')} `{target}`")
+            if job["status"] in ("queued", "running"):
+                st.progress(job["progress"])
+            elif job["message"]:
+                st.caption(job["message"])
+        with ctl_col:
+            if job["status"] in ("queued", "running") and st.button("Cancel", key=f"cancel_{job['id']}"):
+                sup.jobs.cancel(job["id"])
+                st.rerun()
+
 # ─────────────────────────────────────────────────────────────
 # Row 4: Execution Timeline
 # ─────────────────────────────────────────────────────────────
@@ -396,12 +427,11 @@ st.markdown("---")
 st.markdown('<div class="section-header">Live Execution Timeline</div>', unsafe_allow_html=True)
 
 try:
-    with open("history.json", "r") as f:
-        history_data = json.load(f)
+    history_data = sup.history.get_all(limit=500)  # newest first, spans hot ring and archive
 
     if history_data:
         import pandas as pd
-        df = pd.DataFrame(history_data[::-1])  # newest first
+        df = pd.DataFrame(history_data)
         # Normalize columns
         for col in ["timestamp", "command", "agent", "action", "path", "risk", "decision", "reason"]:
             if col not in df.columns:
@@ -413,3 +443,117 @@ try:
         st.markdown('<span style="color:#484f58; font-size:13px">No history records yet.</span>', unsafe_allow_html=True)
 except Exception:
     st.markdown('<span style="color:#484f58; font-size:13px">History file not found — run a command to generate records.</span>', unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────────────────────
+# Row 5: Decision Analytics (served from rollups, not raw rows)
+# ─────────────────────────────────────────────────────────────
+st.markdown("---")
+st.markdown('<div class="section-header">Decision Analytics</div>', unsafe_allow_html=True)
+
+rollups = sup.history.rollups
+window_label = st.selectbox("Window", ["Last 24 hours", "Last 7 days", "All time"], key="analytics_window")
+window_hours = {"Last 24 hours": 24, "Last 7 days": 24 * 7}.get(window_label)
+since = datetime.now() - timedelta(hours=window_hours) if window_hours else None
+
+if rollups.total(since):
+    import pandas as pd
+
+    decisions = rollups.counts("decision", since)
+    risks     = rollups.counts("risk", since)
+    an_t, an_a, an_b, an_h = st.columns(4)
+    an_t.metric("Decisions", rollups.total(since))
+    an_a.metric("Allowed",   decisions.get("ALLOWED", 0))
+    an_b.metric("Blocked",   decisions.get("BLOCKED", 0))
+    an_h.metric("High Risk", risks.get("HIGH", 0))
+
+    chart_col, table_col = st.columns([2, 1])
+    with chart_col:
+        st.caption("Blocked actions per agent per hour")
+        series = rollups.series("blocked_by_agent", since)
+        if any(counts for _, counts in series):
+            blocked_df = pd.DataFrame({ts: counts for ts, counts in series}).T.fillna(0)
+            st.bar_chart(blocked_df)
+        else:
+            st.caption("No blocked actions in this window.")
+    with table_col:
+        st.caption("Top blocked paths")
+        top_paths = rollups.top_blocked_paths(10, since)
+        if top_paths:
+            st.dataframe(pd.DataFrame(top_paths, columns=["Path", "Blocked"]),
+                         use_container_width=True, hide_index=True)
+        st.caption("HIGH-risk attempts by path prefix")
+        high_prefixes = sorted(rollups.counts("high_by_prefix", since).items(), key=lambda kv: -kv[1])
+        if high_prefixes:
+            st.dataframe(pd.DataFrame(high_prefixes, columns=["Prefix", "Attempts"]),
+                         use_container_width=True, hide_index=True)
+else:
+    st.markdown('<span style="color:#484f58; font-size:13px">No decisions recorded in this window.</span>', unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────────────────────
+# Row 5b: Audit Log (streamed from logs.txt and its compressed archive)
+# ─────────────────────────────────────────────────────────────
+with st.expander("📜 Audit Log"):
+    from log_archive import tail
+    from archive_manifest import SegmentManifest
+
+    log_archive_dir = (sup.delegation.policies.get("logging") or {}).get("archive_dir", "logs_archive")
+    log_filter, log_lines = st.columns([3, 1])
+    with log_filter:
+        log_contains = st.text_input("Filter", key="log_filter", placeholder="e.g. BLOCKED or CleanerAgent")
+    with log_lines:
+        log_limit = st.number_input("Lines", min_value=10, max_value=5000, value=200, step=50, key="log_limit")
+    lines = tail(int(log_limit), archive_dir=log_archive_dir, contains=log_contains or None)
+    if lines:
+        st.code("\n".join(lines), language="log")
+    else:
+        st.caption("No log lines found.")
+    segments = SegmentManifest(log_archive_dir).records().values()
+    if segments:
+        stored = sum(s["bytes"] for s in segments)
+        raw = sum(s.get("raw_bytes", s["bytes"]) for s in segments)
+        st.caption(f"{len(segments)} archived segment(s): {raw / 2**20:.1f} MB of log text "
+                   f"stored in {stored / 2**20:.1f} MB")
+
+# ─────────────────────────────────────────────────────────────
+# Row 6: Profiling (captures the next commands run from the sidebar)
+# ─────────────────────────────────────────────────────────────
+st.markdown("---")
+with st.expander("🩺 Profiling", expanded=sup.profiler.armed):
+    st.caption(sup.profiler.status())
+    prof_mode, prof_n, prof_slow, prof_ctl = st.columns([2, 1, 1, 1])
+    with prof_mode:
+        mode = st.selectbox("Capture", ["cpu", "sample", "memory"], key="profile_mode",
+                            help="cpu: cProfile (.pstats) · sample: stack samples (.folded) · memory: tracemalloc diffs")
+    with prof_n:
+        n_commands = st.number_input("Next N commands", min_value=1, max_value=100, value=1, key="profile_n")
+    with prof_slow:
+        slow_ms = st.number_input("Slow threshold (ms)", min_value=0, value=int(sup.profiler.slow_ms or 0),
+                                  key="profile_slow")
+    with prof_ctl:
+        if st.button("Arm", key="profile_arm"):
+            if mode == "memory":
+                sup.profiler.memory(n_commands)
+            else:
+                sup.profiler.profile(mode, n_commands)
+            sup.profiler.slow(slow_ms)
+            st.rerun()
+        if st.button("Off", key="profile_off"):
+            sup.profiler.off()
+            st.rerun()
+
+    captures = list(reversed(sup.profiler.captures))
+    if captures:
+        for i, cap in enumerate(captures[:10]):
+            cap_col, dl_col = st.columns([5, 1])
+            cap_col.markdown(f"**{cap['kind']}** `{cap['command']}` — {cap['ms']} ms · `{cap['file']}`")
+            if os.path.exists(cap["file"]):
+                with open(cap["file"], "rb") as f:
+                    dl_col.download_button("Download", f.read(), file_name=os.path.basename(cap["file"]),
+                                           key=f"profile_dl_{i}_{cap['file']}")
+    else:
+        st.caption("No captures yet.")
+
+# Keep polling job status until background work finishes
+if sup.jobs.active():
+    time.sleep(1)
+    st.rerun()
@@ -0,0 +1,107 @@
+"""
+Archive Manifest: index of the immutable segment files in an archive directory.
+
+manifest.json maps each segment file name to its row count, time range, stored
+size and SHA-256. Readers use it to skip segments outside a time range without
+opening them. Backups use it to copy only segments they have not seen, and
+verify() checks that archived files are unchanged since they were written.
+
+The files are the source of truth. Records of missing files are ignored, and
+a segment the manifest does not know is described and recorded on demand. A
+segment whose size no longer matches its record is described again for
+reading but not re-recorded, so verify() keeps reporting it. Concurrent
+writers can therefore cost a re-describe, never a wrong answer.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def overlaps(record: dict, since_us: int | None, until_us: int | None) -> bool:
+    """Whether a record's [first_us, last_us] range can hold rows in [since_us, until_us)."""
+    first, last = record.get("first_us"), record.get("last_us")
+    if first is None or last is None:
+        return True   # unknown or partly unstamped: must be read
+    return (since_us is None or last >= since_us) and (until_us is None or first < until_us)
+
+
+class SegmentManifest:
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.path = os.path.join(archive_dir, MANIFEST_NAME)
+        self._records = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def records(self) -> dict:
+        """name -> record, re-read whenever another process has rewritten the manifest."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'r') as f:
+                    self._records = json.load(f)
+            except (OSError, ValueError):
+                self._records = {}
+            self._mtime = mtime
+        return self._records
+
+    def get(self, path: str, describe) -> dict:
+        """Record of a segment file; describe(path) builds its fields when missing or stale."""
+        record = self.records().get(os.path.basename(path))
+        if record is None:
+            return self.put(path, describe(path))
+        if record.get("bytes") != os.path.getsize(path):
+            return dict(describe(path), bytes=os.path.getsize(path))   # altered: left for verify()
+        return record
+
+    def put(self, path: str, fields: dict) -> dict:
+        """Record a segment file (adds its stored size and SHA-256) and return the record."""
+        record = dict(fields, bytes=os.path.getsize(path), sha256=file_sha256(path))
+        with self._lock:
+            records = dict(self.records())
+            records[os.path.basename(path)] = record
+            self._save(records)
+        return record
+
+    def remove(self, path: str):
+        with self._lock:
+            records = dict(self.records())
+            if records.pop(os.path.basename(path), None) is not None:
+                self._save(records)
+
+    def _save(self, records: dict):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(records, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._records, self._mtime = records, os.stat(self.path).st_mtime_ns
+
+    def verify(self, paths: list[str]) -> list[tuple[str, str]]:
+        """(file name, problem) for every segment that is unrecorded, missing or altered."""
+        records = self.records()
+        names = {os.path.basename(p): p for p in paths}
+        problems = [(name, "missing") for name in sorted(set(records) - set(names))]
+        for name, path in sorted(names.items()):
+            record = records.get(name)
+            if record is None:
+                problems.append((name, "not in manifest"))
+            elif record.get("bytes") != os.path.getsize(path) or record.get("sha256") != file_sha256(path):
+                problems.append((name, "checksum mismatch"))
+        return problems
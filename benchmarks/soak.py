@@ -0,0 +1,603 @@
+"""
+Soak benchmark: drives Supervisor with a simulated agent fleet at a target rate
+inside a throwaway sandbox, and reports latency, throughput, memory and
+history/log growth over time.
+
+The run happens in a temp directory holding a copy of policies.json (plus one
+entry per synthetic agent) and a generated workspace/ tree, so nothing in the
+repository is touched. Each worker process owns one Supervisor(echo=False), as
+one CLI or dashboard process would, and issues its share of the fleet's
+commands on an open-loop schedule: latency is measured from the time a command
+was due, so a stalled Supervisor shows up as latency instead of a lower rate.
+Files the fleet deletes or moves away are put back (untimed) before they are
+needed again, keeping the tree in a steady state for long runs.
+
+Fleet profiles:
+  cleaner    CleanerAgent deletes files under workspace/temp
+  organizer  OrganizerAgent moves files between workspace/inbox and
+             workspace/sorted, and creates files
+  monitor    MonitorAgent reads status / previews of workspace directories
+  synthetic  SynthAgentNN (one policy entry each, scoped to workspace/synth/NN)
+             creates, reads, moves and deletes its own files
+A --blocked share of commands target paths or actions outside the agent's scope.
+
+Reports (JSON, one row per --interval plus a summary) go to --out and can be
+compared with --compare:
+
+Usage:
+    python benchmarks/soak.py [--duration 2h] [--rate 50] [--fleet cleaner=1 organizer=1 monitor=2 synthetic=4]
+                              [--workers 1] [--interval 60] [--dirs 20] [--files 50] [--file-bytes 1024]
+                              [--backend shards] [--simulate] [--out soak_reports]
+    python benchmarks/soak.py --compare soak_reports/old.json soak_reports/new.json
+"""
+
+import argparse
+import heapq
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from planner import Planner  # noqa: E402
+
+
+PROFILES = ("cleaner", "organizer", "monitor", "synthetic")
+AGENTS = {"cleaner": "CleanerAgent", "organizer": "OrganizerAgent", "monitor": "MonitorAgent"}
+SYNTHETIC_LIMITS = {"actions_per_sec": 20, "burst": 40, "max_concurrent": 2, "weight": 1, "max_wait_seconds": 1}
+# Files the soak run grows; sizes are sampled every interval
+GROWTH_FILES = {
+    "logs":     ["logs.txt", "logs_archive"],
+    "history":  ["history.json", "history_shards", "history_archive", "rollups.json", "history.db",
+                 "history.db-wal", "history.db-shm"],
+}
+
+
+# ─────────────── Latency histogram ───────────────
+
+class Histogram:
+    """Log-bucketed latency histogram (2% resolution): constant memory over hours of samples."""
+
+    BASE_MS = 0.01
+    GROWTH = 1.02
+
+    def __init__(self, buckets: dict | None = None):
+        self.buckets = Counter({int(k): v for k, v in (buckets or {}).items()})
+
+    def add(self, ms: float):
+        self.buckets[max(0, math.ceil(math.log(max(ms, self.BASE_MS) / self.BASE_MS, self.GROWTH)))] += 1
+
+    def update(self, samples):
+        for ms in samples:
+            self.add(ms)
+
+    def percentile(self, q: float) -> float | None:
+        total = sum(self.buckets.values())
+        if not total:
+            return None
+        rank, seen = q / 100 * total, 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return round(self.BASE_MS * self.GROWTH ** bucket, 3)
+        return None
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Exact p50/p90/p99/p99.9/max of one interval's samples (ms)."""
+    if not samples:
+        return {"p50": None, "p90": None, "p99": None, "p999": None, "max": None}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 3)  # noqa: E731
+    return {"p50": pick(50), "p90": pick(90), "p99": pick(99), "p999": pick(99.9), "max": round(ordered[-1], 3)}
+
+
+# ─────────────── Sandbox ───────────────
+
+def build_sandbox(workdir: str, args, synthetic: int):
+    """Copy policies.json (plus synthetic agents) into workdir and generate the workspace tree."""
+    with open(os.path.join(REPO_ROOT, "policies.json"), 'r') as f:
+        policies = json.load(f)
+    for n in range(synthetic):
+        policies["agents"][_synthetic_name(n)] = {
+            "allowed_actions": ["create", "read", "move", "delete"],
+            "allowed_paths": [f"workspace/synth/{n:02d}"],
+            "limits": dict(SYNTHETIC_LIMITS),
+        }
+    history_cfg = policies.setdefault("history", {})
+    if args.backend:
+        history_cfg["backend"] = args.backend
+    if args.maintenance is not None:
+        history_cfg["maintenance_interval_seconds"] = args.maintenance
+    with open(os.path.join(workdir, "policies.json"), 'w') as f:
+        json.dump(policies, f, indent=4)
+
+    payload = b"x" * args.file_bytes
+    for d in range(args.dirs):
+        for root in ("temp", "inbox"):
+            os.makedirs(os.path.join(workdir, "workspace", root, f"d{d:03d}"), exist_ok=True)
+        os.makedirs(os.path.join(workdir, "workspace", "sorted", f"d{d:03d}"), exist_ok=True)
+        for i in range(args.files):
+            for rel in (f"temp/d{d:03d}/f{i:04d}.tmp", f"inbox/d{d:03d}/f{i:04d}.txt"):
+                with open(os.path.join(workdir, "workspace", rel), 'wb') as f:
+                    f.write(payload)
+    for n in range(synthetic):
+        os.makedirs(os.path.join(workdir, "workspace", "synth", f"{n:02d}"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "system"), exist_ok=True)
+    with open(os.path.join(workdir, "system", "config"), 'w') as f:
+        f.write("do not touch\n")
+    return policies
+
+
+def _synthetic_name(n: int) -> str:
+    return f"SynthAgent{n:02d}"
+
+
+def _tree_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass   # rotated or compacted while walking
+    return total
+
+
+def growth(workdir: str) -> dict:
+    return {f"{kind}_bytes": sum(_tree_bytes(os.path.join(workdir, name)) for name in names
+                                 if os.path.exists(os.path.join(workdir, name)))
+            for kind, names in GROWTH_FILES.items()}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ─────────────── Fleet ───────────────
+
+class FleetPlanner(Planner):
+    """Plans 'soak <agent> <action> <path> [<dest> | mode=<read_mode>]' commands; others as usual."""
+
+    def parse(self, user_input: str) -> list[dict]:
+        parts = user_input.split()
+        if parts[:1] != ["soak"] or len(parts) < 4:
+            return super().parse(user_input)
+        _, agent, action_type, path, *rest = parts
+        if action_type == "move":
+            return [{"agent": agent, "action": "move", "source": path, "dest": rest[0] if rest else ""}]
+        action = {"agent": agent, "action": action_type, "path": path}
+        if rest and rest[0].startswith("mode="):
+            action["read_mode"] = rest[0][len("mode="):]
+        return [action]
+
+
+class Member:
+    """One simulated fleet member: generates its profile's commands and keeps its files in place."""
+
+    def __init__(self, profile: str, index: int, args, seed: int):
+        self.profile = profile
+        self.agent = AGENTS.get(profile) or _synthetic_name(index)
+        self.scope = f"workspace/synth/{index:02d}"
+        self.dirs, self.files, self.blocked = args.dirs, args.files, args.blocked
+        self.payload = b"x" * args.file_bytes
+        self.rng = random.Random(seed)
+
+    def _pick(self, root: str, ext: str) -> str:
+        return f"workspace/{root}/d{self.rng.randrange(self.dirs):03d}/f{self.rng.randrange(self.files):04d}{ext}"
+
+    def _ensure(self, path: str):
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.payload)
+
+    def next_command(self) -> str:
+        if self.rng.random() < self.blocked:
+            return self._out_of_scope()
+        rng = self.rng
+        if self.profile == "cleaner":
+            path = self._pick("temp", ".tmp")
+            self._ensure(path)
+            return f"soak {self.agent} delete {path}"
+        if self.profile == "organizer":
+            if rng.random() < 0.2:
+                return f"soak {self.agent} create workspace/inbox/new/n{rng.randrange(self.files):04d}.txt"
+            src = self._pick("inbox", ".txt")
+            dst = src.replace("/inbox/", "/sorted/", 1)
+            if not os.path.exists(src):
+                src, dst = dst, src   # already sorted: move it back
+                self._ensure(src)
+            return f"soak {self.agent} move {src} {dst}"
+        if self.profile == "monitor":
+            mode = "preview" if rng.random() < 0.3 else "status"
+            root = rng.choice(("temp", "inbox", "sorted"))
+            return f"soak {self.agent} read workspace/{root}/d{rng.randrange(self.dirs):03d} mode={mode}"
+        # synthetic: a mix of everything inside its own scope
+        path = f"{self.scope}/f{rng.randrange(self.files):04d}.dat"
+        kind = rng.choices(("create", "read", "move", "delete"), weights=(3, 4, 2, 1))[0]
+        if kind == "create":
+            return f"soak {self.agent} create {path}"
+        self._ensure(path)
+        if kind == "move":
+            return f"soak {self.agent} move {path} {self.scope}/moved/{os.path.basename(path)}"
+        if kind == "read":
+            return f"soak {self.agent} read {self.scope} mode=status"
+        return f"soak {self.agent} delete {path}"
+
+    def _out_of_scope(self) -> str:
+        if self.profile == "monitor":
+            return f"soak {self.agent} delete workspace/temp/d000/f0000.tmp"   # action not allowed
+        return f"soak {self.agent} delete system/config"                         # outside every scope
+
+
+def worker(index: int, members: list[tuple[int, str, int]], args, workdir: str, started: float, queue):
+    """
+    Run one Supervisor for this worker's share of the fleet, given as (position in the
+    fleet, profile, index) so members stay evenly staggered, and report each interval on queue.
+    """
+    os.chdir(workdir)
+    from supervisor import Supervisor
+
+    sup = Supervisor(echo=False)
+    sup.planner = FleetPlanner()
+    # Keep logs.txt, drop the console echo: the soak report is the only stdout
+    sup.logger.logger.handlers = [h for h in sup.logger.logger.handlers if getattr(h, "stream", None) is not sys.stdout]
+    fleet = [Member(profile, n, args, seed=args.seed * 1000 + pos) for pos, profile, n in members]
+    period = args.members / args.rate   # each member's share of the target rate
+    due = [(started + period * pos / args.members, k) for k, (pos, _, _) in enumerate(members)]
+    heapq.heapify(due)
+    deadline = started + args.duration
+
+    def interval_report(k, latency, service, decisions, missed=0):
+        queue.put({"worker": index, "interval": k, "latency": latency, "service": service,
+                   "decisions": dict(decisions), "missed": missed, "rss_bytes": rss_bytes()})
+
+    # Commands count in the interval they complete in, so a saturated Supervisor
+    # shows as throughput below target (and latency growing with the backlog)
+    last = max(0, math.ceil(args.duration / args.interval) - 1)   # commands finishing late count in it
+    k, latency, service, decisions = 0, [], [], Counter()
+    while due and due[0][0] < deadline and time.perf_counter() < deadline:
+        at, m = heapq.heappop(due)
+        wait = at - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        while k < last and time.perf_counter() >= started + (k + 1) * args.interval:
+            interval_report(k, latency, service, decisions)
+            k, latency, service, decisions = k + 1, [], [], Counter()
+        command = fleet[m].next_command()
+        began = time.perf_counter()
+        try:
+            results = sup.process(command, simulation_mode=args.simulate)
+        except Exception:
+            results = None
+        done = time.perf_counter()
+        latency.append((done - at) * 1000)
+        service.append((done - began) * 1000)
+        for result in results if results is not None else [{"decision": "ERROR"}]:
+            decisions[_outcome(result)] += 1
+        heapq.heappush(due, (at + period, m))
+    # Commands that fell due before the deadline but were never issued
+    missed = sum(math.ceil((deadline - at) / period) for at, _ in due if at < deadline)
+    interval_report(k, latency, service, decisions, missed)
+    sup.history.flush()
+    sup.history.stop_maintenance()
+    queue.put({"worker": index, "done": True})
+
+
+def _outcome(result: dict) -> str:
+    if result["decision"] == "BLOCKED":
+        reasons = getattr(result["explanation"], "reasons", ())
+        if any(isinstance(r, tuple) and r[0] == "explain.quota_failed" for r in reasons):
+            return "RATE_LIMITED"
+    return result["decision"]
+
+
+def fleet_members(fleet: dict) -> list[tuple[str, int]]:
+    """(profile, index) per member; synthetic members get one agent each, the others share theirs."""
+    members = []
+    for profile in PROFILES:
+        members += [(profile, n) for n in range(fleet.get(profile, 0))]
+    return members
+
+
+# ─────────────── Run ───────────────
+
+def run(args) -> dict:
+    members = fleet_members(args.fleet)
+    args.members = len(members)
+    workdir = tempfile.mkdtemp(prefix="armoriq-soak-")
+    try:
+        policies = build_sandbox(workdir, args, args.fleet.get("synthetic", 0))
+        report = {"run": _run_info(args, policies, workdir), "intervals": []}
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        started = time.perf_counter() + 1.0 + 0.5 * args.workers   # let the workers start up first
+        positioned = [(pos, profile, n) for pos, (profile, n) in enumerate(members)]
+        procs = [ctx.Process(target=worker, args=(w, positioned[w::args.workers], args, workdir, started, queue),
+                             name=f"soak-worker-{w}") for w in range(args.workers)]
+        for proc in procs:
+            proc.start()
+
+        print(f"Soak run: {args.members} member(s) over {args.workers} worker(s), target {args.rate:g} cmd/s, "
+              f"{args.duration:g}s in {workdir}")
+        print(f"{'t(s)':>7} | {'cmd/s':>7} | {'p50':>8} | {'p99':>8} | {'max':>8} | {'rss MB':>7} | "
+              f"{'logs KB':>8} | {'hist KB':>8} | decisions")
+        pending, done = {}, 0
+        totals, service_totals, outcomes = Histogram(), Histogram(), Counter()
+        while done < args.workers:
+            msg = queue.get()
+            if msg.get("done"):
+                done += 1
+                continue
+            pending.setdefault(msg["interval"], {})[msg["worker"]] = msg
+            for k in sorted(pending):
+                # An interval is complete once every worker has reported it (or moved past it)
+                if len(pending[k]) < args.workers - done:
+                    break
+                row = _interval_row(k, pending.pop(k), args, workdir)
+                totals.update(row.pop("_latency"))
+                service_totals.update(row.pop("_service"))
+                outcomes.update(row["decisions"])
+                report["intervals"].append(row)
+                _print_row(row)
+        for k in sorted(pending):
+            row = _interval_row(k, pending[k], args, workdir)
+            totals.update(row.pop("_latency"))
+            service_totals.update(row.pop("_service"))
+            outcomes.update(row["decisions"])
+            report["intervals"].append(row)
+            _print_row(row)
+        for proc in procs:
+            proc.join()
+
+        report["final_growth"] = growth(workdir)
+        report["summary"] = _summary(report, totals, service_totals, outcomes, args)
+        return report
+    finally:
+        if args.keep:
+            print(f"Sandbox kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _interval_row(k: int, msgs: dict, args, workdir: str) -> dict:
+    latency = [ms for msg in msgs.values() for ms in msg["latency"]]
+    service = [ms for msg in msgs.values() for ms in msg["service"]]
+    decisions = Counter()
+    for msg in msgs.values():
+        decisions.update(msg["decisions"])
+    span = min(args.interval, args.duration - k * args.interval)   # the last interval may be short
+    return {
+        "t":            round(k * args.interval + span, 1),
+        "commands":     len(latency),
+        "throughput":   round(len(latency) / span, 2) if span > 0 else 0.0,
+        "latency_ms":   percentiles(latency),
+        "service_ms":   percentiles(service),
+        "decisions":    dict(decisions),
+        "missed":       sum(msg["missed"] for msg in msgs.values()),
+        "rss_bytes":    sum(msg["rss_bytes"] for msg in msgs.values()),
+        **growth(workdir),
+        "_latency":     latency,
+        "_service":     service,
+    }
+
+
+def _print_row(row: dict):
+    lat = row["latency_ms"]
+    fmt = lambda v: f"{v:>6.1f}ms" if v is not None else f"{'-':>8}"  # noqa: E731
+    decisions = " ".join(f"{k}={v}" for k, v in sorted(row["decisions"].items()))
+    print(f"{row['t']:>7.0f} | {row['throughput']:>7.1f} | {fmt(lat['p50'])} | {fmt(lat['p99'])} | "
+          f"{fmt(lat['max'])} | {row['rss_bytes'] / 2**20:>7.1f} | {row['logs_bytes'] / 1024:>8.0f} | "
+          f"{row['history_bytes'] / 1024:>8.0f} | {decisions}")
+
+
+def _slope_per_hour(rows: list[dict], key: str) -> float | None:
+    """Least-squares growth rate of a per-interval metric, per hour (ignores the warm-up interval)."""
+    points = [(r["t"], r[key]) for r in rows[1:]] if len(rows) > 2 else [(r["t"], r[key]) for r in rows]
+    if len(points) < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    return round(sum((t - mean_t) * (v - mean_v) for t, v in points) / var * 3600) if var else None
+
+
+def _summary(report, totals: Histogram, service_totals: Histogram, outcomes: Counter, args) -> dict:
+    rows = report["intervals"]
+    commands = sum(r["commands"] for r in rows)
+    first, last = (rows[0], rows[-1]) if rows else ({}, {})
+    return {
+        "commands":             commands,
+        "missed":               sum(r["missed"] for r in rows),
+        "target_rate":          args.rate,
+        "throughput":           round(commands / args.duration, 2),
+        "latency_ms":           {f"p{q:g}".replace(".", ""): totals.percentile(q) for q in (50, 90, 99, 99.9)},
+        "service_ms":           {f"p{q:g}".replace(".", ""): service_totals.percentile(q) for q in (50, 90, 99, 99.9)},
+        "decisions":            dict(outcomes),
+        "rss_start_bytes":      first.get("rss_bytes"),
+        "rss_end_bytes":        last.get("rss_bytes"),
+        "rss_growth_per_hour":  _slope_per_hour(rows, "rss_bytes"),
+        "logs_bytes":           report["final_growth"]["logs_bytes"],
+        "logs_growth_per_hour": _slope_per_hour(rows, "logs_bytes"),
+        "history_bytes":        report["final_growth"]["history_bytes"],
+        "history_growth_per_hour": _slope_per_hour(rows, "history_bytes"),
+        "logs_bytes_per_command": round(report["final_growth"]["logs_bytes"] / commands, 1) if commands else None,
+        "history_bytes_per_command":
+            round(report["final_growth"]["history_bytes"] / commands, 1) if commands else None,
+    }
+
+
+def _run_info(args, policies: dict, workdir: str) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "started":      datetime.now().isoformat(),
+        "commit":       commit,
+        "python":       platform.python_version(),
+        "platform":     platform.platform(),
+        "cpus":         os.cpu_count(),
+        "duration":     args.duration,
+        "rate":         args.rate,
+        "fleet":        args.fleet,
+        "workers":      args.workers,
+        "interval":     args.interval,
+        "workspace":    {"dirs": args.dirs, "files": args.files, "file_bytes": args.file_bytes},
+        "blocked":      args.blocked,
+        "simulate":     args.simulate,
+        "seed":         args.seed,
+        "history":      policies.get("history", {}),
+    }
+
+
+# ─────────────── Compare ───────────────
+
+COMPARED = [
+    ("throughput", "cmd/s", ("throughput",)),
+    ("latency p50", "ms", ("latency_ms", "p50")),
+    ("latency p99", "ms", ("latency_ms", "p99")),
+    ("latency p99.9", "ms", ("latency_ms", "p999")),
+    ("service p50", "ms", ("service_ms", "p50")),
+    ("service p99", "ms", ("service_ms", "p99")),
+    ("rss end", "MB", ("rss_end_bytes",)),
+    ("rss growth", "MB/h", ("rss_growth_per_hour",)),
+    ("logs per command", "B", ("logs_bytes_per_command",)),
+    ("history per command", "B", ("history_bytes_per_command",)),
+    ("history growth", "MB/h", ("history_growth_per_hour",)),
+]
+
+
+def compare(paths: list[str]):
+    reports = []
+    for path in paths:
+        with open(path, 'r') as f:
+            reports.append(json.load(f))
+    for path, report in zip(paths, reports):
+        run = report["run"]
+        print(f"{os.path.basename(path)}: commit {run['commit']}, {run['rate']:g} cmd/s target, "
+              f"{run['duration']:g}s, fleet {run['fleet']}, {run['workers']} worker(s), "
+              f"history {run['history'].get('backend', 'json')}")
+    if any(r["run"]["rate"] != reports[0]["run"]["rate"] or r["run"]["fleet"] != reports[0]["run"]["fleet"]
+           for r in reports):
+        print("Note: runs differ in rate or fleet; deltas are not like for like")
+    print()
+    print(f"{'metric':<22}" + "".join(f" | {os.path.basename(p)[:18]:>18}" for p in paths) + " | change")
+    for label, unit, keys in COMPARED:
+        values = []
+        for report in reports:
+            value = report["summary"]
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is not None and unit.startswith("MB"):
+                value = value / 2**20
+            values.append(value)
+        cells = "".join(f" | {v:>15.2f} {unit:<2}" if v is not None else f" | {'-':>18}" for v in values)
+        first, latest = values[0], values[-1]
+        change = f"{(latest - first) / first * 100:+.1f}%" if first and latest is not None else "-"
+        print(f"{label:<22}{cells} | {change}")
+
+
+# ─────────────── CLI ───────────────
+
+def _duration(text: str) -> float:
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def _fleet(items: list[str]) -> dict:
+    fleet = {}
+    for item in items:
+        profile, _, count = item.partition("=")
+        if profile not in PROFILES or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"fleet entries are profile=count with profile in {PROFILES}: {item!r}")
+        fleet[profile] = int(count)
+    return fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=_duration, default=_duration("10m"), help="e.g. 90s, 30m, 2h")
+    parser.add_argument("--rate", type=float, default=50, help="target commands per second (whole fleet)")
+    parser.add_argument("--fleet", nargs="+", default=["cleaner=1", "organizer=1", "monitor=2", "synthetic=4"],
+                        help="profile=count for profiles " + ", ".join(PROFILES))
+    parser.add_argument("--workers", type=int, default=1, help="Supervisor processes sharing the fleet")
+    parser.add_argument("--interval", type=float, default=60, help="seconds per report row")
+    parser.add_argument("--dirs", type=int, default=20, help="directories per workspace subtree")
+    parser.add_argument("--files", type=int, default=50, help="files per directory")
+    parser.add_argument("--file-bytes", type=int, default=1024)
+    parser.add_argument("--blocked", type=float, default=0.05, help="share of out-of-scope commands")
+    parser.add_argument("--backend", choices=["json", "shards", "sqlite"], help="override the history backend")
+    parser.add_argument("--maintenance", type=float, help="override history maintenance_interval_seconds")
+    parser.add_argument("--simulate", action="store_true", help="run the pipeline in simulation mode (no Executor)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="soak_reports", help="directory for the JSON report")
+    parser.add_argument("--keep", action="store_true", help="keep the sandbox directory after the run")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="compare saved reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+    try:
+        args.fleet = _fleet(args.fleet)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if not fleet_members(args.fleet) or args.rate <= 0:
+        parser.error("the fleet needs at least one member and a positive --rate")
+    args.workers = max(1, min(args.workers, len(fleet_members(args.fleet))))
+    if args.workers > 1 and (args.backend or _configured_backend()) == "json":
+        parser.error("the json history backend has a single writer; use --backend shards or sqlite with --workers")
+
+    report = run(args)
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"soak-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report["summary"]
+    print()
+    print(f"Commands   : {summary['commands']} ({summary['throughput']} cmd/s of {summary['target_rate']:g} target, "
+          f"{summary['missed']} due but not issued)")
+    print(f"Latency    : p50 {summary['latency_ms']['p50']} ms, p99 {summary['latency_ms']['p99']} ms, "
+          f"p99.9 {summary['latency_ms']['p999']} ms")
+    print(f"Decisions  : {summary['decisions']}")
+    if summary["rss_growth_per_hour"] is not None:
+        print(f"RSS growth : {summary['rss_growth_per_hour'] / 2**20:.1f} MB/h")
+    print(f"Disk       : logs {summary['logs_bytes_per_command']} B/cmd, "
+          f"history {summary['history_bytes_per_command']} B/cmd")
+    print(f"Report     : {path}")
+
+
+def _configured_backend() -> str:
+    with open(os.path.join(REPO_ROOT, "policies.json"), 'r') as f:
+        return json.load(f).get("history", {}).get("backend", "json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Startup benchmark: measures how long `python main.py` takes to reach its prompt
+for history files of increasing size.
+
+Usage:
+    python benchmarks/startup.py [--sizes 0 10000 100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_history(path: str, size: int):
+    start = datetime.now() - timedelta(seconds=size)
+    entries = [{
+        "timestamp": (start + timedelta(seconds=i)).isoformat(),
+        "command": "clean workspace",
+        "agent": "CleanerAgent",
+        "action": "delete",
+        "path": f"workspace/temp/file_{i}.tmp",
+        "risk": "MEDIUM",
+        "decision": "ALLOWED",
+        "reason": "Policy allowed, risk MEDIUM",
+    } for i in range(size)]
+    with open(path, 'w') as f:
+        json.dump(entries, f)
+
+
+def time_to_prompt(workdir: str) -> float:
+    """Seconds from process launch until main.py prints its '> ' prompt."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(REPO_ROOT, "main.py")],
+        cwd=workdir, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    seen = b""
+    while not seen.endswith(b"> "):
+        chunk = proc.stdout.read(1)
+        if not chunk:
+            raise RuntimeError("main.py exited before showing a prompt")
+        seen += chunk
+    elapsed = time.perf_counter() - started
+    proc.communicate(b"exit\n")
+    return elapsed
+
+
+def interpreter_baseline(repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = interpreter_baseline(args.repeat)
+    print(f"Interpreter baseline: {baseline * 1000:.1f} ms")
+    print(f"{'History entries':>16} | {'median':>9} | {'min':>9} | {'over baseline':>13}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            shutil.copy(os.path.join(REPO_ROOT, "policies.json"), workdir)
+            make_history(os.path.join(workdir, "history.json"), size)
+            samples = [time_to_prompt(workdir) for _ in range(args.repeat)]
+        median = statistics.median(samples)
+        print(f"{size:>16} | {median * 1000:>7.1f}ms | {min(samples) * 1000:>7.1f}ms | "
+              f"{(median - baseline) * 1000:>11.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Canonical Path: one shared normalization of action paths.
+PolicyEngine, RiskEngine and Executor all resolve paths through canonicalize(),
+which interns a CanonicalPath per distinct input string (LRU-bounded), so the
+normalized form, component tuple and sandbox membership are computed once.
+"""
+
+import os
+from functools import lru_cache
+
+
+SANDBOX_ROOT = "workspace"
+
+
+class CanonicalPath:
+    __slots__ = ("raw", "norm", "parts", "lower_parts", "is_absolute", "escapes_root", "in_sandbox")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.norm = os.path.normpath(raw) if raw else ""
+        self.is_absolute = os.path.isabs(self.norm)
+        self.parts = tuple(p for p in self.norm.split(os.sep) if p and p != ".")
+        self.lower_parts = tuple(p.lower() for p in self.parts)
+        self.escapes_root = self.is_absolute or (bool(self.parts) and self.parts[0] == os.pardir)
+        self.in_sandbox = not self.escapes_root and bool(self.parts) and self.parts[0] == SANDBOX_ROOT
+
+    @property
+    def is_sandbox_root(self) -> bool:
+        return self.parts == (SANDBOX_ROOT,)
+
+    def is_within(self, other: "CanonicalPath") -> bool:
+        """True if self equals other or lies underneath it (component-wise, case-sensitive)."""
+        return (self.is_absolute == other.is_absolute
+                and self.parts[:len(other.parts)] == other.parts)
+
+    def __repr__(self) -> str:
+        return f"CanonicalPath({self.norm!r})"
+
+
+@lru_cache(maxsize=8192)
+def canonicalize(path: str) -> CanonicalPath:
+    return CanonicalPath(path)
+
+
+def action_paths(action: dict) -> list[CanonicalPath]:
+    """Canonical forms of every path an action touches (path, or source and dest)."""
+    if action.get("action") == "move":
+        keys = ("source", "dest")
+    else:
+        keys = ("path",)
+    return [canonicalize(action[k]) for k in keys if action.get(k)]
+
+
+def action_access(action: dict) -> tuple[list[CanonicalPath], list[CanonicalPath]]:
+    """(read set, write set): reads only read their path; delete, create and move write theirs."""
+    paths = action_paths(action)
+    if action.get("action") == "read":
+        return paths, []
+    return [], paths
+
+
+def conflicts(a: dict, b: dict) -> bool:
+    """Whether two actions touch overlapping paths and at least one of them writes there."""
+    a_reads, a_writes = action_access(a)
+    b_reads, b_writes = action_access(b)
+    pairs = [(x, y) for x in a_writes for y in b_reads + b_writes]
+    pairs += [(x, y) for x in a_reads for y in b_writes]
+    return any(x.is_within(y) or y.is_within(x) for x, y in pairs)
@@ -0,0 +1,188 @@
+"""
+Coalescer: folds overlapping approved actions before they reach the Executor.
+
+Within one plan:
+  - an exact duplicate of an earlier step is served by that step's execution
+  - a file delete is served by a delete of its parent directory by the same
+    agent (the directory delete removes the file anyway)
+  - moves by one agent into the same destination directory run as one batch
+Folding never reorders an action past a step that touches an overlapping path.
+
+Across requests, only idempotent actions are served by an earlier execution:
+reads and previews whose paths are unchanged on disk, and deletes whose targets
+are already gone (or whose delete job is still running, which attaches to it),
+each repeated within window_seconds. Creates and moves always run again, since
+repeating them is not the same as having run them once.
+"""
+
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from canonical_path import action_paths, canonicalize, conflicts
+
+
+def action_key(action: dict) -> tuple:
+    """Identity of an action for duplicate detection: agent, type, canonical paths, read mode."""
+    return (action.get("agent"), action.get("action"),
+            tuple(cp.norm for cp in action_paths(action)), action.get("read_mode"))
+
+
+class ActionCoalescer:
+    def __init__(self, enabled=True, window_seconds=2.0, base_dir=None, max_batch=64, max_recent=256):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.base_dir = base_dir if base_dir else os.getcwd()
+        self.max_batch = max_batch
+        self.max_recent = max_recent
+        self._recent = OrderedDict()   # action key -> record of its last execution
+        self._lock = threading.Lock()
+
+    # ─────────────── Within a plan ───────────────
+
+    def fold(self, actions: list[dict], approved: list[bool]) -> tuple[list[list[int]], dict[int, int]]:
+        """
+        Group approved plan steps into executions.
+        Returns (groups, served_by): each group is a list of step indexes run by one
+        Executor call (a single action or a batch of moves), headed by the step at
+        whose position it runs; served_by maps each folded step to the step serving it.
+        """
+        runs = [i for i, ok in enumerate(approved) if ok]
+        if not self.enabled:
+            return [[i] for i in runs], {}
+        served_by = {}
+        groups = []
+
+        def clear_between(lo, hi, idx):
+            """No executing step strictly between lo and hi touches what step idx touches."""
+            for m in runs:
+                if lo < m < hi and served_by.get(m, idx) == idx and conflicts(actions[m], actions[idx]):
+                    return False
+            return True
+
+        for i in runs:
+            action = actions[i]
+            server = None
+            for j in runs:
+                if j >= i:
+                    break
+                if j in served_by:
+                    continue
+                if (action_key(actions[j]) == action_key(action) or self._covers(actions[j], action)) \
+                        and clear_between(j, i, i):
+                    server = j
+            if server is None:
+                for k in runs:
+                    if k > i and self._covers(actions[k], action) and clear_between(i, k, i):
+                        server = k
+                        break
+            if server is not None:
+                served_by[i] = server
+                continue
+
+            for group in groups:
+                if self._batches_with(actions[group[0]], action) and len(group) < self.max_batch \
+                        and clear_between(group[0], i, i):
+                    group.append(i)
+                    break
+            else:
+                groups.append([i])
+        return groups, served_by
+
+    def _covers(self, server: dict, action: dict) -> bool:
+        """Whether server (a directory delete) already deletes the file action deletes."""
+        if server.get("action") != "delete" or action.get("action") != "delete" \
+                or server.get("agent") != action.get("agent"):
+            return False
+        target = canonicalize(action.get("path", ""))
+        if not target.parts or target.parts[:-1] != canonicalize(server.get("path", "")).parts:
+            return False
+        try:
+            st = os.lstat(os.path.join(self.base_dir, target.norm))
+        except OSError:
+            return True   # already gone: either execution leaves it gone
+        return stat.S_ISREG(st.st_mode)
+
+    @staticmethod
+    def _batches_with(head: dict, action: dict) -> bool:
+        if head.get("action") != "move" or action.get("action") != "move" \
+                or head.get("agent") != action.get("agent"):
+            return False
+        head_dest = canonicalize(head.get("dest", ""))
+        dest = canonicalize(action.get("dest", ""))
+        return bool(dest.parts) and dest.parts[:-1] == head_dest.parts[:-1]
+
+    # ─────────────── Across requests ───────────────
+
+    def recall(self, action: dict) -> dict | None:
+        """
+        Record of an earlier execution that can serve action, or None.
+        A record with a job_id and pending=True belongs to a background job the
+        caller should attach to if it is still active.
+        """
+        if not self.enabled or not self.window_seconds or not self._idempotent(action):
+            return None
+        with self._lock:
+            record = self._recent.get(action_key(action))
+        if record is None:
+            return None
+        if record["pending"]:
+            return record
+        if time.monotonic() - record["at"] > self.window_seconds:
+            return None
+        signature = self._signature(action)
+        if record["signature"] != signature:
+            return None
+        if action.get("action") == "delete" and any(sig is not None for sig in signature):
+            return None   # only a delete of an already-missing path is served
+        return record
+
+    def remember(self, action: dict, command: str, output: str, job_id: str | None = None):
+        """Note a successful execution (or a submitted job) that later requests may reuse."""
+        if not self.enabled or not self._idempotent(action):
+            return
+        record = {
+            "command":   command,
+            "output":    output,
+            "job_id":    job_id,
+            "pending":   job_id is not None,
+            "at":        time.monotonic(),
+            "signature": None if job_id else self._signature(action),
+        }
+        key = action_key(action)
+        with self._lock:
+            self._recent[key] = record
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_recent:
+                self._recent.popitem(last=False)
+
+    def settle(self, action: dict, output: str, success: bool):
+        """A background job finished: keep its outcome for reuse, or forget a failed one."""
+        key = action_key(action)
+        with self._lock:
+            record = self._recent.get(key)
+            if record is None or not record["pending"]:
+                return
+            if not success:
+                del self._recent[key]
+                return
+            record.update(output=output, pending=False, at=time.monotonic(),
+                          signature=self._signature(action))
+
+    @staticmethod
+    def _idempotent(action: dict) -> bool:
+        """Reads (status and preview) and deletes: running one twice has the effect of running it once."""
+        return action.get("action") in ("read", "delete")
+
+    def _signature(self, action: dict) -> tuple:
+        """(inode, mtime, size) of every path the action touches, None where missing."""
+        signature = []
+        for cp in action_paths(action):
+            try:
+                st = os.lstat(os.path.join(self.base_dir, cp.norm))
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
@@ -1,31 +1,76 @@
 """
 Decision Engine: combines policy and risk to produce a final decision and explanation.
+evaluate() returns a Verdict holding reason codes (see reasons.py); its
+final_reason and explanation are rendered only when a sink reads them.
 """
 
+from reasons import Explanation, render
+
+
+class Verdict:
+    """A decision plus its cause and explanation lines as reason codes."""
+
+    __slots__ = ("decision", "reason", "lines")
+
+    def __init__(self, decision: str, reason, lines: tuple = ()):
+        self.decision = decision
+        self.reason = reason
+        self.lines = lines
+
+    @property
+    def final_reason(self) -> str:
+        return render(self.reason)
+
+    @property
+    def explanation(self) -> Explanation:
+        return Explanation(self.lines)
+
+    def __str__(self) -> str:
+        return self.final_reason
+
+
 class DecisionEngine:
+    @staticmethod
+    def evaluate(policy_allowed: bool, policy_reason,
+                 risk_level: str, risk_reason,
+                 quota_allowed: bool = True, quota_reason="") -> Verdict:
+        """
+        Returns a Verdict: decision 'ALLOWED' or 'BLOCKED', the reason for it and
+        explanation lines, all as reasons (policy_reason / risk_reason / quota_reason
+        may be reason tuples or plain strings).
+        """
+        if not policy_allowed:
+            return Verdict("BLOCKED", ("decision.policy", policy_reason),
+                           (("explain.policy_failed", policy_reason),))
+        if risk_level == "HIGH":
+            return Verdict("BLOCKED", ("decision.risk", risk_reason),
+                           (("explain.high_risk", risk_reason),))
+        if not quota_allowed:
+            return Verdict("BLOCKED", ("decision.quota", quota_reason),
+                           (("policy.ok",), ("explain.quota_failed", quota_reason)))
+        lines = (("policy.ok",), ("explain.risk_level", risk_level, risk_reason))
+        if risk_level == "MEDIUM":
+            lines += (("explain.medium_warning",),)
+        return Verdict("ALLOWED", ("decision.allowed", risk_level), lines)
+
     @staticmethod
     def decide(policy_allowed: bool, policy_reason: str,
-               risk_level: str, risk_reason: str) -> tuple[str, str, list[str]]:
+               risk_level: str, risk_reason: str,
+               quota_allowed: bool = True, quota_reason: str = "") -> tuple[str, str, list[str]]:
         """
         Returns (decision, final_reason, explanation_lines).
         decision: 'ALLOWED' or 'BLOCKED'
         final_reason: short summary
         explanation_lines: list of strings for detailed output
+        quota_allowed / quota_reason: outcome of the per-agent rate limiter
         """
-        explanation = []
-        if not policy_allowed:
-            decision = "BLOCKED"
-            final_reason = f"Policy violation: {policy_reason}"
-            explanation.append(f"Policy check failed: {policy_reason}")
-        elif risk_level == "HIGH":
-            decision = "BLOCKED"
-            final_reason = f"High risk: {risk_reason}"
-            explanation.append(f"Risk assessment: {risk_reason} (HIGH)")
-        else:
-            decision = "ALLOWED"
-            final_reason = f"Policy allowed, risk {risk_level}"
-            explanation.append(f"Policy check passed")
-            explanation.append(f"Risk level: {risk_level} – {risk_reason}")
-            if risk_level == "MEDIUM":
-                explanation.append("WARNING: Medium-risk operation permitted")
-        return decision, final_reason, explanation
+        verdict = DecisionEngine.evaluate(policy_allowed, policy_reason, risk_level, risk_reason,
+                                          quota_allowed, quota_reason)
+        return verdict.decision, verdict.final_reason, list(verdict.explanation)
+
+    @staticmethod
+    def evaluate_many(policy_results: list[tuple[bool, object]],
+                      risk_results: list[tuple[str, object]]) -> list[Verdict]:
+        """evaluate() over paired batches of policy and risk results (quota not modelled)."""
+        return [DecisionEngine.evaluate(allowed, policy_reason, level, risk_reason)
+                for (allowed, policy_reason), (level, risk_reason) in zip(policy_results, risk_results)]
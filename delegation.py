@@ -1,14 +1,46 @@
 """
 Delegation Manager: loads agent permissions and issues scope tokens.
+Permissions come from the compiled policy snapshot (policy_cache.py), so
+policies.json is only re-parsed when its content hash changes.
 """
 
+import hashlib
 import json
+import os
+
+from policy_cache import compile_policies, load_compiled
+
 
 class DelegationManager:
     def __init__(self, policies_path="policies.json"):
-        with open(policies_path, 'r') as f:
-            self.policies = json.load(f)
-        self.agents = self.policies.get("agents", {})
+        self.policies_path = policies_path
+        self._apply(load_compiled(policies_path))
+
+    @classmethod
+    def from_policies(cls, policies: dict) -> "DelegationManager":
+        """Manager over an in-memory policy document (e.g. a candidate under evaluation); no cache file."""
+        snapshot = compile_policies(policies)
+        snapshot["digest"] = hashlib.sha256(json.dumps(policies, sort_keys=True).encode()).hexdigest()
+        manager = cls.__new__(cls)
+        manager.policies_path = None
+        manager._apply(snapshot)
+        return manager
+
+    def _apply(self, snapshot: dict):
+        self.digest = snapshot["digest"]
+        self.policies = snapshot["policies"]
+        self.agents = snapshot["agents"]
+        self.prefix_index = snapshot["prefix_index"]
+
+    def reload(self) -> bool:
+        """Pick up edits to policies.json. Returns True if the policy changed."""
+        if self.policies_path is None:
+            return False
+        snapshot = load_compiled(self.policies_path)
+        if snapshot["digest"] == self.digest:
+            return False
+        self._apply(snapshot)
+        return True
 
     def get_scope_token(self, agent_name: str) -> dict | None:
         """
@@ -19,6 +51,21 @@ class DelegationManager:
             return {
                 "agent": agent_name,
                 "allowed_actions": perms["allowed_actions"],
-                "allowed_paths": perms["allowed_paths"]
+                "allowed_paths": perms["allowed_paths"],
+                "normalized_paths": perms["normalized_paths"],
             }
         return None
+
+    def agent_limits(self) -> dict:
+        """Per-agent rate limit blocks for agents that declare one."""
+        return {name: perms["limits"] for name, perms in self.agents.items() if perms.get("limits")}
+
+    def agents_granted(self, path: str) -> set[str]:
+        """Agents whose path grants cover path, found by walking its prefixes in the index."""
+        granted = set()
+        prefix = os.path.normpath(path)
+        while prefix:
+            granted.update(self.prefix_index.get(prefix, ()))
+            parent = os.path.dirname(prefix)
+            prefix = parent if parent != prefix else ""
+        return granted
@@ -2,49 +2,114 @@
 Executor: performs file operations inside a sandboxed environment.
 Now supports 'read' actions for monitoring and status checks.
 All actions are executed inside a sandbox to prevent unintended system impact.
+
+fd mode (default where the platform supports dir_fd): the sandbox root is
+opened as a directory descriptor (reopened if the directory is replaced) and
+every operation walks to its target relative to it with O_NOFOLLOW, then acts
+via dir_fd= (unlink, rename, mkdir, stat). A symlink anywhere on the path is
+refused, and there is no window between checking a path string and acting on
+it. Cross-device moves copy and remove through the same descriptors.
 """
 
+import errno
 import os
 import shutil
+import stat
+import threading
+
+from canonical_path import SANDBOX_ROOT, canonicalize
+
+
+FD_MODE_SUPPORTED = (
+    hasattr(os, "O_DIRECTORY") and hasattr(os, "O_NOFOLLOW")
+    and {os.open, os.stat, os.unlink, os.rename, os.mkdir, os.rmdir, os.readlink, os.symlink} <= os.supports_dir_fd
+    and os.stat in os.supports_follow_symlinks
+    and os.scandir in os.supports_fd
+)
+_DIR_FLAGS = getattr(os, "O_RDONLY", 0) | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0)
 
 
 class Executor:
-    SANDBOX_ROOT = "workspace"
+    SANDBOX_ROOT = SANDBOX_ROOT
 
-    def __init__(self, base_dir=None):
-        self.base_dir = base_dir if base_dir else os.getcwd()
+    def __init__(self, base_dir=None, fd_mode=None):
+        self.base_dir = os.path.abspath(base_dir) if base_dir else os.getcwd()
         self.sandbox_root = self.base_dir
+        self.fd_mode = FD_MODE_SUPPORTED if fd_mode is None else bool(fd_mode) and FD_MODE_SUPPORTED
+        self._root_fd = None
+        self._root_lock = threading.Lock()
 
     def _resolve_path(self, relative_path: str) -> str:
-        """Convert relative path to absolute; enforce sandbox boundary."""
-        abs_path = os.path.abspath(os.path.join(self.base_dir, relative_path))
-        if not abs_path.startswith(self.sandbox_root):
+        """Convert relative path to absolute; enforce sandbox boundary (shared canonical form)."""
+        cp = canonicalize(relative_path)
+        if cp.escapes_root:
             raise ValueError(f"Path '{relative_path}' attempts to escape project directory")
-        sandbox_abs = os.path.join(self.base_dir, self.SANDBOX_ROOT)
-        if not abs_path.startswith(sandbox_abs):
+        if not cp.in_sandbox:
             raise ValueError(f"Path '{relative_path}' is outside sandbox '{self.SANDBOX_ROOT}'")
-        return abs_path
+        return os.path.join(self.base_dir, cp.norm)
 
-    def execute(self, action: dict) -> tuple[bool, str]:
-        """Execute the action. Returns (success, message)."""
+    def execute(self, action: dict, progress=None, cancel=None) -> tuple[bool, str]:
+        """
+        Execute the action. Returns (success, message).
+        progress(done, total) is called as a directory delete advances; setting the
+        cancel event (threading.Event) stops it between files. Both are optional and
+        only used when running as a background job.
+        """
+        return self._guarded(self._dispatch, action, progress, cancel)
+
+    def _dispatch(self, action: dict, progress=None, cancel=None) -> tuple[bool, str]:
         action_type = action.get("action")
+        if action_type == "delete":
+            handler = self._fd_delete if self.fd_mode else self._handle_delete
+            return handler(action, progress, cancel)
+        if self.fd_mode and action_type in ("create", "move", "read"):
+            return getattr(self, f"_fd_{action_type}")(action)
+        if action_type == "create":
+            return self._handle_create(action)
+        elif action_type == "move":
+            return self._handle_move(action)
+        elif action_type == "read":
+            return self._handle_read(action)
+        else:
+            return False, f"Unknown action type: {action_type}"
+
+    @staticmethod
+    def _guarded(handler, *args) -> tuple[bool, str]:
         try:
-            if action_type == "delete":
-                return self._handle_delete(action)
-            elif action_type == "create":
-                return self._handle_create(action)
-            elif action_type == "move":
-                return self._handle_move(action)
-            elif action_type == "read":
-                return self._handle_read(action)
-            else:
-                return False, f"Unknown action type: {action_type}"
+            return handler(*args)
         except ValueError as e:
             return False, f"Sandbox violation: {str(e)}"
         except Exception as e:
             return False, f"Execution error: {str(e)}"
 
-    def _handle_delete(self, action: dict) -> tuple[bool, str]:
+    def execute_batch(self, actions: list[dict]) -> list[tuple[bool, str]]:
+        """
+        Execute a batch of moves into one destination directory, returning one
+        (success, message) per action. In fd mode the destination directory is
+        walked to and opened once for the whole batch.
+        """
+        if not self.fd_mode or not actions:
+            return [self.execute(action) for action in actions]
+        dest_dir = canonicalize(actions[0].get("dest", "")).parts[:-1]
+        if not dest_dir:
+            return [self.execute(action) for action in actions]
+        try:
+            dst_fd, _ = self._open_parent(actions[0].get("dest", ""), create=True)
+        except Exception:
+            return [self.execute(action) for action in actions]
+        try:
+            results = []
+            for action in actions:
+                dest = canonicalize(action.get("dest", ""))
+                if action.get("action") == "move" and not dest.escapes_root and dest.parts[:-1] == dest_dir:
+                    results.append(self._guarded(self._fd_move, action, dst_fd))
+                else:
+                    results.append(self.execute(action))
+            return results
+        finally:
+            os.close(dst_fd)
+
+    def _handle_delete(self, action: dict, progress=None, cancel=None) -> tuple[bool, str]:
         path = action.get("path")
         if not path:
             return False, "No path provided for delete"
@@ -56,11 +121,16 @@ class Executor:
             return True, f"Deleted file: {path}"
         elif os.path.isdir(abs_path):
             count = 0
-            for filename in os.listdir(abs_path):
+            names = os.listdir(abs_path)
+            for done, filename in enumerate(names, 1):
+                if cancel is not None and cancel.is_set():
+                    return False, _cancelled(count, path)
                 file_path = os.path.join(abs_path, filename)
                 if os.path.isfile(file_path):
                     os.remove(file_path)
                     count += 1
+                if progress is not None:
+                    progress(done, len(names))
             return True, f"Deleted {count} file(s) in: {path}"
         return False, f"Path is neither a file nor directory: {path}"
 
@@ -107,22 +177,293 @@ class Executor:
                     total_size += os.path.getsize(fp)
                     if "temp" in dirpath:
                         temp_files += 1
-            size_kb = round(total_size / 1024, 2)
-            msg = (
-                f"Workspace Status:\n"
-                f"  Total Files  : {total_files}\n"
-                f"  Temp Files   : {temp_files}\n"
-                f"  Total Size   : {size_kb} KB"
-            )
-            return True, msg
+            return True, self._format_status(total_files, temp_files, total_size)
 
         elif read_mode == "preview":
             if not os.path.isdir(abs_path):
                 return False, f"Preview target is not a directory: {path}"
             files = [f for f in os.listdir(abs_path) if os.path.isfile(os.path.join(abs_path, f))]
-            if not files:
-                return True, f"Preview: No files found in {path}"
-            file_list = "\n".join(f"  - {f}" for f in files)
-            return True, f"Preview — Files that would be deleted from '{path}':\n{file_list}\n[No changes applied — preview only]"
+            return True, self._format_preview(path, files)
 
         return False, f"Unknown read_mode: {read_mode}"
+
+    @staticmethod
+    def _format_status(total_files: int, temp_files: int, total_size: int) -> str:
+        size_kb = round(total_size / 1024, 2)
+        return (
+            f"Workspace Status:\n"
+            f"  Total Files  : {total_files}\n"
+            f"  Temp Files   : {temp_files}\n"
+            f"  Total Size   : {size_kb} KB"
+        )
+
+    @staticmethod
+    def _format_preview(path: str, files: list) -> str:
+        if not files:
+            return f"Preview: No files found in {path}"
+        file_list = "\n".join(f"  - {f}" for f in files)
+        return f"Preview — Files that would be deleted from '{path}':\n{file_list}\n[No changes applied — preview only]"
+
+    # ─────────────── fd mode (dir_fd-relative, no symlink following) ───────────────
+
+    def _dup_sandbox_fd(self) -> int:
+        """
+        A new descriptor of the sandbox root (the caller closes it), reopened first if the
+        directory at that path was replaced. Duplicated under the lock, so another thread
+        cannot close or swap the cached descriptor in between.
+        """
+        root = os.path.join(self.base_dir, self.SANDBOX_ROOT)
+        with self._root_lock:
+            if self._root_fd is not None:
+                try:
+                    current = os.lstat(root)
+                except FileNotFoundError:
+                    current = None
+                opened = os.fstat(self._root_fd)
+                if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+                    os.close(self._root_fd)
+                    self._root_fd = None
+            if self._root_fd is None:
+                self._root_fd = os.open(root, _DIR_FLAGS)
+            return os.dup(self._root_fd)
+
+    def close(self):
+        """Release the sandbox directory descriptor (reopened on next use)."""
+        with self._root_lock:
+            if self._root_fd is not None:
+                os.close(self._root_fd)
+                self._root_fd = None
+
+    def _open_parent(self, relative_path: str, create: bool = False) -> tuple[int, str | None]:
+        """
+        Walk to the parent directory of relative_path from the sandbox fd.
+        Returns (parent_fd, final_name); the caller closes parent_fd. final_name is
+        None for the sandbox root itself. Symlinked components raise ValueError.
+        """
+        cp = canonicalize(relative_path)
+        if cp.escapes_root:
+            raise ValueError(f"Path '{relative_path}' attempts to escape project directory")
+        if not cp.in_sandbox:
+            raise ValueError(f"Path '{relative_path}' is outside sandbox '{self.SANDBOX_ROOT}'")
+        parts = cp.parts[1:]
+        fd = self._dup_sandbox_fd()
+        if not parts:
+            return fd, None
+        for part in parts[:-1]:
+            fd = self._open_child_dir(fd, part, create, relative_path)   # always consumes fd
+        return fd, parts[-1]
+
+    @staticmethod
+    def _open_child_dir(parent_fd: int, name: str, create: bool, relative_path: str) -> int:
+        """Open name under parent_fd as a directory (never via a symlink); closes parent_fd."""
+        try:
+            try:
+                return os.open(name, _DIR_FLAGS, dir_fd=parent_fd)
+            except FileNotFoundError:
+                if not create:
+                    raise
+                os.mkdir(name, dir_fd=parent_fd)
+                return os.open(name, _DIR_FLAGS, dir_fd=parent_fd)
+        except OSError as e:
+            if e.errno in (errno.ELOOP, errno.ENOTDIR):
+                raise ValueError(f"Path '{relative_path}' traverses a symlink or non-directory") from e
+            raise
+        finally:
+            os.close(parent_fd)
+
+    @staticmethod
+    def _lstat_at(dir_fd: int, name: str) -> os.stat_result | None:
+        try:
+            return os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            return None
+
+    def _fd_delete(self, action: dict, progress=None, cancel=None) -> tuple[bool, str]:
+        path = action.get("path")
+        if not path:
+            return False, "No path provided for delete"
+        try:
+            parent_fd, name = self._open_parent(path)
+        except FileNotFoundError:
+            return False, f"File not found: {path} (safe handling)"
+        try:
+            if name is None:
+                return False, f"Refusing to delete sandbox root: {path}"
+            st = self._lstat_at(parent_fd, name)
+            if st is None:
+                return False, f"File not found: {path} (safe handling)"
+            if stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                os.unlink(name, dir_fd=parent_fd)   # a symlink is removed, never followed
+                return True, f"Deleted file: {path}"
+            if stat.S_ISDIR(st.st_mode):
+                dir_fd = self._open_child_dir(os.dup(parent_fd), name, False, path)
+                try:
+                    count = 0
+                    with os.scandir(dir_fd) as it:
+                        entries = list(it)
+                    for done, entry in enumerate(entries, 1):
+                        if cancel is not None and cancel.is_set():
+                            return False, _cancelled(count, path)
+                        if entry.is_file(follow_symlinks=False):
+                            os.unlink(entry.name, dir_fd=dir_fd)
+                            count += 1
+                        if progress is not None:
+                            progress(done, len(entries))
+                finally:
+                    os.close(dir_fd)
+                return True, f"Deleted {count} file(s) in: {path}"
+            return False, f"Path is neither a file nor directory: {path}"
+        finally:
+            os.close(parent_fd)
+
+    def _fd_create(self, action: dict) -> tuple[bool, str]:
+        path = action.get("path")
+        if not path:
+            return False, "No path provided for create"
+        parent_fd, name = self._open_parent(path, create=True)
+        try:
+            if name is None:
+                return False, f"Cannot create sandbox root: {path}"
+            fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o644, dir_fd=parent_fd)
+            with os.fdopen(fd, 'w') as f:
+                f.write("# ArmorIQ Test File\nCreated by ArmorIQ OrganizerAgent\n")
+        finally:
+            os.close(parent_fd)
+        return True, f"Created file: {path}"
+
+    def _fd_move(self, action: dict, dst_parent_fd: int | None = None) -> tuple[bool, str]:
+        """dst_parent_fd: already-open destination directory (from execute_batch); not closed here."""
+        source = action.get("source")
+        dest = action.get("dest")
+        if not source or not dest:
+            return False, "Missing source or dest for move"
+        try:
+            src_fd, src_name = self._open_parent(source)
+        except FileNotFoundError:
+            return False, f"Source not found: {source} (safe handling)"
+        try:
+            if src_name is None:
+                return False, f"Cannot move sandbox root: {source}"
+            if self._lstat_at(src_fd, src_name) is None:
+                return False, f"Source not found: {source} (safe handling)"
+            if dst_parent_fd is None:
+                dst_fd, dst_name = self._open_parent(dest, create=True)
+            else:
+                dst_fd, dst_name = os.dup(dst_parent_fd), canonicalize(dest).parts[-1]
+            try:
+                if dst_name is None:
+                    return False, f"Cannot replace sandbox root: {dest}"
+                dst_st = self._lstat_at(dst_fd, dst_name)
+                if dst_st is not None and stat.S_ISDIR(dst_st.st_mode):
+                    # Like shutil.move: moving onto an existing directory moves inside it
+                    inner_fd = self._open_child_dir(os.dup(dst_fd), dst_name, False, dest)
+                    os.close(dst_fd)
+                    dst_fd, dst_name = inner_fd, src_name
+                try:
+                    os.rename(src_name, dst_name, src_dir_fd=src_fd, dst_dir_fd=dst_fd)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    self._fd_copy(src_fd, src_name, dst_fd, dst_name)   # cross-device: copy + remove
+                    self._fd_remove(src_fd, src_name)
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        return True, f"Moved: {source} → {dest}"
+
+    def _fd_copy(self, src_fd: int, name: str, dst_fd: int, dst_name: str):
+        """Copy name under src_fd to dst_name under dst_fd; symlinks are copied as links, never followed."""
+        st = os.stat(name, dir_fd=src_fd, follow_symlinks=False)
+        if stat.S_ISLNK(st.st_mode):
+            os.symlink(os.readlink(name, dir_fd=src_fd), dst_name, dir_fd=dst_fd)
+        elif stat.S_ISREG(st.st_mode):
+            with os.fdopen(os.open(name, os.O_RDONLY | os.O_NOFOLLOW, dir_fd=src_fd), 'rb') as src:
+                flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW
+                with os.fdopen(os.open(dst_name, flags, stat.S_IMODE(st.st_mode), dir_fd=dst_fd), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+        elif stat.S_ISDIR(st.st_mode):
+            os.mkdir(dst_name, stat.S_IMODE(st.st_mode), dir_fd=dst_fd)
+            src_child = self._open_child_dir(os.dup(src_fd), name, False, name)
+            try:
+                dst_child = self._open_child_dir(os.dup(dst_fd), dst_name, False, dst_name)
+                try:
+                    with os.scandir(src_child) as entries:
+                        names = [entry.name for entry in entries]
+                    for child in names:
+                        self._fd_copy(src_child, child, dst_child, child)
+                finally:
+                    os.close(dst_child)
+            finally:
+                os.close(src_child)
+        else:
+            raise ValueError(f"Cannot move special file: {name}")
+
+    def _fd_remove(self, parent_fd: int, name: str):
+        """Remove name under parent_fd, recursively for directories, without following symlinks."""
+        st = os.stat(name, dir_fd=parent_fd, follow_symlinks=False)
+        if stat.S_ISDIR(st.st_mode):
+            dir_fd = self._open_child_dir(os.dup(parent_fd), name, False, name)
+            try:
+                with os.scandir(dir_fd) as entries:
+                    names = [entry.name for entry in entries]
+                for child in names:
+                    self._fd_remove(dir_fd, child)
+            finally:
+                os.close(dir_fd)
+            os.rmdir(name, dir_fd=parent_fd)
+        else:
+            os.unlink(name, dir_fd=parent_fd)
+
+    def _fd_read(self, action: dict) -> tuple[bool, str]:
+        """Read-only monitoring operations. Never modifies any file."""
+        path = action.get("path", self.SANDBOX_ROOT)
+        read_mode = action.get("read_mode", "status")
+        try:
+            parent_fd, name = self._open_parent(path)
+        except FileNotFoundError:
+            return False, f"Path not found: {path}"
+        try:
+            st = os.fstat(parent_fd) if name is None else self._lstat_at(parent_fd, name)
+            if st is None:
+                return False, f"Path not found: {path}"
+            is_dir = stat.S_ISDIR(st.st_mode)
+
+            if read_mode == "status":
+                if not is_dir:
+                    is_temp = "temp" in canonicalize(path).parts[:-1]
+                    return True, self._format_status(1, int(is_temp), st.st_size)
+                target_fd = os.dup(parent_fd) if name is None else \
+                    self._open_child_dir(os.dup(parent_fd), name, False, path)
+                total_files = total_size = temp_files = 0
+                try:
+                    for dirpath, _, filenames, dir_fd in os.fwalk(".", dir_fd=target_fd, follow_symlinks=False):
+                        in_temp = "temp" in os.path.join(path, dirpath)
+                        for f in filenames:
+                            total_files += 1
+                            total_size += os.stat(f, dir_fd=dir_fd, follow_symlinks=False).st_size
+                            if in_temp:
+                                temp_files += 1
+                finally:
+                    os.close(target_fd)
+                return True, self._format_status(total_files, temp_files, total_size)
+
+            elif read_mode == "preview":
+                if not is_dir:
+                    return False, f"Preview target is not a directory: {path}"
+                target_fd = os.dup(parent_fd) if name is None else \
+                    self._open_child_dir(os.dup(parent_fd), name, False, path)
+                try:
+                    with os.scandir(target_fd) as entries:
+                        files = [e.name for e in entries if e.is_file(follow_symlinks=False)]
+                finally:
+                    os.close(target_fd)
+                return True, self._format_preview(path, files)
+
+            return False, f"Unknown read_mode: {read_mode}"
+        finally:
+            os.close(parent_fd)
+
+
+def _cancelled(count: int, path: str) -> str:
+    return f"Cancelled after deleting {count} file(s) in: {path}"
@@ -0,0 +1,109 @@
+"""
+Fingerprint Store: cached size / file-count / type summaries of workspace paths.
+File fingerprints are keyed by (inode, mtime, size), so the few bytes read to
+sniff a file's type are read once per version of the file. Directory
+fingerprints aggregate their children and are trusted for a short TTL, after
+which they are revalidated by re-statting entries, not by re-reading content.
+"""
+
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+
+TEMP_EXTENSIONS = (".tmp", ".temp", ".swp", ".bak", ".cache")
+EXECUTABLE_MAGIC = (b"\x7fELF", b"MZ", b"#!")
+
+
+class FingerprintStore:
+    def __init__(self, base_dir=None, max_entries=10000, dir_ttl=5.0):
+        self.base_dir = base_dir if base_dir else os.getcwd()
+        self.max_entries = max_entries
+        self.dir_ttl = dir_ttl
+        self._cache = OrderedDict()   # abs path -> (stat key, checked_at, fingerprint)
+        self._lock = threading.RLock()  # background jobs invalidate from worker threads
+
+    def fingerprint(self, path: str) -> dict | None:
+        """
+        Summary of path relative to base_dir, or None if it does not exist:
+          {"kind": "file"|"dir"|"symlink"|"other", "size": bytes, "files": count,
+           "executables": count, "temp_files": count}
+        Symlinks are never followed.
+        """
+        with self._lock:
+            return self._fingerprint(os.path.normpath(os.path.join(self.base_dir, path)))
+
+    def _fingerprint(self, abs_path: str) -> dict | None:
+        cached = self._cache.get(abs_path)
+        now = time.monotonic()
+        if cached and stat.S_ISDIR(cached[2].get("mode", 0)) and now - cached[1] < self.dir_ttl:
+            self._cache.move_to_end(abs_path)
+            return cached[2]
+
+        try:
+            st = os.lstat(abs_path)
+        except OSError:
+            self._cache.pop(abs_path, None)
+            return None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        if cached and cached[0] == key and not stat.S_ISDIR(st.st_mode):
+            self._cache.move_to_end(abs_path)
+            return cached[2]
+
+        if stat.S_ISDIR(st.st_mode):
+            fp = self._dir_fingerprint(abs_path, st)
+        elif stat.S_ISREG(st.st_mode):
+            fp = self._file_fingerprint(abs_path, st)
+        else:
+            kind = "symlink" if stat.S_ISLNK(st.st_mode) else "other"
+            fp = {"kind": kind, "size": 0, "files": 0, "executables": 0, "temp_files": 0}
+        fp["mode"] = st.st_mode
+
+        self._cache[abs_path] = (key, now, fp)
+        self._cache.move_to_end(abs_path)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return fp
+
+    @staticmethod
+    def _file_fingerprint(abs_path: str, st: os.stat_result) -> dict:
+        executable = bool(st.st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH))
+        if not executable and st.st_size:
+            try:
+                with open(abs_path, 'rb') as f:
+                    executable = f.read(4).startswith(EXECUTABLE_MAGIC)
+            except OSError:
+                pass
+        is_temp = abs_path.lower().endswith(TEMP_EXTENSIONS) or \
+            f"{os.sep}temp{os.sep}" in abs_path.lower()
+        return {"kind": "file", "size": st.st_size, "files": 1,
+                "executables": int(executable), "temp_files": int(is_temp)}
+
+    def _dir_fingerprint(self, abs_path: str, st: os.stat_result) -> dict:
+        fp = {"kind": "dir", "size": 0, "files": 0, "executables": 0, "temp_files": 0}
+        try:
+            names = os.listdir(abs_path)
+        except OSError:
+            return fp
+        for name in names:
+            child = self._fingerprint(os.path.join(abs_path, name))
+            if child is None:
+                continue
+            for field in ("size", "files", "executables", "temp_files"):
+                fp[field] += child[field]
+        return fp
+
+    def invalidate(self, path: str | None = None):
+        """Forget cached fingerprints for path, its subtree and its ancestors (or everything)."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+                return
+            abs_path = os.path.normpath(os.path.join(self.base_dir, path))
+            stale = [p for p in self._cache
+                     if p == abs_path or p.startswith(abs_path + os.sep) or abs_path.startswith(p + os.sep)]
+            for cached_path in stale:
+                del self._cache[cached_path]
@@ -0,0 +1,377 @@
+"""
+History Archive: columnar storage for old history segments.
+Compaction moves entries out of history.json into NumPy segment files with
+dictionary-encoded agent/action/risk/decision/reason-code columns, int64
+timestamps and interned path/command/reason strings. Queries run vectorized
+over the columns.
+
+Segments are immutable once written and listed in manifest.json
+(archive_manifest.py) with their row count, time range and checksum: time
+filtered queries and retention skip segments outside the range without opening
+them, and verify detects altered or missing segments. Writers and retention
+hold the archive lock (an flock on manifest.json.lock) while they add, rewrite
+or delete segments and update the manifest, so concurrent processes never pick
+the same segment name or lose each other's manifest records.
+
+Usage:
+    python history_archive.py compact --keep 1000
+    python history_archive.py verify
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from archive_manifest import SegmentManifest, overlaps
+
+
+ENTRY_FIELDS   = ("timestamp", "command", "agent", "action", "path", "risk", "decision", "reason", "code")
+STRING_COLUMNS = ("command", "agent", "action", "path", "risk", "decision", "reason", "code", "extra")
+MISSING        = "\x1e"                      # marks a field absent from the original entry
+NO_TIMESTAMP   = np.iinfo(np.int64).min
+EPOCH          = datetime(1970, 1, 1)        # naive: history timestamps are naive local time
+BUCKETS_US     = {"hour": 3600 * 10**6, "day": 86400 * 10**6}
+
+
+def _to_micros(timestamp: str | None) -> int:
+    try:
+        delta = datetime.fromisoformat(timestamp).replace(tzinfo=None) - EPOCH
+    except (TypeError, ValueError):
+        return NO_TIMESTAMP
+    return (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+
+
+def _from_micros(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _time_range(ts: np.ndarray) -> dict:
+    """Manifest fields for a timestamp column (no range if any row is unstamped)."""
+    fields = {"rows": int(len(ts))}
+    if len(ts) and not (ts == NO_TIMESTAMP).any():
+        first, last = int(ts.min()), int(ts.max())
+        fields.update(first_us=first, last_us=last, first=_from_micros(first), last=_from_micros(last))
+    return fields
+
+
+class ColumnSegment:
+    """One archived segment: an int64 timestamp column plus dictionary-encoded string columns."""
+
+    def __init__(self, arrays):
+        self.ts = arrays["ts"]
+        self.codes, self.dicts = {}, {}
+        for col in STRING_COLUMNS:
+            if f"{col}_codes" in arrays:
+                self.codes[col] = arrays[f"{col}_codes"]
+                self.dicts[col] = arrays[f"{col}_dict"]
+            else:   # segment written before the column existed
+                self.codes[col] = np.zeros(len(self.ts), dtype=np.uint8)
+                self.dicts[col] = np.array([MISSING])
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @staticmethod
+    def encode(entries: list) -> dict:
+        """Build the array dict for np.savez from a list of history entries."""
+        arrays = {"ts": np.fromiter((_to_micros(e.get("timestamp")) for e in entries),
+                                    dtype=np.int64, count=len(entries))}
+        for col in STRING_COLUMNS:
+            if col == "extra":
+                values = [json.dumps({k: v for k, v in e.items() if k not in ENTRY_FIELDS})
+                          if set(e) - set(ENTRY_FIELDS) else MISSING for e in entries]
+            else:
+                values = [MISSING if e.get(col) is None else str(e[col]) for e in entries]
+            uniques, inverse = np.unique(np.array(values, dtype=str), return_inverse=True)
+            code_type = np.uint8 if len(uniques) <= 256 else np.int32
+            arrays[f"{col}_dict"] = uniques
+            arrays[f"{col}_codes"] = inverse.astype(code_type)
+        return arrays
+
+    def mask(self, since: datetime | None = None, until: datetime | None = None,
+             path_prefix: str | None = None, **equals) -> np.ndarray:
+        """
+        Boolean row mask. equals maps a column to a value or list of values,
+        e.g. mask(agent="CleanerAgent", decision=["BLOCKED"]).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.ts >= _to_micros(since.isoformat())
+        if until is not None:
+            mask &= self.ts < _to_micros(until.isoformat())
+        for col, wanted in equals.items():
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            mask &= np.isin(self.dicts[col], wanted)[self.codes[col]]
+        if path_prefix is not None:
+            mask &= np.char.startswith(self.dicts["path"], path_prefix)[self.codes["path"]]
+        return mask
+
+    def group_keys(self, by: str) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row_codes, labels) for a column or a 'hour' / 'day' time bucket."""
+        if by in BUCKETS_US:
+            buckets = self.ts // BUCKETS_US[by]
+            labels, codes = np.unique(buckets, return_inverse=True)
+            return codes, np.array([_from_micros(int(b) * BUCKETS_US[by]) for b in labels])
+        return self.codes[by], self.dicts[by]
+
+    def rows(self, mask: np.ndarray | None = None) -> list[dict]:
+        index = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        decoded = {col: self.dicts[col][self.codes[col][index]].tolist() for col in STRING_COLUMNS}
+        entries = []
+        for i, micros in enumerate(self.ts[index].tolist()):
+            entry = {}
+            if micros != NO_TIMESTAMP:
+                entry["timestamp"] = _from_micros(micros)
+            for col in ENTRY_FIELDS[1:]:
+                if decoded[col][i] != MISSING:
+                    entry[col] = decoded[col][i]
+            if decoded["extra"][i] != MISSING:
+                entry.update(json.loads(decoded["extra"][i]))
+            entries.append(entry)
+        return entries
+
+
+def segments_of(entries, chunk_size: int = 100_000):
+    """Encode an iterable of entries as in-memory ColumnSegments of up to chunk_size rows."""
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= chunk_size:
+            yield ColumnSegment(ColumnSegment.encode(batch))
+            batch = []
+    if batch:
+        yield ColumnSegment(ColumnSegment.encode(batch))
+
+
+class HistoryArchive:
+    def __init__(self, archive_dir="history_archive", cached_segments=4):
+        self.archive_dir = archive_dir
+        self.cached_segments = cached_segments
+        self.manifest = SegmentManifest(archive_dir)
+        self._cache = OrderedDict()   # small LRU so reads never pin the whole archive in memory
+        self._lock = threading.RLock()
+        self._locked = False          # this process holds the archive flock
+
+    @contextmanager
+    def locked(self):
+        """Hold the archive lock; re-entrant, so a retention pass can write segments under it."""
+        with self._lock:
+            if self._locked:
+                yield
+                return
+            os.makedirs(self.archive_dir, exist_ok=True)
+            with open(self.manifest.path + ".lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._locked = True
+                try:
+                    yield
+                finally:
+                    self._locked = False
+
+    def segment_paths(self) -> list[str]:
+        """Segment files, oldest first."""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        names = sorted(n for n in os.listdir(self.archive_dir)
+                       if n.startswith("segment_") and n.endswith(".npz"))
+        return [os.path.join(self.archive_dir, n) for n in names]
+
+    def write_segment(self, entries: list, path: str | None = None) -> str | None:
+        """Encode entries as a new columnar segment (or replace path); returns its path."""
+        if not entries:
+            return None
+        arrays = ColumnSegment.encode(entries)
+        with self.locked():
+            tmp_path = os.path.join(self.archive_dir, f".tmp_{os.getpid()}_{threading.get_ident()}.npz")
+            np.savez_compressed(tmp_path, **arrays)
+            if path is not None:
+                os.replace(tmp_path, path)
+            else:
+                path = self._link_new_segment(tmp_path)
+            self._cache.pop(path, None)
+            self.manifest.put(path, _time_range(arrays["ts"]))
+        return path
+
+    def _link_new_segment(self, tmp_path: str) -> str:
+        """Publish tmp_path under the next free segment name; link() never replaces an existing one."""
+        existing = self.segment_paths()
+        seq = int(os.path.basename(existing[-1])[8:14]) + 1 if existing else 1
+        while True:
+            path = os.path.join(self.archive_dir, f"segment_{seq:06d}.npz")
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                seq += 1   # taken by a writer outside the lock
+                continue
+            os.remove(tmp_path)
+            return path
+
+    def describe(self, path: str) -> dict:
+        """Manifest record of a segment (rows, time range, size, SHA-256)."""
+        return self.manifest.get(path, lambda p: _time_range(self._timestamps(p)))
+
+    def load_segment(self, path: str) -> ColumnSegment:
+        segment = self._cache.get(path)
+        if segment is None:
+            with np.load(path, allow_pickle=False) as arrays:
+                segment = ColumnSegment({k: arrays[k] for k in arrays.files})
+            self._cache[path] = segment
+            while len(self._cache) > self.cached_segments:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(path)
+        return segment
+
+    def _timestamps(self, path: str) -> np.ndarray:
+        """Read only the timestamp column of a segment."""
+        with np.load(path, allow_pickle=False) as arrays:
+            return arrays["ts"]
+
+    def expire(self, before: datetime | None = None, max_rows: int | None = None) -> int:
+        """
+        Drop archived rows older than before, then the oldest rows beyond max_rows.
+        Whole segments are deleted; a segment straddling the cutoff is rewritten.
+        Returns the number of rows dropped.
+        """
+        with self.locked():
+            return self._expire(before, max_rows)
+
+    def _expire(self, before: datetime | None, max_rows: int | None) -> int:
+        paths = self.segment_paths()
+        lengths = {}
+        dropped = 0
+        cutoff = _to_micros(before.isoformat()) if before is not None else None
+        for path in paths:
+            record = self.describe(path)
+            # Segments wholly on one side of the cutoff are settled from the manifest alone
+            if cutoff is None or record.get("first_us", NO_TIMESTAMP) >= cutoff:
+                lengths[path] = record["rows"]
+                continue
+            if record.get("last_us", cutoff) < cutoff:
+                keep = np.zeros(record["rows"], dtype=bool)
+            else:
+                keep = self._timestamps(path) >= cutoff
+            lengths[path] = int(keep.sum())
+            if not keep.all():
+                dropped += self._drop_rows(path, keep)
+
+        if max_rows is not None:
+            excess = sum(lengths.values()) - max_rows
+            for path in paths:
+                if excess <= 0:
+                    break
+                n = lengths[path]
+                if n == 0:
+                    continue
+                keep = np.zeros(n, dtype=bool)
+                keep[min(excess, n):] = True
+                dropped += self._drop_rows(path, keep)
+                excess -= min(excess, n)
+        return dropped
+
+    def _drop_rows(self, path: str, keep: np.ndarray) -> int:
+        if not keep.any():
+            os.remove(path)
+            self._cache.pop(path, None)
+            self.manifest.remove(path)
+        else:
+            self.write_segment(self.load_segment(path).rows(keep), path=path)
+        return int(len(keep) - keep.sum())
+
+    def segments(self, since: datetime | None = None, until: datetime | None = None):
+        """Segments oldest first; with since/until, only those the manifest says overlap the range."""
+        since_us = _to_micros(since.isoformat()) if since is not None else None
+        until_us = _to_micros(until.isoformat()) if until is not None else None
+        for path in self.segment_paths():
+            if (since_us is None and until_us is None) or overlaps(self.describe(path), since_us, until_us):
+                yield self.load_segment(path)
+
+    def __len__(self) -> int:
+        return sum(self.describe(path)["rows"] for path in self.segment_paths())
+
+    def verify(self) -> list[tuple[str, str]]:
+        """(segment, problem) for segments that are unrecorded, missing or altered since written."""
+        return self.manifest.verify(self.segment_paths())
+
+    # ─────────────── Query layer ───────────────
+
+    def iter_entries(self, newest_first: bool = False):
+        paths = self.segment_paths()
+        for path in (reversed(paths) if newest_first else paths):
+            rows = self.load_segment(path).rows()
+            yield from (reversed(rows) if newest_first else rows)
+
+    def query(self, **filters) -> list[dict]:
+        """Decoded entries (oldest first) matching ColumnSegment.mask filters."""
+        results = []
+        for segment in self.segments(filters.get("since"), filters.get("until")):
+            mask = segment.mask(**filters)
+            if mask.any():
+                results.extend(segment.rows(mask))
+        return results
+
+    def count(self, **filters) -> int:
+        return sum(int(s.mask(**filters).sum())
+                   for s in self.segments(filters.get("since"), filters.get("until")))
+
+    def group_count(self, by: str | tuple, **filters) -> dict:
+        """
+        Vectorized group-by count. by is a column name, 'hour'/'day', or a tuple
+        of those; tuple keys come back as tuples, e.g. {("CleanerAgent", "BLOCKED"): 3}.
+        """
+        columns = (by,) if isinstance(by, str) else tuple(by)
+        totals = {}
+        for segment in self.segments(filters.get("since"), filters.get("until")):
+            mask = segment.mask(**filters)
+            if not mask.any():
+                continue
+            keys = [segment.group_keys(col) for col in columns]
+            combined = np.zeros(int(mask.sum()), dtype=np.int64)
+            for codes, labels in keys:
+                combined = combined * len(labels) + codes[mask]
+            uniques, counts = np.unique(combined, return_counts=True)
+            for value, n in zip(uniques.tolist(), counts.tolist()):
+                label = []
+                for _, labels in reversed(keys):
+                    value, idx = divmod(value, len(labels))
+                    label.append(str(labels[idx]))
+                key = label[0] if len(columns) == 1 else tuple(reversed(label))
+                totals[key] = totals.get(key, 0) + n
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArmorIQ history archive tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="move old history.json entries into a columnar segment")
+    compact.add_argument("--keep", type=int, default=1000, help="recent entries to keep in history.json")
+    compact.add_argument("--history", default="history.json")
+    compact.add_argument("--archive", default="history_archive")
+    verify = sub.add_parser("verify", help="check archived segments against the manifest")
+    verify.add_argument("--archive", default="history_archive")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        problems = HistoryArchive(args.archive).verify()
+        for name, problem in problems:
+            print(f"{name}: {problem}")
+        print(f"{len(problems)} problem(s) in {args.archive}/")
+        raise SystemExit(1 if problems else 0)
+
+    from history_manager import HistoryManager
+    manager = HistoryManager(args.history, archive_dir=args.archive)
+    moved = manager.compact(keep_recent=args.keep)
+    print(f"Archived {moved} entries into {args.archive}/")
+
+
+if __name__ == "__main__":
+    main()
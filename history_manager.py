@@ -1,34 +1,200 @@
 """
-History Manager: stores and retrieves decision history in history.json.
+History Manager: stores and retrieves decision history.
 Stores command, agent, action, path, risk, decision, reason, timestamp.
+Reasons given as reason codes (reasons.py) are stored as "code" + "params" and
+rendered back into "reason" by the read methods. Verified executions also
+carry a "diff" summary (workspace_snapshot.py).
+
+Storage is pluggable ("backend" in the history section of policies.json):
+  json    a bounded ring of recent entries in history.json (one writer per file);
+          older entries spill into the columnar archive (history_archive.py)
+  shards  append-only per-process shard files merged on read, safe for any
+          number of concurrent Supervisors (history_shards.py)
+  sqlite  a WAL-mode SQLite database (history.db) with batched inserts and
+          indexed queries, shared safely by concurrent Supervisors (history_sqlite.py)
+Retention limits expire archived entries by age or count.
+Nothing is read from disk until the first query or write.
 """
 
 import json
 import os
-from datetime import datetime
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
 
+from reasons import render
 
-class HistoryManager:
-    def __init__(self, history_file="history.json"):
+
+class JsonHistoryStore:
+    """Hot ring in history.json plus the columnar archive. Assumes a single writer process."""
+
+    def __init__(self, history_file="history.json", archive_dir="history_archive", hot_limit=1000):
         self.history_file = history_file
-        self.history = self._load()
+        self.archive_dir = archive_dir
+        self.hot_limit = hot_limit
+        self._history = None
+        self._archive = None
+
+    @property
+    def history(self) -> deque:
+        """Hot ring of recent entries, loaded from history.json on first access."""
+        if self._history is None:
+            self._history = deque(self._load(), maxlen=self.hot_limit)
+        return self._history
+
+    @property
+    def archive(self):
+        if self._archive is None:
+            from history_archive import HistoryArchive  # defers the NumPy import
+            self._archive = HistoryArchive(self.archive_dir)
+        return self._archive
+
+    def _has_archive(self) -> bool:
+        return os.path.isdir(self.archive_dir) and any(
+            name.startswith("segment_") for name in os.listdir(self.archive_dir))   # not just its manifest
 
     def _load(self) -> list:
         if os.path.exists(self.history_file):
             try:
                 with open(self.history_file, 'r') as f:
-                    return json.load(f)
+                    entries = json.load(f)
             except Exception:
                 return []
+            # Files written before the hot ring existed may exceed it: spill the overflow once
+            if len(entries) > self.hot_limit:
+                self.archive.write_segment(entries[:-self.hot_limit])
+                entries = entries[-self.hot_limit:]
+                with open(self.history_file, 'w') as f:
+                    json.dump(entries, f, indent=2)   # or the next load would archive them again
+            return entries
         return []
 
     def _save(self):
         with open(self.history_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
+            json.dump(list(self.history), f, indent=2)
+
+    def append(self, entry: dict):
+        if len(self.history) == self.hot_limit:
+            self._spill(len(self.history) - self.hot_limit // 2)
+        self.history.append(entry)
+        self._save()
+
+    def is_empty(self) -> bool:
+        return not self.history and not self._has_archive()
+
+    def _spill(self, count: int) -> int:
+        """Move the oldest count hot entries into the archive."""
+        if count <= 0:
+            return 0
+        self.archive.write_segment(list(islice(self.history, count)))
+        for _ in range(count):
+            self.history.popleft()
+        return count
+
+    def compact(self, keep_recent: int = 1000) -> int:
+        """Move all but the newest keep_recent entries into the columnar archive."""
+        moved = self._spill(len(self.history) - keep_recent)
+        if moved:
+            self._save()
+        return moved
+
+    def expire(self, cutoff: datetime | None, max_entries: int | None) -> int:
+        max_archived = None
+        if max_entries is not None:
+            max_archived = max(max_entries - len(self.history), 0)
+        dropped = 0
+        if self._has_archive():
+            dropped = self.archive.expire(before=cutoff, max_rows=max_archived)
+
+        if cutoff is not None:
+            stale = 0
+            for entry in self.history:
+                if entry.get("timestamp", "") >= cutoff.isoformat():
+                    break
+                stale += 1
+            for _ in range(stale):
+                self.history.popleft()
+            if stale:
+                self._save()
+            dropped += stale
+        return dropped
+
+    def iter_entries(self):
+        """Yield every entry oldest first: archived segments, then the hot ring."""
+        if self._has_archive():
+            yield from self.archive.iter_entries()
+        yield from list(self.history)
+
+    def iter_recent(self):
+        """Yield entries newest first, touching archived segments only when reached."""
+        yield from reversed(list(self.history))
+        if self._has_archive():
+            yield from self.archive.iter_entries(newest_first=True)
+
+    def iter_segments(self, chunk_size: int = 100_000):
+        """Every entry as columnar segments: archived segments as stored, then the hot ring."""
+        from history_archive import segments_of
+        if self._has_archive():
+            yield from self.archive.segments()
+        yield from segments_of(list(self.history), chunk_size)
+
+
+class HistoryManager:
+    def __init__(self, history_file="history.json", rollup_file="rollups.json",
+                 archive_dir="history_archive", hot_limit=1000,
+                 max_entries=None, max_age_days=None,
+                 backend="json", shard_dir="history_shards", db_file="history.db"):
+        self.history_file = history_file
+        self.rollup_file = rollup_file
+        self.archive_dir = archive_dir
+        self.hot_limit = hot_limit
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.backend = backend
+        self.shard_dir = shard_dir
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._stop_maintenance = None
+        self._store = None
+        self._rollups = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._open_store()
+        return self._store
+
+    def _open_store(self):
+        if self.backend == "json":
+            return JsonHistoryStore(self.history_file, self.archive_dir, self.hot_limit)
+        if self.backend == "shards":
+            from history_shards import ShardedHistoryStore
+            return ShardedHistoryStore(self.shard_dir, self.archive_dir, legacy_file=self.history_file)
+        if self.backend == "sqlite":
+            from history_sqlite import SQLiteHistoryStore
+            return SQLiteHistoryStore(self.db_file, legacy_file=self.history_file, archive_dir=self.archive_dir,
+                                      shard_dir=self.shard_dir)
+        raise ValueError(f"Unknown history backend: {self.backend!r}")
+
+    @property
+    def rollups(self):
+        if self._rollups is None:
+            from analytics import RollupStore
+            rollups = RollupStore(self.rollup_file, writer_id=getattr(self.store, "writer_id", None))
+            if not rollups.buckets and not self.store.is_empty():
+                rollups.rebuild_segments(self.store.iter_segments())
+            self._rollups = rollups
+        return self._rollups
 
     def add_entry(self, command: str, agent: str, action_type: str, path: str,
-                  risk: str, decision: str, reason: str):
-        """Add a history entry with all observability fields."""
+                  risk: str, decision: str, reason, diff: dict | None = None):
+        """
+        Add a history entry with all observability fields (reason: text or a reason code;
+        diff: the post-execution verification summary, if the action was verified).
+        """
         entry = {
             "timestamp": datetime.now().isoformat(),
             "command": command,
@@ -37,22 +203,97 @@ class HistoryManager:
             "path": path,
             "risk": risk,
             "decision": decision,
-            "reason": reason
         }
-        self.history.append(entry)
-        self._save()
+        if isinstance(reason, str):
+            entry["reason"] = reason
+        else:
+            entry["code"] = reason[0]
+            if len(reason) > 1:
+                entry["params"] = reason[1:]
+        if diff is not None:
+            entry["diff"] = diff
+        with self._lock:
+            rollups = self.rollups   # any backfill must run before this entry is stored
+            self.store.append(entry)
+            rollups.record(entry)
+
+    def flush(self):
+        """Write entries a batching backend is still buffering (one transaction per call)."""
+        if self._store is not None and hasattr(self._store, "flush"):
+            self._store.flush()
 
-    def get_all(self) -> list:
-        """Return all history entries (newest first)."""
-        return list(reversed(self.history))
+    # ─────────────── Compaction & retention ───────────────
+
+    def compact(self, keep_recent: int = 1000) -> int:
+        """Move older entries into the columnar archive; returns how many moved."""
+        with self._lock:
+            return self.store.compact(keep_recent)
+
+    def expire(self) -> int:
+        """Apply retention (max_age_days / max_entries); returns the number of entries dropped."""
+        with self._lock:
+            cutoff = None
+            if self.max_age_days is not None:
+                cutoff = datetime.now() - timedelta(days=self.max_age_days)
+            dropped = self.store.expire(cutoff, self.max_entries)
+            if cutoff is not None:
+                self.rollups.prune(cutoff)
+            return dropped
+
+    def maintain(self, keep_recent: int | None = None) -> tuple[int, int]:
+        """One compaction + expiry pass. Returns (archived, expired)."""
+        keep = self.hot_limit // 2 if keep_recent is None else keep_recent
+        if getattr(self.store, "writer_id", None) is not None:
+            from history_shards import writer_is_dead
+            self.rollups.fold_deltas(writer_is_dead)
+        return self.compact(keep), self.expire()
+
+    def start_maintenance(self, interval_seconds: float = 300):
+        """Run maintain() periodically on a daemon thread until stop_maintenance()."""
+        if self._stop_maintenance is not None:
+            return
+        stop = self._stop_maintenance = threading.Event()
+
+        def loop():
+            while not stop.wait(interval_seconds):
+                try:
+                    self.maintain()
+                except Exception:
+                    pass  # maintenance must never take down the supervisor
+
+        threading.Thread(target=loop, name="history-maintenance", daemon=True).start()
+
+    def stop_maintenance(self):
+        if self._stop_maintenance is not None:
+            self._stop_maintenance.set()
+            self._stop_maintenance = None
+
+    # ─────────────── Reads ───────────────
+
+    def iter_entries(self):
+        """Yield every entry oldest first, across every storage tier."""
+        return map(_with_reason, self.store.iter_entries())
+
+    def iter_recent(self):
+        """Yield entries newest first, reading older tiers only when reached."""
+        return map(_with_reason, self.store.iter_recent())
+
+    def iter_segments(self, chunk_size: int = 100_000):
+        """Every entry as columnar ColumnSegment batches, in storage order rather than
+        timeline order (for bulk, order-independent analysis such as policy replay)."""
+        return self.store.iter_segments(chunk_size)
+
+    def get_all(self, limit: int | None = None) -> list:
+        """Return history entries (newest first), archived entries included, up to limit."""
+        return list(islice(self.iter_recent(), limit))
 
     def show_history(self):
         """Print history to console with backward-compatible field access."""
-        if not self.history:
+        if self.store.is_empty():
             print("No history available.")
             return
         print("\n--- Execution History ---")
-        for idx, entry in enumerate(self.history, 1):
+        for idx, entry in enumerate(self.iter_entries(), 1):
             timestamp = entry.get("timestamp", "N/A")
             command   = entry.get("command",   entry.get("action", "N/A"))
             agent     = entry.get("agent",     "N/A")
@@ -74,6 +315,17 @@ class HistoryManager:
                 else:
                     path = "N/A"
 
-            print(f"{idx}. [{timestamp}] | Cmd: {command} | Agent: {agent} | "
-                  f"Action: {action} | Path: {path} | Risk: {risk} | Decision: {decision}")
+            line = (f"{idx}. [{timestamp}] | Cmd: {command} | Agent: {agent} | "
+                    f"Action: {action} | Path: {path} | Risk: {risk} | Decision: {decision}")
+            if isinstance(entry.get("diff"), dict):
+                from workspace_snapshot import format_summary
+                line += f" | Changes: {format_summary(entry['diff'])}"
+            print(line)
         print()
+
+
+def _with_reason(entry: dict) -> dict:
+    """Entry with "reason" rendered from its stored code (a copy; stored entries stay compact)."""
+    if "code" not in entry or "reason" in entry:
+        return entry
+    return dict(entry, reason=render((entry["code"], *entry.get("params", ()))))
@@ -0,0 +1,331 @@
+"""
+History Shards: multi-writer history storage.
+
+Every writer (one per HistoryManager) appends JSON lines to its own shard file,
+opened O_APPEND and written with one os.write per entry, so concurrent
+Supervisors never lock, read-modify-write or overwrite each other's files.
+Each stored line carries its writer id and a per-writer monotonic sequence
+number (nanoseconds since the epoch, bumped past the previous value). Readers
+stream every shard, merge them on (seq, writer) into one global timeline and
+drop both fields, so entries read back as they were added.
+
+A shard is sealed (renamed *.sealed) when it fills up, at compaction or when its
+process exits; compact() claims sealed shards, and shards left by dead
+processes, with an atomic rename and folds them into the columnar archive.
+"""
+
+import atexit
+import heapq
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime
+
+
+LIVE_SUFFIX   = ".jsonl"
+SEALED_SUFFIX = ".sealed"
+CLAIM_SUFFIX  = ".claimed"
+LEGACY_MARKER = ".legacy-imported"
+_SHARD_NAME   = re.compile(r"^w(\d+)-[0-9a-f]+-(?:\d+|legacy)@(.+?)(\.jsonl|\.sealed)(?:\.(\d+)\.claimed)?$")
+_CLAIM_TAG    = re.compile(r"\.\d+\.claimed$")
+HOSTNAME      = socket.gethostname()
+
+_open_stores = weakref.WeakSet()   # sealed once at exit, without pinning stores
+
+
+@atexit.register
+def _close_open_stores():
+    for store in list(_open_stores):
+        store.close()
+
+
+def _order(entry: dict) -> tuple:
+    return entry.get("seq", 0), entry.get("writer", "")
+
+
+def _timestamp(entry: dict) -> str:
+    return entry.get("timestamp", "")
+
+
+def _strip(entries):
+    """Entries without the shard ordering fields (seq, writer)."""
+    for entry in entries:
+        entry.pop("seq", None)
+        entry.pop("writer", None)
+        yield entry
+
+
+def _reversed_lines(f, block_size: int = 1 << 16):
+    """Complete lines of a binary file, last first, read backwards in blocks."""
+    end = f.seek(0, os.SEEK_END)
+    head = None   # bytes before the earliest newline read so far (None until one is read)
+    while end > 0:
+        start = max(0, end - block_size)
+        f.seek(start)
+        parts = f.read(end - start).split(b"\n")
+        end = start
+        if head is None:
+            if len(parts) == 1:
+                continue   # still inside an incomplete last line
+            lines = parts[1:-1]
+        else:
+            parts[-1] += head
+            lines = parts[1:]
+        head = parts[0]
+        yield from reversed(lines)
+    if head:
+        yield head
+
+
+def _count_lines(path: str, start: int = 0) -> int:
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+    except FileNotFoundError:
+        return 0
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def writer_is_dead(writer_id: str) -> bool:
+    """Whether the writer ("host:pid:token") was a process on this host that has exited."""
+    host, _, rest = writer_id.rpartition(":")[0].rpartition(":")
+    try:
+        return host == HOSTNAME and not _alive(int(rest))
+    except ValueError:
+        return False
+
+
+class ShardedHistoryStore:
+    def __init__(self, shard_dir="history_shards", archive_dir="history_archive",
+                 legacy_file=None, shard_max_entries=10000):
+        self.shard_dir = shard_dir
+        self.archive_dir = archive_dir
+        self.shard_max_entries = shard_max_entries
+        token = uuid.uuid4().hex[:8]
+        self.writer_id = f"{HOSTNAME}:{os.getpid()}:{token}"
+        self._name_prefix = f"w{os.getpid()}-{token}"
+        self._lock = threading.Lock()   # orders seq and rotation among this writer's threads only
+        self._fd = None
+        self._path = None
+        self._count = 0
+        self._shard_no = 0
+        self._last_seq = 0
+        self._archive = None
+        self._line_counts = {}          # shard path -> (bytes counted, complete lines)
+        os.makedirs(shard_dir, exist_ok=True)
+        if legacy_file:
+            self._import_legacy(legacy_file)
+        _open_stores.add(self)
+
+    @property
+    def archive(self):
+        if self._archive is None:
+            from history_archive import HistoryArchive  # defers the NumPy import
+            self._archive = HistoryArchive(self.archive_dir)
+        return self._archive
+
+    def _has_archive(self) -> bool:
+        return os.path.isdir(self.archive_dir) and any(
+            name.startswith("segment_") for name in os.listdir(self.archive_dir))   # not just its manifest
+
+    # ─────────────── Writes ───────────────
+
+    def append(self, entry: dict):
+        with self._lock:
+            seq = max(time.time_ns(), self._last_seq + 1)
+            self._last_seq = seq
+            data = (json.dumps(dict(entry, seq=seq, writer=self.writer_id),
+                               separators=(",", ":")) + "\n").encode("utf-8")
+            if self._fd is None:
+                self._path = os.path.join(
+                    self.shard_dir, f"{self._name_prefix}-{self._shard_no:04d}@{HOSTNAME}{LIVE_SUFFIX}")
+                self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._count += 1
+            if self._count >= self.shard_max_entries:
+                self._seal()
+
+    def _seal(self):
+        """Close the live shard and mark it sealed (caller holds the lock)."""
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        if self._count:
+            os.replace(self._path, self._path[:-len(LIVE_SUFFIX)] + SEALED_SUFFIX)
+        else:
+            os.remove(self._path)
+        self._count = 0
+        self._shard_no += 1
+
+    def close(self):
+        with self._lock:
+            self._seal()
+
+    def _import_legacy(self, legacy_file: str):
+        """One-time import of a json-backend history.json as a sealed shard."""
+        marker = os.path.join(self.shard_dir, LEGACY_MARKER)
+        if os.path.exists(marker) or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        shard = os.path.join(self.shard_dir, f"{self._name_prefix}-legacy@{HOSTNAME}{SEALED_SUFFIX}")
+        with open(shard + ".tmp", 'w') as f:
+            for i, entry in enumerate(entries):
+                try:
+                    seq = int(datetime.fromisoformat(entry["timestamp"]).timestamp() * 1e9)
+                except (KeyError, TypeError, ValueError):
+                    seq = i
+                f.write(json.dumps(dict(entry, seq=seq, writer="legacy"), separators=(",", ":")) + "\n")
+        os.replace(shard + ".tmp", shard)
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            os.remove(shard)   # another writer imported it first
+
+    # ─────────────── Compaction & retention ───────────────
+
+    def _shard_files(self) -> list[str]:
+        return [os.path.join(self.shard_dir, name) for name in os.listdir(self.shard_dir)
+                if name.endswith((LIVE_SUFFIX, SEALED_SUFFIX, CLAIM_SUFFIX))]
+
+    def _compactable(self) -> list[str]:
+        """Sealed shards, plus live or claimed shards whose owning process has died."""
+        paths = []
+        for path in self._shard_files():
+            name = os.path.basename(path)
+            if name.endswith(SEALED_SUFFIX):
+                paths.append(path)
+                continue
+            match = _SHARD_NAME.match(name)
+            if not match or match.group(2) != HOSTNAME or path == self._path:
+                continue
+            owner = int(match.group(4) or match.group(1))
+            if not _alive(owner):
+                paths.append(path)
+        return paths
+
+    def compact(self, keep_recent: int = 0) -> int:
+        """
+        Seal this writer's shard if it holds more than keep_recent entries, then fold
+        every compactable shard into the archive. Returns the number of entries moved.
+        """
+        with self._lock:
+            if self._count > keep_recent:
+                self._seal()
+        claimed = []
+        for path in self._compactable():
+            target = f"{_CLAIM_TAG.sub('', path)}.{os.getpid()}{CLAIM_SUFFIX}"
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue   # claimed by another process
+            claimed.append(target)
+        if not claimed:
+            return 0
+        # One time-ordered segment per pass keeps the archive in timeline order
+        entries = list(_strip(heapq.merge(*(self._read_shard(p) for p in claimed), key=_order)))
+        with self.archive.locked():   # retention never sees these entries in both places
+            self.archive.write_segment(entries)
+            for path in claimed:
+                os.remove(path)
+        return len(entries)
+
+    def expire(self, cutoff: datetime | None, max_entries: int | None) -> int:
+        """
+        Retention applies to archived entries; shards reach the archive at compaction.
+        The whole pass holds the archive lock, so no compaction lands between counting
+        and dropping.
+        """
+        if not self._has_archive():
+            return 0
+        with self.archive.locked():
+            max_archived = None
+            if max_entries is not None:
+                max_archived = max(max_entries - self._entries_in_shards(), 0)
+            return self.archive.expire(before=cutoff, max_rows=max_archived)
+
+    def _entries_in_shards(self) -> int:
+        """Complete lines across all shards. Shards only grow, so only new bytes are counted."""
+        counts = {}
+        for path in self._shard_files():
+            size = _size(path)
+            counted, lines = self._line_counts.get(path, (0, 0))
+            if size < counted:
+                counted, lines = 0, 0
+            counts[path] = (size, lines + _count_lines(path, counted)) if size > counted else (counted, lines)
+        self._line_counts = counts
+        return sum(lines for _, lines in counts.values())
+
+    # ─────────────── Reads ───────────────
+
+    @staticmethod
+    def _read_shard(path: str, newest_first: bool = False):
+        """Complete entries of one shard, streamed (a line still being appended is skipped)."""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            lines = _reversed_lines(f) if newest_first else (line for line in f if line.endswith(b"\n"))
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def is_empty(self) -> bool:
+        return not any(_size(p) for p in self._shard_files()) and not self._has_archive()
+
+    def iter_entries(self):
+        """Every entry oldest first: shards merged on (seq, writer), interleaved with the archive."""
+        shards = _strip(heapq.merge(*(self._read_shard(p) for p in self._shard_files()), key=_order))
+        if self._has_archive():
+            yield from _strip(heapq.merge(self.archive.iter_entries(), shards, key=_timestamp))
+        else:
+            yield from shards
+
+    def iter_segments(self, chunk_size: int = 100_000):
+        """Every entry as columnar segments (archive first, then shards; not timeline order)."""
+        from history_archive import segments_of
+        if self._has_archive():
+            yield from self.archive.segments()
+        yield from segments_of(_strip(entry for path in self._shard_files() for entry in self._read_shard(path)),
+                               chunk_size)
+
+    def iter_recent(self):
+        """Every entry newest first."""
+        shards = _strip(heapq.merge(*(self._read_shard(p, newest_first=True) for p in self._shard_files()),
+                                    key=_order, reverse=True))
+        if self._has_archive():
+            yield from _strip(heapq.merge(shards, self.archive.iter_entries(newest_first=True),
+                                          key=_timestamp, reverse=True))   # archives written before stripping
+        else:
+            yield from shards
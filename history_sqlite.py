@@ -0,0 +1,296 @@
+"""
+History SQLite: history storage in a SQLite database (history.db).
+
+The database runs in WAL mode, so readers never block the writer and several
+Supervisor processes can share one file. Entries are buffered and inserted in
+batches inside one transaction (flush() after each command, when batch_size is
+reached, before any read and at exit). Every statement is a constant,
+parameterized SQL string, so sqlite3 prepares it once per connection and reuses
+it from its statement cache. timestamp, agent and decision are indexed for
+partial reads via query().
+
+On first open, an existing json- or shards-backend history (history_archive/
+segments, unfolded history_shards/ files and history.json) is imported in the
+same transaction that records the import, so a crash mid-import leaves neither
+and the next open retries it; a history.json file can also be imported from
+the CLI:
+  python history_sqlite.py import --history history.json --db history.db
+"""
+
+import argparse
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime
+
+
+ENTRY_FIELDS = ("timestamp", "command", "agent", "action", "path", "risk", "decision", "reason")
+PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    command   TEXT,
+    agent     TEXT,
+    action    TEXT,
+    path      TEXT,
+    risk      TEXT,
+    decision  TEXT,
+    reason    TEXT,
+    extra     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_agent     ON history(agent, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_decision  ON history(decision, timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS      = "timestamp, command, agent, action, path, risk, decision, reason, extra"
+INSERT_SQL   = f"INSERT INTO history ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+FORWARD_SQL  = f"SELECT id, {COLUMNS} FROM history WHERE id > ? ORDER BY id LIMIT ?"
+BACKWARD_SQL = f"SELECT id, {COLUMNS} FROM history WHERE id < ? ORDER BY id DESC LIMIT ?"
+
+_open_stores = weakref.WeakSet()   # flushed once at exit, without pinning stores
+
+
+@atexit.register
+def _flush_open_stores():
+    for store in list(_open_stores):
+        store.flush()
+
+
+def _row(entry: dict) -> tuple:
+    extra = {k: v for k, v in entry.items() if k not in ENTRY_FIELDS}
+    values = [None if entry.get(f) is None else str(entry[f]) for f in ENTRY_FIELDS]
+    return (*values, json.dumps(extra) if extra else None)
+
+
+def _row_batches(entries, batch_size: int):
+    """Rows of an iterable of entries, in lists of up to batch_size."""
+    batch = []
+    for entry in entries:
+        batch.append(_row(entry))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _entry(row: tuple) -> dict:
+    """Rebuild the original entry: absent fields stay absent, extra keys come back."""
+    entry = {f: v for f, v in zip(ENTRY_FIELDS, row[1:-1]) if v is not None}
+    if row[-1]:
+        entry.update(json.loads(row[-1]))
+    return entry
+
+
+class SQLiteHistoryStore:
+    def __init__(self, db_file="history.db", legacy_file=None, archive_dir=None, shard_dir=None,
+                 batch_size=100, flush_interval=1.0):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.RLock()
+        self._pending = []
+        self._pending_since = 0.0
+        self._conn = sqlite3.connect(db_file, timeout=10, check_same_thread=False,
+                                     isolation_level=None, cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._import_legacy(legacy_file, archive_dir, shard_dir)
+        _open_stores.add(self)
+
+    # ─────────────── Writes ───────────────
+
+    def append(self, entry: dict):
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(_row(entry))
+            if len(self._pending) >= self.batch_size or \
+                    time.monotonic() - self._pending_since >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """Insert buffered entries in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            self._insert(rows)
+
+    def _insert(self, rows: list):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(INSERT_SQL, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def import_entries(self, entries, batch_size: int = 1000) -> int:
+        """Bulk-insert an iterable of history entries; returns how many were added."""
+        self.flush()
+        count = 0
+        for batch in _row_batches(entries, batch_size):
+            self._insert(batch)
+            count += len(batch)
+        return count
+
+    def _import_legacy(self, legacy_file: str | None, archive_dir: str | None, shard_dir: str | None = None):
+        """One-time import of a json- or shards-backend history (archive segments and shards, then history.json)."""
+        done_sql = "SELECT value FROM meta WHERE key = 'legacy_imported'"
+        with self._lock:
+            if self._conn.execute(done_sql).fetchone():
+                return
+            # Marker and rows commit together: one process imports, and a failed import is retried
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute(done_sql).fetchone() is None:
+                    for batch in _row_batches(self._legacy_entries(legacy_file, archive_dir, shard_dir), 1000):
+                        self._conn.executemany(INSERT_SQL, batch)
+                    self._conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                                       (datetime.now().isoformat(),))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _legacy_entries(legacy_file: str | None, archive_dir: str | None, shard_dir: str | None):
+        """Entries of the history being replaced, in the order they are imported."""
+        if shard_dir and os.path.isdir(shard_dir):
+            from history_shards import LEGACY_MARKER, ShardedHistoryStore
+            # Archive and unfolded shards, merged into one timeline (the store is only read)
+            yield from ShardedHistoryStore(shard_dir, archive_dir or "history_archive").iter_entries()
+            if os.path.exists(os.path.join(shard_dir, LEGACY_MARKER)):
+                legacy_file = None   # the shards backend already imported it
+        elif archive_dir and os.path.isdir(archive_dir) and os.listdir(archive_dir):
+            from history_archive import HistoryArchive  # defers the NumPy import
+            yield from HistoryArchive(archive_dir).iter_entries()
+        if legacy_file and os.path.exists(legacy_file):
+            yield from _read_json(legacy_file)
+
+    # ─────────────── Compaction & retention ───────────────
+
+    def compact(self, keep_recent: int = 0) -> int:
+        """Nothing to move between tiers; checkpoint the WAL so it does not grow unbounded."""
+        self.flush()
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return 0
+
+    def expire(self, cutoff: datetime | None, max_entries: int | None) -> int:
+        self.flush()
+        dropped = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            if cutoff is not None:
+                dropped += self._conn.execute(
+                    "DELETE FROM history WHERE timestamp < ?", (cutoff.isoformat(),)).rowcount
+            if max_entries is not None:
+                dropped += self._conn.execute(
+                    "DELETE FROM history WHERE id <= "
+                    "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)", (max_entries,)).rowcount
+            self._conn.execute("COMMIT")
+        return dropped
+
+    # ─────────────── Reads ───────────────
+
+    def is_empty(self) -> bool:
+        self.flush()
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None
+
+    def _pages(self, sql: str, start: int):
+        """Keyset pagination by id, so no cursor stays open between pages."""
+        self.flush()
+        last = start
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, (last, PAGE_SIZE)).fetchall()
+            yield from (_entry(row) for row in rows)
+            if len(rows) < PAGE_SIZE:
+                return
+            last = rows[-1][0]
+
+    def iter_entries(self):
+        """Every entry oldest first (insertion order)."""
+        return self._pages(FORWARD_SQL, 0)
+
+    def iter_recent(self):
+        """Every entry newest first."""
+        return self._pages(BACKWARD_SQL, 2 ** 63 - 1)
+
+    def iter_segments(self, chunk_size: int = 100_000):
+        """Every entry as columnar segments, oldest first."""
+        from history_archive import segments_of
+        return segments_of(self.iter_entries(), chunk_size)
+
+    def query(self, since: datetime | None = None, until: datetime | None = None,
+              agent: str | None = None, decision: str | None = None,
+              limit: int | None = None) -> list[dict]:
+        """Entries matching every given filter, newest first (served from the indexes)."""
+        self.flush()
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until.isoformat())
+        if agent is not None:
+            clauses.append("agent = ?")
+            params.append(agent)
+        if decision is not None:
+            clauses.append("decision = ?")
+            params.append(decision)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(-1 if limit is None else limit)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, {COLUMNS} FROM history {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params).fetchall()
+        return [_entry(row) for row in rows]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def _read_json(path: str) -> list:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArmorIQ SQLite history tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="import a history.json file into the database")
+    imp.add_argument("--history", default="history.json")
+    imp.add_argument("--db", default="history.db")
+    args = parser.parse_args()
+
+    store = SQLiteHistoryStore(args.db)
+    added = store.import_entries(_read_json(args.history))
+    store.close()
+    print(f"Imported {added} entries from {args.history} into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Job Queue: runs long-running Executor actions (bulk deletes, large moves) on
+background worker threads so the Supervisor returns a decision immediately.
+
+Each job has an id, a status (queued / running / succeeded / failed /
+cancelled / interrupted), progress, and a cancel flag the Executor checks
+between files. Job state is persisted to jobs.json so the dashboard and CLI
+can poll it; jobs left queued or running by a previous process are marked
+interrupted on load. With a scheduler (rate_limiter.AgentScheduler), a worker
+holds an Executor slot, taken in weighted-fair order, while it runs a job, like
+synchronous steps do. Quota admitted at decision time is released by the job's
+on_finish callback.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled", "interrupted")
+PROGRESS_SAVE_INTERVAL = 0.5   # seconds between persisted progress updates
+
+
+class JobQueue:
+    def __init__(self, executor, state_file="jobs.json", workers=2, max_jobs=200, scheduler=None):
+        self.executor = executor
+        self.scheduler = scheduler
+        self.state_file = state_file
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()   # job id -> job dict, oldest first
+        self._cancel = {}            # job id -> threading.Event
+        self._on_finish = {}         # job id -> callback(job)
+        self._costs = {}             # job id -> estimated bytes, for the scheduler
+        self._pending = queue.Queue()
+        self._last_save = 0.0
+        self._load()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"armoriq-job-{i}", daemon=True).start()
+
+    # ─────────────── Persistence ───────────────
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                jobs = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        for job in jobs:
+            if job.get("status") not in FINISHED_STATES:
+                job["status"] = "interrupted"
+                job["message"] = "Supervisor stopped before the job finished"
+                job["finished"] = job.get("finished") or _now()
+            self._jobs[job["id"]] = job
+
+    def _save(self):
+        """Write all jobs to state_file (tmp file + rename). Caller holds the lock."""
+        self._last_save = time.monotonic()
+        tmp_path = self.state_file + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._jobs.values()), f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except OSError:
+            pass
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond max_jobs. Caller holds the lock."""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in FINISHED_STATES][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    # ─────────────── Public API ───────────────
+
+    def submit(self, action: dict, agent: str, on_finish=None, cost_bytes: int = 0) -> str:
+        """
+        Queue action for background execution and return its job id.
+        on_finish(job) is called exactly once, on the thread that finishes the job,
+        whether it ran, failed or was cancelled before starting.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id":       job_id,
+            "agent":    agent,
+            "action":   dict(action),
+            "status":   "queued",
+            "progress": 0.0,
+            "message":  "",
+            "created":  _now(),
+            "started":  None,
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cancel[job_id] = threading.Event()
+            self._costs[job_id] = cost_bytes
+            if on_finish is not None:
+                self._on_finish[job_id] = on_finish
+            self._trim()
+            self._save()
+        self._pending.put(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, limit: int | None = None) -> list[dict]:
+        """Jobs newest first."""
+        with self._lock:
+            jobs = [dict(job) for job in reversed(self._jobs.values())]
+        return jobs[:limit] if limit is not None else jobs
+
+    def active(self) -> list[dict]:
+        return [job for job in self.list_jobs() if job["status"] in ("queued", "running")]
+
+    def cancel(self, job_id: str) -> tuple[bool, str]:
+        """Cancel a queued job outright, or ask a running one to stop at the next file."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False, f"No such job: {job_id}"
+            if job["status"] in FINISHED_STATES:
+                return False, f"Job {job_id} already {job['status']}"
+            self._cancel[job_id].set()
+            if job["status"] == "running":
+                return True, f"Cancellation requested for running job {job_id}"
+            self._finish(job, "cancelled", "Cancelled before it started")
+        self._notify(job_id)
+        return True, f"Cancelled queued job {job_id}"
+
+    # ─────────────── Workers ───────────────
+
+    def _work(self):
+        while True:
+            job_id = self._pending.get()
+            entered = self._enter_slot(job_id)
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    if entered:
+                        self.scheduler.leave()   # cancelled while waiting for the slot
+                    continue   # cancelled while queued
+                job["status"] = "running"
+                job["started"] = _now()
+                cancel = self._cancel[job_id]
+                self._save()
+
+            def progress(done, total, job=job):
+                with self._lock:
+                    job["progress"] = round(done / total, 4) if total else 1.0
+                    if time.monotonic() - self._last_save >= PROGRESS_SAVE_INTERVAL:
+                        self._save()
+
+            try:
+                success, msg = self.executor.execute(job["action"], progress=progress, cancel=cancel)
+            except Exception as e:
+                success, msg = False, f"Execution error: {e}"
+            finally:
+                if entered:
+                    self.scheduler.leave()
+
+            with self._lock:
+                if success:
+                    status = "succeeded"
+                    job["progress"] = 1.0
+                else:
+                    status = "cancelled" if cancel.is_set() else "failed"
+                self._finish(job, status, msg)
+            self._notify(job_id)
+
+    def _enter_slot(self, job_id: str) -> bool:
+        """Wait for an Executor slot for a still-queued job. Returns whether one was taken."""
+        if self.scheduler is None:
+            return False
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return False
+            agent, cost_bytes = job["agent"], self._costs.get(job_id, 0)
+        self.scheduler.enter(agent, cost_bytes)
+        return True
+
+    def _finish(self, job: dict, status: str, message: str):
+        """Record a final state. Caller holds the lock."""
+        job["status"] = status
+        job["message"] = message
+        job["finished"] = _now()
+        self._cancel.pop(job["id"], None)
+        self._costs.pop(job["id"], None)
+        self._save()
+
+    def _notify(self, job_id: str):
+        callback = self._on_finish.pop(job_id, None)
+        if callback is not None:
+            callback(self.get(job_id))
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_job_queue(executor, workers: int = 2, scheduler=None) -> JobQueue:
+    """Process-wide job queue, so every Supervisor (CLI, each Streamlit session) sees the same jobs."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JobQueue(executor, workers=workers, scheduler=scheduler)
+        return _shared
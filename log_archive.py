@@ -0,0 +1,364 @@
+"""
+Log Archive: size/time-based rotation of logs.txt with background compression.
+
+RotatingLogHandler writes logs.txt the way logging.FileHandler does. Once the
+file passes max_bytes, or its first record is older than rotate_seconds, the
+handler renames it into logs_archive/. A background thread then compresses
+that segment: with gzip, or with zstd if the zstandard package is installed
+and compression is "zstd". The thread also records the segment in the archive
+manifest (archive_manifest.py) with its line count, time range, raw size and
+the SHA-256 of the raw text, so the compressed archive remains a verifiable
+audit trail.
+
+iter_lines() and tail() stream the segments, decompressing on the fly, and
+then the live file. A reader never holds more than one segment's buffer (or
+the requested tail) in memory.
+
+Rotation assumes one writing process per log file, like
+logging.handlers.RotatingFileHandler. Other processes notice the rename and
+reopen logs.txt. Segments are compressed only after a grace period, so
+records already in flight still land in them.
+
+Usage:
+    python log_archive.py cat [--since "2026-10-01 00:00"] [--grep BLOCKED] [--tail 100]
+    python log_archive.py rotate | compress | verify
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from archive_manifest import SegmentManifest
+
+
+RAW_SUFFIX   = ".log"
+CODECS       = {"gzip": ".gz", "zstd": ".zst"}
+STAMP_LEN    = 19            # "YYYY-MM-DD HH:MM:SS" prefix of every record (asctime)
+STAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_codec(compression: str) -> str:
+    """compression if usable here, else gzip (zstd needs the optional zstandard package)."""
+    if compression == "zstd" and _zstandard() is None:
+        return "gzip"
+    if compression not in CODECS:
+        raise ValueError(f"Unknown log compression: {compression!r}")
+    return compression
+
+
+def _stamp(line: str) -> str | None:
+    """The record's 'YYYY-MM-DD HH:MM:SS' prefix, or None for a continuation line."""
+    head = line[:STAMP_LEN]
+    if len(head) == STAMP_LEN and head[4] == "-" and head[10] == " " and head[:4].isdigit():
+        return head
+    return None
+
+
+# ─────────────── Writing ───────────────
+
+class RotatingLogHandler(logging.FileHandler):
+    def __init__(self, filename="logs.txt", archive_dir="logs_archive", max_bytes=10 * 2**20,
+                 rotate_seconds=None, compression="gzip", grace_seconds=2.0):
+        super().__init__(filename, mode='a', encoding="utf-8", delay=True)
+        self.archive_dir = archive_dir
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.codec = available_codec(compression)
+        self.grace_seconds = grace_seconds
+        self._first_at = None       # epoch seconds of the live file's first record
+        self._checked = 0.0
+        self._seq = 0
+        self._compressor = None
+
+    def _open(self):
+        stream = super()._open()
+        self._first_at = _first_record_time(self.baseFilename) if stream.tell() else None
+        if self._compressor is None and any(p.endswith(RAW_SUFFIX) for p in segment_paths(self.archive_dir)):
+            self._compress_later()   # segments a previous run rotated but did not compress
+        return stream
+
+    def emit(self, record):
+        if self.stream is not None:
+            try:
+                self._reopen_if_moved(record.created)
+                if self.stream is not None and self._due(record.created):
+                    self.rotate()
+            except OSError:
+                self.handleError(record)
+        super().emit(record)
+        if self._first_at is None:
+            self._first_at = record.created
+
+    def _due(self, now: float) -> bool:
+        if self.max_bytes and self.stream.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds and self._first_at and now - self._first_at >= self.rotate_seconds)
+
+    def _reopen_if_moved(self, now: float):
+        """Another process rotated the file: continue in the new one (checked once a second)."""
+        if now - self._checked < 1.0:
+            return
+        self._checked = now
+        try:
+            moved = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.stream.close()
+            self.stream = None   # reopened by FileHandler.emit
+
+    def rotate(self) -> str | None:
+        """Move the live file into the archive and compress it in the background; returns its path."""
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            if not os.path.exists(self.baseFilename) or not os.path.getsize(self.baseFilename):
+                return None
+            os.makedirs(self.archive_dir, exist_ok=True)
+            self._seq += 1
+            stem = os.path.splitext(os.path.basename(self.baseFilename))[0]
+            target = os.path.join(self.archive_dir,
+                                  f"{stem}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{self._seq:03d}{RAW_SUFFIX}")
+            os.replace(self.baseFilename, target)
+            self._first_at = None
+            self._compress_later()
+            return target
+        finally:
+            self.release()
+
+    def _compress_later(self):
+        if self._compressor is not None and self._compressor.is_alive():
+            return
+        self._compressor = threading.Thread(
+            target=self._compress_loop, name="log-compressor", daemon=True)
+        self._compressor.start()
+
+    def _compress_loop(self):
+        for _ in range(10):   # a segment still being written to waits for another round
+            time.sleep(self.grace_seconds)
+            try:
+                compress_pending(self.archive_dir, self.codec, self.grace_seconds)
+            except OSError:
+                return   # retried after the next rotation; logging must never fail the supervisor
+            if not any(p.endswith(RAW_SUFFIX) for p in segment_paths(self.archive_dir)):
+                return
+
+
+def _first_record_time(path: str) -> float | None:
+    try:
+        with open(path, 'r', encoding="utf-8", errors="replace") as f:
+            stamp = _stamp(f.readline())
+        return datetime.strptime(stamp, STAMP_FORMAT).timestamp() if stamp else None
+    except (OSError, ValueError):
+        return None
+
+
+def compress_pending(archive_dir: str, codec: str = "gzip", grace_seconds: float = 0.0) -> int:
+    """
+    Compress every rotated segment untouched for grace_seconds and record it in the
+    manifest. Safe to run from several processes: they produce identical output.
+    Returns the number of segments compressed.
+    """
+    if not os.path.isdir(archive_dir):
+        return 0
+    manifest = SegmentManifest(archive_dir)
+    done = 0
+    for name in sorted(os.listdir(archive_dir)):
+        path = os.path.join(archive_dir, name)
+        if not name.endswith(RAW_SUFFIX) or name.startswith("."):
+            continue
+        try:
+            if time.time() - os.path.getmtime(path) < grace_seconds:
+                continue
+            target = path + CODECS[codec]
+            tmp_path = os.path.join(archive_dir, f".tmp-{os.getpid()}-{threading.get_ident()}-{name}{CODECS[codec]}")
+            fields = _compress(path, tmp_path, codec)
+            os.replace(tmp_path, target)
+            manifest.put(target, fields)
+            os.remove(path)
+            done += 1
+        except FileNotFoundError:
+            continue   # compressed by another process meanwhile
+    return done
+
+
+def _compress(src: str, dst: str, codec: str) -> dict:
+    digest = hashlib.sha256()
+    lines, raw_bytes, first, last = 0, 0, None, None
+    with open(src, 'rb') as f, _writer(dst, codec) as out:
+        for line in f:
+            out.write(line)
+            digest.update(line)
+            lines += 1
+            raw_bytes += len(line)
+            stamp = _stamp(line[:STAMP_LEN].decode("ascii", "replace"))
+            if stamp:
+                first = first or stamp
+                last = stamp
+    fields = {"rows": lines, "raw_bytes": raw_bytes, "raw_sha256": digest.hexdigest(), "codec": codec}
+    if first:
+        fields.update(first=first, last=last)
+    return fields
+
+
+def _writer(path: str, codec: str):
+    if codec == "zstd":
+        return _zstandard().ZstdCompressor(level=10).stream_writer(open(path, 'wb'), closefd=True)
+    return gzip.open(path, 'wb', compresslevel=6)
+
+
+# ─────────────── Reading ───────────────
+
+def segment_paths(archive_dir: str = "logs_archive") -> list[str]:
+    """Rotated segments oldest first (compressed or still waiting for compression)."""
+    if not os.path.isdir(archive_dir):
+        return []
+    suffixes = (RAW_SUFFIX,) + tuple(RAW_SUFFIX + ext for ext in CODECS.values())
+    names = sorted(n for n in os.listdir(archive_dir) if n.endswith(suffixes) and not n.startswith("."))
+    return [os.path.join(archive_dir, n) for n in names]
+
+
+def _open_binary(path: str):
+    if path.endswith(CODECS["gzip"]):
+        return gzip.open(path, 'rb')
+    if path.endswith(CODECS["zstd"]):
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} needs the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def open_segment(path: str):
+    """Text stream over a segment, decompressing on the fly."""
+    return io.TextIOWrapper(_open_binary(path), encoding="utf-8", errors="replace")
+
+
+def _sources(log_file: str, archive_dir: str, since: str | None):
+    manifest = SegmentManifest(archive_dir).records()
+    for path in segment_paths(archive_dir):
+        record = manifest.get(os.path.basename(path), {})
+        if since and record.get("last") and record["last"] < since:
+            continue   # the whole segment predates since
+        yield path
+    if os.path.exists(log_file):
+        yield log_file
+
+
+def iter_lines(log_file: str = "logs.txt", archive_dir: str = "logs_archive",
+               since: datetime | None = None, contains: str | None = None):
+    """Every log line oldest first, archived segments then the live file."""
+    since_stamp = since.strftime(STAMP_FORMAT) if since else None
+    for path in _sources(log_file, archive_dir, since_stamp):
+        keep = since_stamp is None
+        try:
+            with open_segment(path) as f:
+                for line in f:
+                    if since_stamp:
+                        stamp = _stamp(line)
+                        if stamp:   # continuation lines follow their record
+                            keep = stamp >= since_stamp
+                    if keep and (contains is None or contains in line):
+                        yield line.rstrip("\n")
+        except FileNotFoundError:
+            continue   # compressed (renamed) while listing: the new name was not listed
+
+
+def tail(n: int = 100, log_file: str = "logs.txt", archive_dir: str = "logs_archive",
+         contains: str | None = None) -> list[str]:
+    """The newest n lines (oldest first), reading archived segments newest first only as needed."""
+    lines = deque(maxlen=n)
+    sources = [p for p in [*segment_paths(archive_dir), log_file] if os.path.exists(p)]
+    for path in reversed(sources):
+        need = n - len(lines)
+        if need <= 0:
+            break
+        chunk = deque(maxlen=need)
+        try:
+            with open_segment(path) as f:
+                chunk.extend(line.rstrip("\n") for line in f if contains is None or contains in line)
+        except FileNotFoundError:
+            continue
+        lines.extendleft(reversed(chunk))
+    return list(lines)
+
+
+def verify(archive_dir: str = "logs_archive") -> list[tuple[str, str]]:
+    """Compressed segments that are unrecorded, missing or altered, plus raw-text checksum failures."""
+    manifest = SegmentManifest(archive_dir)
+    compressed = [p for p in segment_paths(archive_dir) if not p.endswith(RAW_SUFFIX)]
+    problems = manifest.verify(compressed)
+    failed = {name for name, _ in problems}
+    for path in compressed:
+        record = manifest.records().get(os.path.basename(path))
+        if record is None or os.path.basename(path) in failed or "raw_sha256" not in record:
+            continue
+        digest = hashlib.sha256()
+        with _open_binary(path) as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        if digest.hexdigest() != record["raw_sha256"]:
+            problems.append((os.path.basename(path), "content checksum mismatch"))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArmorIQ log archive tools")
+    parser.add_argument("--log", default="logs.txt")
+    parser.add_argument("--archive", default="logs_archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cat = sub.add_parser("cat", help="stream archived and live log lines")
+    cat.add_argument("--since", help="first timestamp, e.g. '2026-10-01 00:00'")
+    cat.add_argument("--grep", help="only lines containing this text")
+    cat.add_argument("--tail", type=int, help="only the newest N lines")
+    sub.add_parser("rotate", help="rotate the live log now and compress it")
+    compress = sub.add_parser("compress", help="compress rotated segments still waiting")
+    compress.add_argument("--codec", choices=sorted(CODECS), default="gzip")
+    sub.add_parser("verify", help="check compressed segments against the manifest")
+    args = parser.parse_args()
+
+    if args.command == "cat":
+        if args.tail:
+            lines = tail(args.tail, args.log, args.archive, args.grep)
+        else:
+            since = datetime.fromisoformat(args.since) if args.since else None
+            lines = iter_lines(args.log, args.archive, since, args.grep)
+        for line in lines:
+            print(line)
+    elif args.command == "rotate":
+        handler = RotatingLogHandler(args.log, args.archive, grace_seconds=0)
+        path = handler.rotate()
+        print(f"Rotated to {path}" if path else "Nothing to rotate")
+        if handler._compressor is not None:
+            handler._compressor.join()
+        waiting = sum(p.endswith(RAW_SUFFIX) for p in segment_paths(args.archive))
+        print(f"{waiting} segment(s) still waiting for compression")
+    elif args.command == "compress":
+        print(f"Compressed {compress_pending(args.archive, available_codec(args.codec))} segment(s)")
+    else:
+        problems = verify(args.archive)
+        for name, problem in problems:
+            print(f"{name}: {problem}")
+        print(f"{len(problems)} problem(s) in {args.archive}/")
+        raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
 """
 Logger: writes messages to console and to a log file.
+With a rotation config (the "logging" section of policies.json) the log file is
+rotated by size/age into a compressed archive (see log_archive.py).
 """
 
 import logging
 import sys
 
 class Logger:
-    def __init__(self, log_file="logs.txt"):
+    def __init__(self, log_file="logs.txt", rotation: dict | None = None):
         self.logger = logging.getLogger("ArmorIQ")
         self.logger.setLevel(logging.INFO)
         self.logger.handlers.clear()
 
-        # File handler
-        fh = logging.FileHandler(log_file)
+        # File handler (delay=True: the file is opened on the first record, not at startup)
+        if rotation:
+            from log_archive import RotatingLogHandler
+            fh = RotatingLogHandler(log_file, **rotation)
+        else:
+            fh = logging.FileHandler(log_file, delay=True)
         fh.setLevel(logging.INFO)
 
         # Console handler
@@ -32,8 +38,11 @@ class Logger:
     def error(self, message: str):
         self.logger.error(message)
 
-    def decision_log(self, agent: str, action: dict, risk: str, decision: str, reason: str):
-        """Structured log for decisions."""
+    def decision_log(self, agent: str, action: dict, risk: str, decision: str, reason):
+        """
+        Structured log for decisions. reason is a string or an object rendering it
+        on str() (a Verdict); logging formats it only if a handler takes the record.
+        """
         action_type = action.get("action")
         if action_type in ("delete", "create"):
             path_str = action.get("path", "N/A")
@@ -42,7 +51,7 @@ class Logger:
         else:
             path_str = "N/A"
 
-        self.info(
-            f"Agent: {agent} | Action: {action_type} | Path: {path_str} | "
-            f"Risk: {risk} | Decision: {decision} | Reason: {reason}"
+        self.logger.info(
+            "Agent: %s | Action: %s | Path: %s | Risk: %s | Decision: %s | Reason: %s",
+            agent, action_type, path_str, risk, decision, reason
         )
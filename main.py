@@ -26,11 +26,35 @@ def setup_sandbox():
         with open("system/config", 'w') as f:
             f.write("[mock system config]\n")
 
+def parse_args():
+    import argparse   # only imported when options are given: keeps the bare REPL start fast
+    parser = argparse.ArgumentParser(description="ArmorIQ Supervisor REPL")
+    parser.add_argument("--profile-cpu", type=int, metavar="N", help="cProfile the next N commands")
+    parser.add_argument("--profile-sample", type=int, metavar="N", help="stack-sample the next N commands")
+    parser.add_argument("--profile-memory", type=int, metavar="N", help="tracemalloc diffs for the next N commands")
+    parser.add_argument("--slow-ms", type=float, metavar="MS", help="capture commands slower than MS")
+    parser.add_argument("--profile-dir", default="profiles", help="where profiling output is written")
+    return parser.parse_args()
+
 def main():
+    args = parse_args() if len(sys.argv) > 1 else None
     setup_sandbox()
     supervisor = Supervisor()
+    if args is not None:   # the profiler is otherwise built on first command
+        profiler = supervisor.profiler
+        profiler.out_dir = args.profile_dir
+        if args.profile_cpu:
+            profiler.profile("cpu", args.profile_cpu)
+        elif args.profile_sample:
+            profiler.profile("sample", args.profile_sample)
+        if args.profile_memory:
+            profiler.memory(args.profile_memory)
+        if args.slow_ms:
+            profiler.slow(args.slow_ms)
+        if profiler.armed:
+            print(profiler.status())
     print("ArmorIQ Supervisor – Production-Level Autonomous Control")
-    print("Type your command (or 'exit' to quit). Commands: clean workspace, organize files, clean and organize workspace, delete system config, show history")
+    print("Type your command (or 'exit' to quit). Commands: clean workspace, organize files, clean and organize workspace, delete system config, show history, show logs [N] [text], show jobs, cancel job <id>, profile cpu|sample|memory [N], profile slow <ms>, profile off")
     while True:
         try:
             user_input = input("> ").strip()
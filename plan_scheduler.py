@@ -0,0 +1,58 @@
+"""
+Plan Scheduler: runs the approved steps of a plan on a thread pool in
+dependency order. A step starts once every step it depends on has finished;
+among ready steps, earlier plan positions go first. An optional per-key limit
+(e.g. an agent's max_concurrent) keeps one plan from exceeding its own quota.
+"""
+
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class PlanScheduler:
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+
+    def run(self, deps: list[list[int]], fn, key=None, limit=None):
+        """
+        Call fn(i) for every step i of the DAG deps (deps[i]: steps i waits for).
+        key(i) groups steps for limit(key) -> max concurrent (None for unlimited).
+        fn stores its own results; the first exception raised by fn is re-raised.
+        """
+        count = len(deps)
+        if count <= 1 or self.max_workers <= 1:
+            for i in range(count):
+                fn(i)
+            return
+
+        waiting_on = [set(d) for d in deps]
+        dependents = [[] for _ in range(count)]
+        for j, d in enumerate(deps):
+            for i in d:
+                dependents[i].append(j)
+        ready = [i for i in range(count) if not waiting_on[i]]
+        running = {}
+        active = Counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="armoriq-step") as pool:
+            while ready or running:
+                for i in sorted(ready):
+                    if len(running) >= self.max_workers:
+                        break
+                    k = key(i) if key else None
+                    cap = limit(k) if limit else None
+                    if cap and active[k] >= cap:
+                        continue
+                    ready.remove(i)
+                    active[k] += 1
+                    running[pool.submit(fn, i)] = (i, k)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, k = running.pop(future)
+                    active[k] -= 1
+                    future.result()
+                    for j in dependents[i]:
+                        waiting_on[j].discard(i)
+                        if not waiting_on[j]:
+                            ready.append(j)
@@ -1,10 +1,14 @@
 """
 Planner: converts user input into a multi-step plan.
 Supports all original commands plus new operational, monitoring, and security test commands.
+dependencies() turns a plan into a DAG from each step's path read/write sets,
+so steps that touch unrelated paths can run concurrently.
 """
 
 from datetime import datetime
 
+from canonical_path import conflicts
+
 
 class Planner:
     def parse(self, user_input: str) -> list[dict]:
@@ -95,3 +99,17 @@ class Planner:
             })
 
         return actions
+
+    @staticmethod
+    def dependencies(steps: list) -> list[list[int]]:
+        """
+        Dependency DAG of a plan: deps[j] lists the earlier steps step j must wait for,
+        i.e. those writing a path j reads or writes, or reading a path j writes.
+        A step is an action dict or a list of actions executed together (a batch).
+        """
+        units = [step if isinstance(step, list) else [step] for step in steps]
+        deps = []
+        for j, unit in enumerate(units):
+            deps.append([i for i in range(j)
+                         if any(conflicts(a, b) for a in units[i] for b in unit)])
+        return deps
@@ -0,0 +1,78 @@
+"""
+Policy Cache: compiled snapshot of policies.json.
+Normalized agent paths, action sets and a path-prefix index are marshaled to a
+cache file keyed by the SHA-256 of policies.json and memory-mapped on load.
+A missing, stale or corrupt cache is rebuilt and swapped in atomically.
+"""
+
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import tempfile
+
+
+MAGIC = b"ARMORIQ-POLICY-CACHE-1\n"
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def compile_policies(policies: dict) -> dict:
+    """Normalize a parsed policies.json into the structures the pipeline queries."""
+    agents = {}
+    prefix_index = {}   # normalized path grant -> agents holding it
+    for name, perms in policies.get("agents", {}).items():
+        allowed_paths = list(perms.get("allowed_paths", []))
+        normalized = tuple(os.path.normpath(p) for p in allowed_paths)
+        agents[name] = {
+            "allowed_actions": frozenset(perms.get("allowed_actions", [])),
+            "allowed_paths": allowed_paths,
+            "normalized_paths": normalized,
+            "limits": dict(perms.get("limits", {})),
+        }
+        for path in normalized:
+            prefix_index.setdefault(path, []).append(name)
+    return {"policies": policies, "agents": agents, "prefix_index": prefix_index}
+
+
+def load_compiled(policies_path: str = "policies.json", cache_path: str | None = None) -> dict:
+    """Return the compiled snapshot for policies_path, from cache when its hash still matches."""
+    cache_path = cache_path or policies_path + ".cache"
+    with open(policies_path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).digest()
+
+    snapshot = _read_cache(cache_path, digest)
+    if snapshot is None:
+        snapshot = compile_policies(json.loads(raw))
+        _write_cache(cache_path, digest, snapshot)
+    snapshot["digest"] = digest.hex()
+    return snapshot
+
+
+def _read_cache(cache_path: str, digest: bytes) -> dict | None:
+    header = len(MAGIC) + DIGEST_SIZE
+    try:
+        with open(cache_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) <= header or mm[:len(MAGIC)] != MAGIC or mm[len(MAGIC):header] != digest:
+                return None
+            with memoryview(mm) as view:
+                return marshal.loads(view[header:])
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+
+def _write_cache(cache_path: str, digest: bytes, snapshot: dict):
+    """Write to a temp file then rename, so readers never see a partial cache."""
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".policy-cache-")
+    except OSError:
+        return  # read-only location: run from the freshly compiled snapshot
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + digest + marshal.dumps(snapshot))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,24 +1,36 @@
 """
 Policy Engine: validates an action against a scope token.
+check() returns the reason as a reason code; validate() renders it to text.
 """
 
 import os
 
+from canonical_path import canonicalize
+from reasons import render
+
 class PolicyEngine:
     @staticmethod
     def validate(action: dict, scope_token: dict) -> tuple[bool, str]:
         """
         Returns (allowed, reason).
         """
+        allowed, reason = PolicyEngine.check(action, scope_token)
+        return allowed, render(reason)
+
+    @staticmethod
+    def check(action: dict, scope_token: dict) -> tuple[bool, tuple]:
+        """validate() with the reason as a reason code (see reasons.py), rendered by the caller."""
         if not scope_token:
-            return False, "No scope token provided (agent unknown)"
+            return False, ("policy.no_token",)
 
         allowed_actions = scope_token.get("allowed_actions", [])
         allowed_paths = scope_token.get("allowed_paths", [])
+        normalized_paths = scope_token.get("normalized_paths") or \
+            tuple(os.path.normpath(p) for p in allowed_paths)
         action_type = action.get("action")
 
         if action_type not in allowed_actions:
-            return False, f"Action '{action_type}' not allowed for this agent"
+            return False, ("policy.action_denied", action_type)
 
         # Collect paths to check
         paths_to_check = []
@@ -26,27 +38,32 @@ class PolicyEngine:
             if "path" in action:
                 paths_to_check.append(action["path"])
             else:
-                return False, "Missing path for action"
+                return False, ("policy.missing_path",)
         elif action_type == "move":
             if "source" in action and "dest" in action:
                 paths_to_check.append(action["source"])
                 paths_to_check.append(action["dest"])
             else:
-                return False, "Missing source or dest for move"
+                return False, ("policy.missing_move_paths",)
         else:
-            return False, f"Unknown action type: {action_type}"
+            return False, ("policy.unknown_action", action_type)
 
         for path in paths_to_check:
-            if not PolicyEngine._is_path_allowed(path, allowed_paths):
-                return False, f"Path '{path}' is outside allowed scope: {allowed_paths}"
+            if not PolicyEngine._is_path_allowed(path, normalized_paths):
+                return False, ("policy.out_of_scope", path, str(allowed_paths))
 
-        return True, "Policy check passed"
+        return True, ("policy.ok",)
+
+    @staticmethod
+    def check_many(actions: list[dict], scope_tokens: list[dict | None]) -> list[tuple[bool, tuple]]:
+        """check() over a batch of actions, each paired with its agent's scope token."""
+        return [PolicyEngine.check(action, token) for action, token in zip(actions, scope_tokens)]
 
     @staticmethod
-    def _is_path_allowed(path: str, allowed_paths: list) -> bool:
-        norm_path = os.path.normpath(path)
-        for allowed in allowed_paths:
-            norm_allowed = os.path.normpath(allowed)
-            if norm_path == norm_allowed or norm_path.startswith(norm_allowed + os.sep):
+    def _is_path_allowed(path: str, normalized_paths) -> bool:
+        """Component-wise prefix check against the (pre-normalized) granted paths."""
+        target = canonicalize(path)
+        for norm_allowed in normalized_paths:
+            if target.is_within(canonicalize(norm_allowed)):
                 return True
         return False
@@ -0,0 +1,226 @@
+"""
+Policy Replay: what-if evaluation of a candidate policies.json against history.
+
+History is read in columnar batches (HistoryManager.iter_segments) and reduced
+with NumPy to one row per distinct (agent, action, path) with counts of how
+each was originally decided, so the PolicyEngine / RiskEngine / DecisionEngine
+run once per distinct action instead of once per record. Nothing is executed:
+the Executor, rate limiter and history are never touched.
+
+The diff compares each record's recorded decision with the candidate's:
+  - rate-limited records count as policy-allowed (quota is not replayed)
+  - records without a recorded ALLOWED/BLOCKED decision are skipped
+  - "size" risk rules and content-aware risk depend on the files on disk at
+    decision time, so they are listed as not replayed rather than evaluated
+    against today's files
+
+Usage:
+    python policy_replay.py candidate_policies.json [--policies policies.json] [--limit 20] [--json out.json]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from decision_engine import DecisionEngine
+from delegation import DelegationManager
+from history_archive import MISSING, NO_TIMESTAMP, _from_micros
+from policy_engine import PolicyEngine
+from risk_engine import RiskEngine
+
+
+# Original outcome classes, one counter column each
+ALLOWED, BLOCKED, RATE_LIMITED, SKIPPED = range(4)
+
+
+def _action(agent: str | None, action_type: str | None, path: str | None) -> dict:
+    """Rebuild the action a history row records ('src -> dst' paths are moves)."""
+    action = {"agent": agent, "action": action_type}
+    if path is None:
+        return action
+    if action_type == "move" and " -> " in path:
+        action["source"], action["dest"] = path.split(" -> ", 1)
+    else:
+        action["path"] = path
+    return action
+
+
+class PolicyReplay:
+    def __init__(self, candidate: dict):
+        self.candidate = candidate
+        self.delegation = DelegationManager.from_policies(candidate)
+        rules = candidate.get("risk_rules", [])
+        self.not_replayed = [r for r in rules if r.get("match") == "size"]
+        if candidate.get("content_risk", {}).get("enabled"):
+            self.not_replayed.append({"match": "content_risk", **candidate["content_risk"]})
+        self.risk_engine = RiskEngine(rules=[r for r in rules if r.get("match") != "size"])
+        self._keys = {}                                   # (agent, action, path) -> key id
+        self._counts = np.zeros((0, 4), dtype=np.int64)   # key id -> rows per original class
+        self._first = np.zeros(0, dtype=np.int64)
+        self._last = np.zeros(0, dtype=np.int64)
+        self._records = 0
+
+    # ─────────────── Reduction ───────────────
+
+    def _grow(self, size: int):
+        have = len(self._first)
+        if size <= have:
+            return
+        size = max(size, 2 * have, 1024)
+        self._counts = np.vstack([self._counts, np.zeros((size - have, 4), dtype=np.int64)])
+        self._first = np.concatenate([self._first, np.full(size - have, np.iinfo(np.int64).max)])
+        self._last = np.concatenate([self._last, np.full(size - have, NO_TIMESTAMP)])
+
+    def add_segment(self, segment):
+        """Fold one ColumnSegment into the per-key counters (vectorized over its rows)."""
+        if not len(segment):
+            return
+        self._records += len(segment)
+        dicts, codes = segment.dicts, segment.codes
+        n_action, n_path = len(dicts["action"]), len(dicts["path"])
+        combined = (codes["agent"].astype(np.int64) * n_action + codes["action"]) * n_path + codes["path"]
+        local, inverse = np.unique(combined, return_inverse=True)
+
+        # Only the distinct keys of the segment are decoded in Python
+        gids = np.empty(len(local), dtype=np.int64)
+        for i, value in enumerate(local.tolist()):
+            rest, p = divmod(value, n_path)
+            a, b = divmod(rest, n_action)
+            key = tuple(None if v == MISSING else v
+                        for v in (dicts["agent"][a], dicts["action"][b], dicts["path"][p]))
+            gids[i] = self._keys.setdefault(key, len(self._keys))
+        self._grow(len(self._keys))
+        row_key = gids[inverse.ravel()]
+
+        decision = dicts["decision"]
+        by_decision = np.where(decision == "ALLOWED", ALLOWED, np.where(decision == "BLOCKED", BLOCKED, SKIPPED))
+        row_class = by_decision[codes["decision"]]
+        rate_limited = np.char.startswith(dicts["reason"], "Rate limited")[codes["reason"]] | \
+            (dicts["code"] == "decision.quota")[codes["code"]]
+        row_class[(row_class == BLOCKED) & rate_limited] = RATE_LIMITED
+
+        size = len(self._first)
+        self._counts += np.bincount(row_key * 4 + row_class, minlength=size * 4).reshape(size, 4)
+        stamped = segment.ts != NO_TIMESTAMP
+        np.minimum.at(self._first, row_key[stamped], segment.ts[stamped])
+        np.maximum.at(self._last, row_key[stamped], segment.ts[stamped])
+
+    # ─────────────── Evaluation ───────────────
+
+    def report(self) -> dict:
+        """Evaluate the candidate once per distinct action and diff it against recorded decisions."""
+        started = time.perf_counter()
+        keys = list(self._keys)
+        actions = [_action(*key) for key in keys]
+        tokens = [self.delegation.get_scope_token(action["agent"]) for action in actions]
+        verdicts = DecisionEngine.evaluate_many(PolicyEngine.check_many(actions, tokens),
+                                                self.risk_engine.classify_many(actions))
+
+        counts = self._counts[:len(keys)]
+        was_allowed = counts[:, ALLOWED] + counts[:, RATE_LIMITED]
+        was_blocked = counts[:, BLOCKED]
+        now_blocked = np.fromiter((v.decision == "BLOCKED" for v in verdicts), dtype=bool, count=len(keys))
+        to_blocked = np.where(now_blocked, was_allowed, 0)
+        to_allowed = np.where(now_blocked, 0, was_blocked)
+
+        flips, by_agent = [], {}
+        for k in np.flatnonzero(to_blocked + to_allowed).tolist():
+            agent, action_type, path = keys[k]
+            flip = {
+                "agent":        agent,
+                "action":       action_type,
+                "path":         path,
+                "from":         "ALLOWED" if to_blocked[k] else "BLOCKED",
+                "to":           verdicts[k].decision,
+                "records":      int(to_blocked[k] + to_allowed[k]),
+                "reason":       verdicts[k].final_reason,   # rendered for flips only
+                "first_seen":   _from_micros(int(self._first[k])) if self._last[k] != NO_TIMESTAMP else None,
+                "last_seen":    _from_micros(int(self._last[k])) if self._last[k] != NO_TIMESTAMP else None,
+            }
+            flips.append(flip)
+            totals = by_agent.setdefault(agent or "N/A", {"allowed_to_blocked": 0, "blocked_to_allowed": 0})
+            totals["allowed_to_blocked" if flip["from"] == "ALLOWED" else "blocked_to_allowed"] += flip["records"]
+        flips.sort(key=lambda f: -f["records"])
+
+        return {
+            "records":              self._records,
+            "replayed":             int(counts[:, :SKIPPED].sum()),
+            "skipped":              int(counts[:, SKIPPED].sum()),
+            "rate_limited":         int(counts[:, RATE_LIMITED].sum()),
+            "distinct_actions":     len(keys),
+            "allowed_to_blocked":   int(to_blocked.sum()),
+            "blocked_to_allowed":   int(to_allowed.sum()),
+            "by_agent":             by_agent,
+            "flips":                flips,
+            "not_replayed_rules":   self.not_replayed,
+            "evaluate_seconds":     round(time.perf_counter() - started, 3),
+        }
+
+
+def replay(history, candidate: dict) -> dict:
+    """Replay every entry of a HistoryManager against the candidate policy document."""
+    started = time.perf_counter()
+    engine = PolicyReplay(candidate)
+    for segment in history.iter_segments():
+        engine.add_segment(segment)
+    report = engine.report()
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def format_report(report: dict, limit: int = 20) -> str:
+    lines = [
+        "--- POLICY WHAT-IF REPLAY ---",
+        f"Records           : {report['records']} ({report['replayed']} replayed, "
+        f"{report['skipped']} without a decision)",
+        f"Distinct actions  : {report['distinct_actions']}",
+        f"ALLOWED -> BLOCKED: {report['allowed_to_blocked']}",
+        f"BLOCKED -> ALLOWED: {report['blocked_to_allowed']}",
+        f"Elapsed           : {report.get('elapsed_seconds', report['evaluate_seconds'])}s",
+    ]
+    if report["rate_limited"]:
+        lines.append(f"Note: {report['rate_limited']} rate-limited record(s) treated as policy-allowed")
+    for rule in report["not_replayed_rules"]:
+        lines.append(f"Note: '{rule['match']}' risk rule not replayed (depends on files at decision time)")
+    if report["by_agent"]:
+        lines.append("")
+        lines.append("By agent:")
+        for agent, totals in sorted(report["by_agent"].items()):
+            lines.append(f"  {agent}: {totals['allowed_to_blocked']} newly blocked, "
+                         f"{totals['blocked_to_allowed']} newly allowed")
+    if report["flips"]:
+        lines.append("")
+        lines.append(f"Top flips ({min(limit, len(report['flips']))} of {len(report['flips'])}):")
+        for flip in report["flips"][:limit]:
+            lines.append(f"  {flip['from']} -> {flip['to']} x{flip['records']} | {flip['agent']} "
+                         f"{flip['action']} {flip['path']} | {flip['reason']} | last seen {flip['last_seen']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay history against a candidate policies.json")
+    parser.add_argument("candidate", help="candidate policies.json to evaluate")
+    parser.add_argument("--policies", default="policies.json", help="current policies (selects the history backend)")
+    parser.add_argument("--limit", type=int, default=20, help="flips to list")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    from history_manager import HistoryManager
+    with open(args.policies, 'r') as f:
+        history_cfg = json.load(f).get("history", {})
+    with open(args.candidate, 'r') as f:
+        candidate = json.load(f)
+    history = HistoryManager(backend=history_cfg.get("backend", "json"),
+                             db_file=history_cfg.get("db_file", "history.db"))
+
+    report = replay(history, candidate)
+    print(format_report(report, args.limit))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
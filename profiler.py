@@ -0,0 +1,272 @@
+"""
+Profiler: on-demand profiling of Supervisor commands.
+
+  cpu     cProfile the next N commands -> <seq>-<command>.pstats
+          (snakeviz / flameprof / `python -m pstats` read it)
+  sample  sample the stacks of the next N commands every interval_ms
+          -> <seq>-<command>.folded (flamegraph.pl / speedscope format)
+  memory  tracemalloc snapshot after each of the next N commands, diffed with
+          the previous one -> <seq>-<command>.memdiff.txt
+  slow    every command is stack-sampled; those slower than slow_ms keep their
+          samples (.folded) and are appended to slow.jsonl
+
+cProfile only sees the thread that runs process(); the sampler also covers the
+PlanScheduler step threads. When nothing is armed, Supervisor.process checks
+one boolean and calls straight through.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+SAMPLED_THREAD_PREFIX = "armoriq-step"   # PlanScheduler workers run the plan's executions
+
+# tracemalloc is process-wide: it runs while any profiler in the process holds a reference
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False   # whether tracing was started here (tracing started elsewhere is left alone)
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_started
+    import tracemalloc
+    with _tracing_lock:
+        if not _tracing_users and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_started
+    import tracemalloc
+    with _tracing_lock:
+        _tracing_users -= 1
+        if not _tracing_users and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def _take_snapshot():
+    """tracemalloc snapshot without tracemalloc's own allocations."""
+    import tracemalloc
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+class StackSampler:
+    """Samples thread stacks on a daemon thread and folds them into 'frame;frame;... count' lines."""
+
+    def __init__(self, interval: float = 0.005, thread_ids: set | None = None):
+        self.interval = interval
+        self.thread_ids = thread_ids or {threading.get_ident()}
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="armoriq-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident not in self.thread_ids and not name.startswith(SAMPLED_THREAD_PREFIX):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(name or str(ident))
+                self.counts[";".join(reversed(stack))] += 1
+
+
+class CommandProfiler:
+    def __init__(self, out_dir="profiles", sample_interval_ms=5, top=25, max_captures=50):
+        self.out_dir = out_dir
+        self.sample_interval_ms = sample_interval_ms
+        self.top = top
+        self.mode = None            # "cpu" | "sample" while cpu/sample captures remain
+        self.remaining = 0
+        self.memory_remaining = 0
+        self.slow_ms = None
+        self.captures = deque(maxlen=max_captures)   # newest last: {"command", "ms", "kind", "file"}
+        self.armed = False
+        self._seq = 0
+        self._snapshot = None
+        self._tracing = False       # holds a reference on process-wide tracemalloc
+        self._lock = threading.Lock()   # one profiled command at a time (cProfile is not re-entrant)
+
+    # ─────────────── Control ───────────────
+
+    def profile(self, mode: str, commands: int = 1, interval_ms: float | None = None):
+        """Capture the next commands with mode 'cpu' or 'sample'."""
+        if mode not in ("cpu", "sample"):
+            raise ValueError(f"Unknown profiling mode: {mode!r}")
+        self.mode, self.remaining = mode, max(int(commands), 0)
+        if interval_ms is not None:
+            self.sample_interval_ms = interval_ms
+        self._rearm()
+
+    def memory(self, commands: int = 1):
+        """tracemalloc diffs between each of the next commands (tracing runs only meanwhile)."""
+        self.memory_remaining = max(int(commands), 0)
+        if self.memory_remaining and not self._tracing:
+            _acquire_tracing()
+            self._tracing = True
+            self._snapshot = _take_snapshot()
+        elif not self.memory_remaining:
+            self._stop_tracing()
+        self._rearm()
+
+    def slow(self, threshold_ms: float | None):
+        """Capture commands slower than threshold_ms (None or 0 disables)."""
+        self.slow_ms = threshold_ms or None
+        self._rearm()
+
+    def off(self):
+        self.mode, self.remaining = None, 0
+        self.slow_ms = None
+        if self.memory_remaining:
+            self.memory_remaining = 0
+            self._stop_tracing()
+        self._rearm()
+
+    def _rearm(self):
+        if not self.remaining:
+            self.mode = None
+        self.armed = bool(self.remaining or self.memory_remaining or self.slow_ms)
+
+    def status(self) -> str:
+        parts = []
+        if self.mode:
+            parts.append(f"{self.mode} for the next {self.remaining} command(s)")
+        if self.memory_remaining:
+            parts.append(f"memory diffs for the next {self.memory_remaining} command(s)")
+        if self.slow_ms:
+            parts.append(f"slow-command capture above {self.slow_ms:g} ms")
+        return "Profiling: " + ("; ".join(parts) if parts else "off") + f" (output: {self.out_dir}/)"
+
+    def command(self, args: list[str]) -> str:
+        """
+        Admin command: 'profile cpu|sample [N] [interval_ms]', 'profile memory [N]',
+        'profile slow <ms>|off', 'profile off' or 'profile status'. Returns a status line.
+        """
+        try:
+            verb = args[0] if args else "status"
+            if verb in ("cpu", "sample"):
+                self.profile(verb, int(args[1]) if len(args) > 1 else 1,
+                             float(args[2]) if len(args) > 2 else None)
+            elif verb == "memory":
+                self.memory(int(args[1]) if len(args) > 1 else 1)
+            elif verb == "slow":
+                self.slow(None if len(args) < 2 or args[1] == "off" else float(args[1]))
+            elif verb == "off":
+                self.off()
+            elif verb != "status":
+                return "Usage: profile cpu|sample [N] [interval_ms] | memory [N] | slow <ms>|off | off | status"
+        except ValueError as e:
+            return f"Invalid profile command: {e}"
+        return self.status()
+
+    # ─────────────── Capture ───────────────
+
+    def run(self, command: str, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) with whatever captures are armed, then write their results."""
+        with self._lock:
+            profile = sampler = None
+            sampling = self.mode == "sample" and self.remaining
+            if self.mode == "cpu" and self.remaining:
+                import cProfile
+                profile = cProfile.Profile()
+            if sampling or self.slow_ms:
+                sampler = StackSampler(self.sample_interval_ms / 1000).start()
+            started = time.perf_counter()
+            if profile is not None:
+                profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                samples = sampler.stop() if sampler is not None else None
+                try:
+                    self._collect(command, elapsed_ms, profile, samples, sampling)
+                except OSError:
+                    pass   # profiling output must never fail the command
+                self._rearm()
+
+    def _collect(self, command, elapsed_ms, profile, samples, sampling):
+        self._seq += 1
+        base = os.path.join(self.out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{self._seq:04d}-{_slug(command)}")
+        os.makedirs(self.out_dir, exist_ok=True)
+        if profile is not None:
+            profile.dump_stats(base + ".pstats")
+            self._note(command, elapsed_ms, "cpu", base + ".pstats")
+            self.remaining -= 1
+        slow = self.slow_ms is not None and elapsed_ms >= self.slow_ms
+        if samples is not None and (sampling or slow):
+            _write_folded(base + ".folded", samples)
+            if sampling:
+                self._note(command, elapsed_ms, "sample", base + ".folded")
+                self.remaining -= 1
+        if slow:
+            record = {"timestamp": datetime.now().isoformat(), "command": command,
+                      "ms": round(elapsed_ms, 1), "folded": base + ".folded"}
+            with open(os.path.join(self.out_dir, "slow.jsonl"), 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            self._note(command, elapsed_ms, "slow", base + ".folded")
+        if self.memory_remaining:
+            self._memory_diff(command, elapsed_ms, base + ".memdiff.txt")
+
+    def _memory_diff(self, command, elapsed_ms, path):
+        import tracemalloc
+        if not tracemalloc.is_tracing():   # stopped outside the profiler
+            self.memory_remaining = 0
+            self._stop_tracing()
+            return
+        snapshot = _take_snapshot()
+        stats = snapshot.compare_to(self._snapshot, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, 'w') as f:
+            f.write(f"# {command!r}: {elapsed_ms:.1f} ms, traced {current} B (peak {peak} B)\n")
+            for stat in stats[:self.top]:
+                f.write(f"{stat}\n")
+        self._snapshot = snapshot
+        self._note(command, elapsed_ms, "memory", path)
+        self.memory_remaining -= 1
+        if not self.memory_remaining:
+            self._stop_tracing()
+
+    def _stop_tracing(self):
+        self._snapshot = None
+        if self._tracing:
+            self._tracing = False
+            _release_tracing()
+
+    def _note(self, command, elapsed_ms, kind, path):
+        self.captures.append({"command": command, "ms": round(elapsed_ms, 1), "kind": kind, "file": path})
+
+
+def _slug(command: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", command.lower()).strip("-")[:40] or "command"
+
+
+def _write_folded(path: str, counts: Counter):
+    with open(path, 'w') as f:
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
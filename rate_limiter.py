@@ -0,0 +1,193 @@
+"""
+Rate Limiter: per-agent token buckets and a weighted fair-queue scheduler in
+front of the shared Executor.
+
+Limits come from each agent's "limits" block in policies.json:
+  {"actions_per_sec": 5, "burst": 10, "bytes_per_sec": 52428800,
+   "max_concurrent": 1, "weight": 1, "max_wait_seconds": 2}
+An action over quota waits up to max_wait_seconds for capacity; if it would
+wait longer it is rejected with a reason the DecisionEngine records as BLOCKED.
+Executor slots are granted in weighted-fair order (smallest virtual finish
+time first), so a bulk CleanerAgent run cannot starve MonitorAgent.
+"""
+
+import threading
+import time
+
+
+DEFAULT_LIMITS = {"weight": 1, "max_wait_seconds": 2.0}
+BYTES_PER_COST_UNIT = 1024 * 1024   # fair-queue cost: 1 per action + 1 per MB moved/deleted
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until amount can be taken. Any positive balance admits a request
+        (the bucket may go into debt), so one large delete is not rejected
+        outright but delays whatever follows it.
+        """
+        self._refill(now)
+        needed = min(amount, 1.0)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= amount
+
+
+class AgentScheduler:
+    def __init__(self, limits: dict | None = None, executor_slots: int = 1):
+        """limits: agent name -> limits block. executor_slots: concurrent Executor calls allowed."""
+        self._cond = threading.Condition()
+        self.executor_slots = executor_slots
+        self._busy_slots = 0
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._waiting = []           # (finish_tag, seq) of threads queued for a slot
+        self._seq = 0
+        self._in_flight = {}
+        self.configure(limits or {})
+
+    def configure(self, limits: dict):
+        """Install (or replace) per-agent limits, e.g. after a policy reload."""
+        with self._cond:
+            self.configured = limits
+            self.limits = {agent: {**DEFAULT_LIMITS, **cfg} for agent, cfg in limits.items()}
+            self._action_buckets = {}
+            self._byte_buckets = {}
+            for agent, cfg in self.limits.items():
+                if cfg.get("actions_per_sec"):
+                    self._action_buckets[agent] = TokenBucket(cfg["actions_per_sec"], cfg.get("burst"))
+                if cfg.get("bytes_per_sec"):
+                    self._byte_buckets[agent] = TokenBucket(cfg["bytes_per_sec"], cfg.get("burst_bytes"))
+
+    def needs_bytes(self, agent: str) -> bool:
+        """Whether admission for agent depends on the byte size of its actions."""
+        return agent in self._byte_buckets
+
+    def _limits_for(self, agent: str) -> dict:
+        return self.limits.get(agent, DEFAULT_LIMITS)
+
+    def max_concurrent(self, agent: str) -> int | None:
+        return self._limits_for(agent).get("max_concurrent")
+
+    def set_executor_slots(self, slots: int):
+        with self._cond:
+            self.executor_slots = slots
+            self._cond.notify_all()
+
+    def acquire(self, agent: str, cost_bytes: int = 0) -> tuple[bool, str]:
+        """
+        Block until agent may use the Executor, or refuse.
+        Returns (admitted, reason). Every admitted call must be paired with release(agent).
+        """
+        admitted, reason = self.admit(agent, cost_bytes)
+        if admitted:
+            self.enter(agent, cost_bytes)
+        return admitted, reason
+
+    def admit(self, agent: str, cost_bytes: int = 0, actions: int = 1) -> tuple[bool, str]:
+        """
+        Quota half of acquire(): concurrency and token buckets, without taking an
+        Executor slot. Background jobs admit at decision time; the job worker then
+        holds a slot (enter() ... leave()) while the job runs. Admitted work must
+        still end with release(agent).
+        actions > 1 admits a coalesced batch as one in-flight unit costing that many tokens.
+        """
+        cfg = self._limits_for(agent)
+        deadline = time.monotonic() + cfg["max_wait_seconds"]
+
+        with self._cond:
+            # 1. Per-agent concurrency
+            max_concurrent = cfg.get("max_concurrent")
+            while max_concurrent and self._in_flight.get(agent, 0) >= max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, f"{agent} already has {max_concurrent} action(s) in flight"
+                self._cond.wait(remaining)
+
+            # 2. Token buckets (actions/sec, bytes/sec)
+            while True:
+                now = time.monotonic()
+                wait, limit = 0.0, ""
+                bucket = self._action_buckets.get(agent)
+                if bucket:
+                    w = bucket.wait_time(actions, now)
+                    if w > wait:
+                        wait, limit = w, f"{cfg['actions_per_sec']} actions/sec"
+                bucket = self._byte_buckets.get(agent)
+                if bucket and cost_bytes:
+                    w = bucket.wait_time(cost_bytes, now)
+                    if w > wait:
+                        wait, limit = w, f"{cfg['bytes_per_sec']} bytes/sec"
+                if wait == 0:
+                    break
+                if now + wait > deadline:
+                    return False, f"{agent} exceeded its rate limit of {limit}"
+                self._cond.wait(wait)
+            if agent in self._action_buckets:
+                self._action_buckets[agent].consume(actions)
+            if agent in self._byte_buckets and cost_bytes:
+                self._byte_buckets[agent].consume(cost_bytes)
+            self._in_flight[agent] = self._in_flight.get(agent, 0) + 1
+            return True, "Within rate limits"
+
+    def enter(self, agent: str, cost_bytes: int = 0):
+        """Wait for an Executor slot in weighted-fair order (after a successful admit)."""
+        cfg = self._limits_for(agent)
+        with self._cond:
+            cost = 1 + cost_bytes / BYTES_PER_COST_UNIT
+            start = max(self._virtual_time, self._last_finish.get(agent, 0.0))
+            tag = (start + cost / cfg["weight"], self._seq)
+            self._seq += 1
+            self._last_finish[agent] = tag[0]
+            self._waiting.append(tag)
+            while self._busy_slots >= self.executor_slots or min(self._waiting) != tag:
+                self._cond.wait()
+            self._waiting.remove(tag)
+            self._virtual_time = max(self._virtual_time, start)
+            self._busy_slots += 1
+            self._cond.notify_all()
+
+    def leave(self):
+        """Free an Executor slot taken by enter(), keeping the agent's in-flight count."""
+        with self._cond:
+            self._busy_slots -= 1
+            self._cond.notify_all()
+
+    def release(self, agent: str, entered: bool = True):
+        """Free the agent's in-flight count, and its Executor slot if it entered one."""
+        with self._cond:
+            if entered:
+                self._busy_slots -= 1
+            self._in_flight[agent] -= 1
+            self._cond.notify_all()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler(limits: dict, executor_slots: int = 1) -> AgentScheduler:
+    """Process-wide scheduler, so every Supervisor (CLI, each Streamlit session) shares one queue."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AgentScheduler(limits, executor_slots)
+        else:
+            if limits != _shared.configured:
+                _shared.configure(limits)
+            if executor_slots != _shared.executor_slots:
+                _shared.set_executor_slots(executor_slots)
+        return _shared
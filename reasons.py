@@ -0,0 +1,93 @@
+"""
+Reasons: compact reason codes for decisions, rendered to text only on demand.
+
+A reason is a tuple (code, *params); a param may itself be a reason, e.g.
+("decision.policy", ("policy.action_denied", "move")). Engines return reasons
+instead of formatted strings, history stores the code and params, and only
+sinks that show text (console, text log, UI, show_history) call render().
+Plain strings are accepted wherever a reason is, and render as themselves.
+"""
+
+from collections.abc import Sequence
+
+
+TEMPLATES = {
+    # Delegation / policy
+    "agent.unknown":            "Agent '{0}' not found in policies",
+    "policy.ok":                "Policy check passed",
+    "policy.no_token":          "No scope token provided (agent unknown)",
+    "policy.action_denied":     "Action '{0}' not allowed for this agent",
+    "policy.missing_path":      "Missing path for action",
+    "policy.missing_move_paths": "Missing source or dest for move",
+    "policy.unknown_action":    "Unknown action type: {0}",
+    "policy.out_of_scope":      "Path '{0}' is outside allowed scope: {1}",
+    # Risk
+    "risk.rule":                lambda template, path: template.format(path=path),
+    "risk.escape":              "Path escapes sandbox boundary: '{0}'",
+    "risk.sandbox_root":        "Attempt to delete {0} root directory",
+    "risk.blast_bytes":         "Large blast radius: {0} under '{1}' exceeds {2}",
+    "risk.blast_files":         "Large blast radius: {0} under '{1}' exceeds {2} files",
+    "risk.executables":         "Operation affects {0} executable file(s) under '{1}'",
+    "risk.delete":              "Destructive delete operation inside workspace",
+    "risk.move":                "File move operation inside workspace",
+    "risk.create":              "File creation operation inside workspace",
+    "risk.read":                "Read-only monitoring operation inside sandbox",
+    "risk.none":                "No significant risk identified",
+    "risk.detail":              "{0} ({1})",
+    # Final decision
+    "decision.policy":          "Policy violation: {0}",
+    "decision.risk":            "High risk: {0}",
+    "decision.quota":           "Rate limited: {0}",
+    "decision.allowed":         "Policy allowed, risk {0}",
+    # Explanation lines
+    "explain.policy_failed":    "Policy check failed: {0}",
+    "explain.high_risk":        "Risk assessment: {0} (HIGH)",
+    "explain.quota_failed":     "Quota check failed: {0}",
+    "explain.risk_level":       "Risk level: {0} – {1}",
+    "explain.medium_warning":   "WARNING: Medium-risk operation permitted",
+    "explain.coalesced":        "Coalesced: served by step {0}",
+}
+
+
+def render(reason) -> str:
+    """Text for a reason (tuple, or list after a JSON round trip); strings pass through."""
+    if isinstance(reason, str):
+        return reason
+    code, *params = reason
+    params = [render(p) if isinstance(p, (tuple, list)) else p for p in params]
+    template = TEMPLATES.get(code)
+    if template is None:
+        return " ".join([code, *map(str, params)])   # code from a newer release
+    if callable(template):
+        return template(*params)
+    return template.format(*params)
+
+
+class Explanation(Sequence):
+    """Explanation lines held as reasons and rendered on first access."""
+
+    __slots__ = ("reasons", "_lines")
+
+    def __init__(self, reasons):
+        self.reasons = tuple(reasons)
+        self._lines = None
+
+    def _rendered(self) -> list[str]:
+        if self._lines is None:
+            self._lines = [render(r) for r in self.reasons]
+        return self._lines
+
+    def __getitem__(self, index):
+        return self._rendered()[index]
+
+    def __len__(self) -> int:
+        return len(self.reasons)
+
+    def __add__(self, other) -> "Explanation":
+        return Explanation(self.reasons + tuple(other))
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(self._rendered())
@@ -3,17 +3,164 @@ Risk Engine: classifies action risk level with structured reasoning.
 LOW: read-only operations inside workspace.
 MEDIUM: file create / move / delete inside workspace.
 HIGH: any access outside workspace or to system directory.
+
+Path rules come from a declarative table (built-in defaults plus site rules
+from the "risk_rules" section of policies.json) compiled once into:
+  - a case-insensitive prefix trie over path components ("prefix" rules)
+  - one combined regex with a named group per rule ("regex" / "extension" rules)
+  - an lstat of the target for "size" rules (only when such rules exist)
+Each distinct path is classified in a single pass and the result is cached.
+
+Rule format:
+  {"match": "prefix",    "pattern": "workspace/secrets", "level": "HIGH", "reason": "..."}
+  {"match": "extension", "pattern": [".exe", ".sh"],     "level": "HIGH", "actions": ["delete"]}
+  {"match": "regex",     "pattern": "\\\\.bak$",           "level": "MEDIUM"}
+  {"match": "size",      "min_bytes": 104857600,           "level": "HIGH"}
+"reason" may contain {path}; "actions" optionally limits a rule to some action types.
+A size rule compares the target's own size; with "aggregate": true it compares
+a directory's recursive total instead (cached FingerprintStore walk).
+
+Content-aware mode (content_risk={...}) additionally fingerprints the target of
+a delete or move through a cached FingerprintStore: operations over max_bytes or
+max_files, or touching executables when block_executables is set, become HIGH.
+
+classify() returns reasons as reason codes (reasons.py); assess() renders them.
 """
 
+import os
+import re
+from functools import lru_cache
+
+from canonical_path import SANDBOX_ROOT, CanonicalPath, canonicalize
+from reasons import render
+
+
+LEVELS = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+
+DEFAULT_RULES = [
+    {"match": "prefix", "pattern": "system", "level": "HIGH",
+     "reason": "Access to protected system directory: '{path}'"},
+    {"match": "regex", "pattern": r"(?:^|/)system/", "level": "HIGH",
+     "reason": "Access to protected system directory: '{path}'"},
+]
+
+_RULES_KEY = "\0rules"
+
 
 class RiskEngine:
+    def __init__(self, rules: list | None = None, base_dir: str | None = None, cache_size: int = 4096,
+                 content_risk: dict | None = None, fingerprints=None):
+        """
+        rules: site rules appended to DEFAULT_RULES. base_dir anchors on-disk lookups.
+        content_risk: {"enabled", "max_bytes", "max_files", "block_executables"}.
+        fingerprints: a shared FingerprintStore (one is created when first needed otherwise).
+        """
+        self.base_dir = base_dir if base_dir else os.getcwd()
+        self.content_risk = dict(content_risk or {})
+        self.stat_aware = bool(self.content_risk.get("enabled"))
+        self.fingerprints = fingerprints
+        if self.fingerprints is None and self.stat_aware:
+            from fingerprint import FingerprintStore
+            self.fingerprints = FingerprintStore(self.base_dir)
+        self.rules = [self._check_rule(r) for r in DEFAULT_RULES + list(rules or [])]
+        self._trie = {}
+        self._size_rules = []
+        patterns = []
+        for idx, rule in enumerate(self.rules):
+            kind = rule["match"]
+            if kind == "prefix":
+                node = self._trie
+                for part in canonicalize(rule["pattern"]).lower_parts:
+                    node = node.setdefault(part, {})
+                node.setdefault(_RULES_KEY, []).append(idx)
+            elif kind == "regex":
+                patterns.append(f"(?:(?=.*?(?P<r{idx}>{rule['pattern']})))?")
+            elif kind == "extension":
+                exts = rule["pattern"] if isinstance(rule["pattern"], list) else [rule["pattern"]]
+                alternation = "|".join(re.escape(e.lstrip(".")) for e in exts)
+                patterns.append(f"(?:(?=.*?(?P<r{idx}>\\.(?:{alternation})$)))?")
+            elif kind == "size":
+                self._size_rules.append(idx)
+        self._regex = re.compile("".join(patterns), re.IGNORECASE) if patterns else None
+        self._classify = lru_cache(maxsize=cache_size)(self._match_path_rules)
+
     @staticmethod
-    def assess(action: dict) -> tuple[str, str]:
+    def _check_rule(rule: dict) -> dict:
+        if rule.get("match") not in ("prefix", "regex", "extension", "size"):
+            raise ValueError(f"Unknown risk rule type: {rule.get('match')!r}")
+        if rule.get("level") not in LEVELS:
+            raise ValueError(f"Unknown risk level in rule: {rule.get('level')!r}")
+        rule = dict(rule)
+        rule.setdefault("reason", f"Matched {rule['match']} risk rule: '{{path}}'")
+        if "actions" in rule:
+            rule["actions"] = frozenset(rule["actions"])
+        return rule
+
+    def _match_path_rules(self, path: CanonicalPath) -> tuple[int, ...]:
+        """Indexes of path-only rules (prefix / regex / extension) matching path, in rule order."""
+        matched = []
+        node = self._trie
+        for part in path.lower_parts:
+            node = node.get(part)
+            if node is None:
+                break
+            matched.extend(node.get(_RULES_KEY, ()))
+        if self._regex is not None:
+            groups = self._regex.match("/".join(path.parts)).groupdict()
+            matched.extend(int(name[1:]) for name, value in groups.items() if value is not None)
+        return tuple(sorted(matched))
+
+    def _match_size_rules(self, path: str) -> list[int]:
+        sizes = {}
+        matched = []
+        for idx in self._size_rules:
+            rule = self.rules[idx]
+            aggregate = bool(rule.get("aggregate"))
+            if aggregate not in sizes:
+                sizes[aggregate] = self._total_size(path) if aggregate else self._own_size(path)
+            if sizes[aggregate] is not None and sizes[aggregate] >= rule["min_bytes"]:
+                matched.append(idx)
+        return matched
+
+    def _own_size(self, path: str) -> int | None:
+        try:
+            return os.lstat(os.path.join(self.base_dir, path)).st_size
+        except OSError:
+            return None
+
+    def _total_size(self, path: str) -> int | None:
+        if self.fingerprints is None:
+            from fingerprint import FingerprintStore
+            self.fingerprints = FingerprintStore(self.base_dir)
+        fp = self.fingerprints.fingerprint(path)
+        return None if fp is None else fp["size"]
+
+    def _strongest_rule(self, action_type: str, path: CanonicalPath) -> tuple[int, tuple] | None:
+        """(level, reason) of the most severe rule that applies to this path and action."""
+        best = None
+        candidates = list(self._classify(path))
+        if self._size_rules:
+            candidates.extend(self._match_size_rules(path.norm))
+        for idx in candidates:
+            rule = self.rules[idx]
+            if "actions" in rule and action_type not in rule["actions"]:
+                continue
+            level = LEVELS[rule["level"]]
+            if best is None or level > best[0]:
+                best = (level, ("risk.rule", rule["reason"], path.raw))
+        return best
+
+    def assess(self, action: dict) -> tuple[str, str]:
         """
         Returns (risk_level, reason):
           risk_level: 'LOW' | 'MEDIUM' | 'HIGH'
           reason:     human-readable structured rationale
         """
+        level, reason = self.classify(action)
+        return level, render(reason)
+
+    def classify(self, action: dict) -> tuple[str, tuple]:
+        """assess() with the reason as a reason code (see reasons.py), rendered by the caller."""
         action_type = action.get("action", "")
         paths = []
 
@@ -26,35 +173,94 @@ class RiskEngine:
             if "dest" in action:
                 paths.append(action["dest"])
 
-        # ── HIGH risk checks ──────────────────────────────
+        # ── Rule table + HIGH risk checks ─────────────────
+        escalation = None
         for p in paths:
             if not p:
                 continue
-            p_norm = p.rstrip("/")
-            p_low = p_norm.lower()
+            cp = canonicalize(p)
 
-            # System directory
-            if p_low.startswith("system") or "system/" in p_low:
-                return "HIGH", f"Access to protected system directory: '{p}'"
+            matched = self._strongest_rule(action_type, cp)
+            if matched and matched[0] == LEVELS["HIGH"]:
+                return "HIGH", matched[1]
+            if matched and (escalation is None or matched[0] > escalation[0]):
+                escalation = matched
 
             # Outside sandbox
-            if not p_norm.startswith("workspace"):
-                return "HIGH", f"Path escapes sandbox boundary: '{p}'"
+            if not cp.in_sandbox:
+                return "HIGH", ("risk.escape", p)
 
             # Attempt to delete workspace root itself
-            if action_type == "delete" and p_norm in ("workspace", "workspace/"):
-                return "HIGH", "Attempt to delete workspace root directory"
+            if action_type == "delete" and cp.is_sandbox_root:
+                return "HIGH", ("risk.sandbox_root", SANDBOX_ROOT)
+
+        # ── Content-aware blast radius ────────────────────
+        target = None
+        if self.stat_aware and action_type in ("delete", "move") and paths and paths[0]:
+            target = self.fingerprints.fingerprint(paths[0])
+            blast = self._blast_radius(target, paths[0])
+            if blast:
+                return "HIGH", blast
 
         # ── MEDIUM risk checks ────────────────────────────
+        level, reason = self._base_level(action_type)
+        if target is not None and target["files"]:
+            reason = ("risk.detail", reason, _describe(target))
+        if escalation and escalation[0] > LEVELS[level]:
+            return _LEVEL_NAMES[escalation[0]], escalation[1]
+        return level, reason
+
+    def assess_many(self, actions: list[dict]) -> list[tuple[str, str]]:
+        """Assess a batch of actions; repeated paths are classified once via the shared cache."""
+        return [self.assess(action) for action in actions]
+
+    def classify_many(self, actions: list[dict]) -> list[tuple[str, tuple]]:
+        """classify() over a batch of actions (reasons left unrendered)."""
+        return [self.classify(action) for action in actions]
+
+    def _blast_radius(self, fp: dict | None, path: str) -> tuple | None:
+        """HIGH-risk reason if the fingerprinted target exceeds the configured limits."""
+        if fp is None:
+            return None
+        max_bytes = self.content_risk.get("max_bytes")
+        max_files = self.content_risk.get("max_files")
+        if max_bytes is not None and fp["size"] > max_bytes:
+            return ("risk.blast_bytes", _describe(fp), path, _format_size(max_bytes))
+        if max_files is not None and fp["files"] > max_files:
+            return ("risk.blast_files", _describe(fp), path, max_files)
+        if self.content_risk.get("block_executables") and fp["executables"]:
+            return ("risk.executables", fp["executables"], path)
+        return None
+
+    @staticmethod
+    def _base_level(action_type: str) -> tuple[str, tuple]:
         if action_type == "delete":
-            return "MEDIUM", "Destructive delete operation inside workspace"
+            return "MEDIUM", ("risk.delete",)
         if action_type == "move":
-            return "MEDIUM", "File move operation inside workspace"
+            return "MEDIUM", ("risk.move",)
         if action_type == "create":
-            return "MEDIUM", "File creation operation inside workspace"
+            return "MEDIUM", ("risk.create",)
 
         # ── LOW (read-only) ───────────────────────────────
         if action_type == "read":
-            return "LOW", "Read-only monitoring operation inside sandbox"
+            return "LOW", ("risk.read",)
+
+        return "LOW", ("risk.none",)
+
+
+_LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _describe(fp: dict) -> str:
+    desc = f"{fp['files']} file(s), {_format_size(fp['size'])}"
+    if fp["temp_files"] == fp["files"]:
+        desc += ", temp only"
+    return desc
 
-        return "LOW", "No significant risk identified"
@@ -1,46 +1,155 @@
 """
 Supervisor: coordinates Plan–Delegate–Validate–Execute pipeline.
 Now supports Simulation Mode (dry run) that skips the Executor.
+Heavier components (policies, executor, logger, history) are built on first use
+so the CLI reaches its prompt without touching policy or history files.
+Large deletes and moves run as background jobs (see job_queue.py): the
+decision is returned at once with a job id the caller can poll or cancel.
+Once every step is reasoned about, approved steps run through PlanScheduler
+in dependency order, in parallel where their paths do not overlap.
+Commands can be profiled on demand ("profile ..." admin command, see profiler.py).
+Synchronous deletes, creates and moves are verified: the touched paths are
+snapshotted before and after execution and the diff is checked against the
+action and stored with its history entry (see workspace_snapshot.py).
 """
 
+from functools import cached_property
+
 from planner import Planner
-from delegation import DelegationManager
 from policy_engine import PolicyEngine
 from risk_engine import RiskEngine
-from decision_engine import DecisionEngine
+from decision_engine import DecisionEngine, Verdict
 from executor import Executor
 from logger import Logger
 from history_manager import HistoryManager
+from canonical_path import action_paths
 
 
 class Supervisor:
-    def __init__(self):
+    def __init__(self, echo: bool = True):
+        """echo=False skips the console plan, decision blocks and summary (bulk callers)."""
+        self.echo           = echo
         self.planner        = Planner()
-        self.delegation     = DelegationManager()
         self.policy_engine  = PolicyEngine()
-        self.risk_engine    = RiskEngine()
         self.decision_engine = DecisionEngine()
-        self.executor       = Executor()
-        self.logger         = Logger()
-        self.history        = HistoryManager()
         # Session counters
         self.total_steps   = 0
         self.allowed_count = 0
         self.blocked_count = 0
         self.warning_count = 0
 
+    @cached_property
+    def delegation(self):
+        from delegation import DelegationManager   # policy_cache and hashlib are not needed before
+        return DelegationManager()
+
+    @cached_property
+    def risk_engine(self) -> RiskEngine:
+        return RiskEngine(rules=self.delegation.policies.get("risk_rules", []),
+                          content_risk=self.delegation.policies.get("content_risk"),
+                          fingerprints=self.fingerprints)
+
+    @cached_property
+    def profiler(self):
+        from profiler import CommandProfiler
+        return CommandProfiler()
+
+    @cached_property
+    def fingerprints(self):
+        from fingerprint import FingerprintStore
+        return FingerprintStore()
+
+    @cached_property
+    def snapshots(self):
+        """None when verification is disabled in policies.json."""
+        cfg = self.delegation.policies.get("verification", {})
+        if not cfg.get("enabled", True):
+            return None
+        from workspace_snapshot import WorkspaceSnapshotter
+        return WorkspaceSnapshotter(content_hash=cfg.get("content_hash", False),
+                                    max_hash_bytes=cfg.get("max_hash_bytes", 1 << 20))
+
+    @cached_property
+    def scheduler(self):
+        from rate_limiter import shared_scheduler
+        return shared_scheduler(self.delegation.agent_limits(),
+                                self.delegation.policies.get("executor", {}).get("slots", 1))
+
+    @cached_property
+    def plan_scheduler(self):
+        from plan_scheduler import PlanScheduler
+        return PlanScheduler(self.delegation.policies.get("executor", {}).get("parallel_steps", 4))
+
+    @cached_property
+    def executor(self) -> Executor:
+        return Executor(fd_mode=self.delegation.policies.get("executor", {}).get("fd_mode"))
+
+    @cached_property
+    def jobs(self):
+        from job_queue import shared_job_queue
+        return shared_job_queue(self.executor, workers=self._jobs_config().get("workers", 2),
+                                scheduler=self.scheduler)
+
+    def _jobs_config(self) -> dict:
+        return self.delegation.policies.get("jobs", {})
+
+    @cached_property
+    def coalescer(self):
+        from coalescer import ActionCoalescer
+        cfg = self.delegation.policies.get("coalescing", {})
+        return ActionCoalescer(enabled=cfg.get("enabled", True), window_seconds=cfg.get("window_seconds", 2.0))
+
+    @cached_property
+    def logger(self) -> Logger:
+        return Logger(rotation=self.delegation.policies.get("logging"))
+
+    @cached_property
+    def history(self) -> HistoryManager:
+        history_cfg = self.delegation.policies.get("history", {})
+        history = HistoryManager(
+            hot_limit=history_cfg.get("hot_limit", 1000),
+            max_entries=history_cfg.get("max_entries"),
+            max_age_days=history_cfg.get("max_age_days"),
+            backend=history_cfg.get("backend", "json"),
+            db_file=history_cfg.get("db_file", "history.db"),
+        )
+        if history_cfg.get("maintenance_interval_seconds"):
+            history.start_maintenance(history_cfg["maintenance_interval_seconds"])
+        return history
+
     def process(self, user_input: str, simulation_mode: bool = False) -> list[dict]:
         """
         Process a command through the full pipeline.
         Returns a list of result dicts (one per action) for the UI to consume.
         simulation_mode=True runs all reasoning but skips Executor.
         """
+        if user_input.lower().split()[:1] == ["profile"]:
+            print(self.profiler.command(user_input.split()[1:]))
+            return []
+        if self.profiler.armed:
+            return self.profiler.run(user_input, self._process, user_input, simulation_mode)
+        return self._process(user_input, simulation_mode)
+
+    def _process(self, user_input: str, simulation_mode: bool) -> list[dict]:
         results = []
 
         if user_input.lower() == "show history":
             self.history.show_history()
             return results
 
+        if user_input.lower().split()[:2] == ["show", "logs"]:
+            self.show_logs(user_input.split()[2:])
+            return results
+
+        if user_input.lower() == "show jobs":
+            self.show_jobs()
+            return results
+
+        if user_input.lower().startswith("cancel job "):
+            _, msg = self.jobs.cancel(user_input.split()[-1])
+            print(msg)
+            return results
+
         actions = self.planner.parse(user_input)
         if not actions:
             self.logger.info(f"No actions parsed from: '{user_input}'")
@@ -53,77 +162,256 @@ class Supervisor:
         self.warning_count = 0
 
         # Plan preview
-        print("\n--- Planned Actions ---")
-        for i, act in enumerate(actions, 1):
-            agent    = act["agent"]
-            act_type = act["action"]
-            if act_type in ("delete", "create", "read"):
-                print(f"{i}. {agent} → {act_type} {act.get('path','')}")
-            elif act_type == "move":
-                print(f"{i}. {agent} → move {act.get('source','')} → {act.get('dest','')}")
-        print()
+        if self.echo:
+            print("\n--- Planned Actions ---")
+            for i, act in enumerate(actions, 1):
+                agent    = act["agent"]
+                act_type = act["action"]
+                if act_type in ("delete", "create", "read"):
+                    print(f"{i}. {agent} → {act_type} {act.get('path','')}")
+                elif act_type == "move":
+                    print(f"{i}. {agent} → move {act.get('source','')} → {act.get('dest','')}")
+            print()
 
-        for action in actions:
-            self.total_steps += 1
-            agent_name = action["agent"]
+        # Phase 1: reasoning for every step (risk, delegation scope, policy)
+        steps = [self._assess(action) for action in actions]
 
-            # 1. Risk assessment (always first)
-            risk_level, risk_reason = self.risk_engine.assess(action)
-            if risk_level == "MEDIUM":
-                self.warning_count += 1
+        # Phase 2: fold overlapping approved steps into shared executions
+        groups, served_by = self.coalescer.fold(actions, [s["decision"] == "ALLOWED" for s in steps])
 
-            # 2. Delegation scope token
-            scope_token = self.delegation.get_scope_token(agent_name)
-            if not scope_token:
-                decision     = "BLOCKED"
-                final_reason = f"Agent '{agent_name}' not found in policies"
-                explanation  = [final_reason]
-                self.blocked_count += 1
-                self._log_and_store(user_input, agent_name, action, risk_level, decision, final_reason)
-                results.append(self._build_result(agent_name, action, risk_level, decision, explanation, simulation_mode))
+        # Phase 3: execution, in parallel where steps' read/write sets do not overlap
+        deps = self.planner.dependencies([[actions[m] for m in group] for group in groups])
+        self.plan_scheduler.run(
+            deps,
+            lambda g: self._run_group(user_input, [steps[m] for m in groups[g]], simulation_mode),
+            key=lambda g: actions[groups[g][0]]["agent"],
+            limit=self.scheduler.max_concurrent,
+        )
+
+        # Phase 4: report and audit every step in plan order. Folded steps share the
+        # outcome of the execution that served them and add no history row of their own.
+        for i, step in enumerate(steps):
+            self.total_steps += 1
+            if step["risk"] == "MEDIUM":
+                self.warning_count += 1
+            j = served_by.get(i)
+            if j is not None and steps[j]["decision"] == "ALLOWED":
+                step.update(exec_output=steps[j]["exec_output"], job_id=steps[j]["job_id"], served_by=f"step {j + 1}")
+                step["explanation"] = step["verdict"].explanation + [("explain.coalesced", j + 1)]
+                self.allowed_count += 1
+                if self.echo:
+                    self._print_decision_block(step["agent"], step["action"], step["risk"], step["decision"],
+                                               step["explanation"])
+                self.logger.info(f"Coalesced: step {i + 1} ({_describe(step['action'])}) served by step {j + 1}")
                 continue
+            if j is not None:   # the serving step lost its quota
+                step.update(decision=steps[j]["decision"], verdict=steps[j]["verdict"])
+            self._record(user_input, step)
+        self.history.flush()   # batching backends commit the command's rows in one transaction
 
-            # 3. Policy check
-            policy_allowed, policy_reason = self.policy_engine.validate(action, scope_token)
+        results = [self._build_result(s["agent"], s["action"], s["risk"], s["decision"],
+                                      s.get("explanation") or s["verdict"].explanation,
+                                      simulation_mode, s["exec_output"], s["job_id"], s["served_by"], s["diff"])
+                   for s in steps]
+        if self.echo:
+            self._print_summary()
+        return results
 
-            # 4. Decision
-            decision, final_reason, explanation = self.decision_engine.decide(
-                policy_allowed, policy_reason, risk_level, risk_reason
-            )
+    def _assess(self, action) -> dict:
+        """Risk, delegation and policy reasoning for one step (no quota, no execution)."""
+        agent_name = action["agent"]
+        step = {"agent": agent_name, "action": action, "exec_output": "", "job_id": None, "served_by": None,
+                "diff": None}
 
-            if decision == "ALLOWED":
-                self.allowed_count += 1
-            else:
-                self.blocked_count += 1
+        # 1. Risk assessment (always first)
+        step["risk"], step["risk_reason"] = self.risk_engine.classify(action)
 
-            self._print_decision_block(agent_name, action, risk_level, decision, explanation)
-            self._log_and_store(user_input, agent_name, action, risk_level, decision, final_reason)
+        # 2. Delegation scope token
+        scope_token = self.delegation.get_scope_token(agent_name)
+        if not scope_token:
+            reason = ("agent.unknown", agent_name)
+            step.update(policy_allowed=False, policy_reason=reason, decision="BLOCKED",
+                        verdict=Verdict("BLOCKED", reason, (reason,)))
+            return step
 
-            exec_output = ""
-            # 5. Execute (only if ALLOWED and NOT in simulation mode)
-            if decision == "ALLOWED":
-                if simulation_mode:
-                    exec_output = "Simulation Mode: No changes applied"
-                    self.logger.info(f"[SIMULATION] Would execute: {action['action']} on {action.get('path','')}")
+        # 3. Policy check
+        step["policy_allowed"], step["policy_reason"] = self.policy_engine.check(action, scope_token)
+
+        # 4. Decision (reason codes; text is rendered only by the sinks that show it)
+        step["verdict"] = self.decision_engine.evaluate(
+            step["policy_allowed"], step["policy_reason"], step["risk"], step["risk_reason"]
+        )
+        step["decision"] = step["verdict"].decision
+        return step
+
+    def _run_group(self, command, group, simulation_mode):
+        """
+        Admit and execute one execution: a single step or a batch of moves by one agent.
+        Runs on a PlanScheduler thread; it only fills in the steps, which are
+        printed and audited afterwards in plan order.
+        """
+        agent_name = group[0]["agent"]
+        actions = [step["action"] for step in group]
+
+        background = False
+        if not simulation_mode:
+            # Served by an identical earlier execution whose targets have not changed since
+            record = self.coalescer.recall(actions[0]) if len(group) == 1 else None
+            if record and (not record["pending"] or self._job_active(record["job_id"])):
+                step = group[0]
+                step["served_by"] = f"job {record['job_id']}" if record["job_id"] else f"earlier '{record['command']}'"
+                step["job_id"] = record["job_id"]
+                step["exec_output"] = f"Served by {step['served_by']}: {record['output']}"
+                self.logger.info(f"Coalesced: {_describe(step['action'])} served by {step['served_by']}")
+                return
+
+            # 5. Rate limits (a batch is admitted as one in-flight unit)
+            background = len(group) == 1 and self._runs_in_background(actions[0])
+            cost_bytes = sum(self._estimate_bytes(agent_name, action) for action in actions)
+            admitted, quota_reason = self.scheduler.admit(agent_name, cost_bytes, actions=len(group))
+            if not admitted:
+                for step in group:
+                    step["verdict"] = self.decision_engine.evaluate(
+                        step["policy_allowed"], step["policy_reason"], step["risk"], step["risk_reason"],
+                        admitted, quota_reason
+                    )
+                    step["decision"] = step["verdict"].decision
+
+        if group[0]["decision"] != "ALLOWED":
+            return
+
+        # 6. Execute (only if ALLOWED and NOT in simulation mode)
+        if simulation_mode:
+            for step in group:
+                step["exec_output"] = "Simulation Mode: No changes applied"
+                self.logger.info(f"[SIMULATION] Would execute: {step['action']['action']} on {step['action'].get('path','')}")
+            return
+
+        if background:
+            job_id = self.jobs.submit(actions[0], agent_name, on_finish=self._job_finished, cost_bytes=cost_bytes)
+            group[0]["job_id"] = job_id
+            group[0]["exec_output"] = f"Running in background as job {job_id}"
+            self.coalescer.remember(actions[0], command, group[0]["exec_output"], job_id)
+            self.logger.info(f"Job {job_id} queued: {actions[0]['action']} by {agent_name}")
+            return
+
+        # Snapshot what the actions touch, to verify the outcome (reads change nothing)
+        snapshots = self.snapshots
+        if snapshots is not None and actions[0]["action"] != "read":
+            before = [snapshots.capture(action) for action in actions]
+        else:
+            before = None
+
+        self.scheduler.enter(agent_name, cost_bytes)
+        try:
+            if len(group) == 1:
+                outcomes = [self.executor.execute(actions[0])]
+            else:
+                outcomes = self.executor.execute_batch(actions)
+                self.logger.info(f"Batched {len(group)} moves by {agent_name} into one execution")
+        finally:
+            self.scheduler.release(agent_name)
+
+        for k, (step, (success, msg)) in enumerate(zip(group, outcomes)):
+            step["exec_output"] = msg
+            self._invalidate_fingerprints(step["action"])
+            if before is not None:
+                step["diff"] = snapshots.verify_action(step["action"], before[k], success)
+                if not step["diff"]["verified"]:
+                    self.logger.error(f"Verification failed: {_describe(step['action'])}: {step['diff']['problem']}")
+            if success:
+                self.coalescer.remember(step["action"], command, msg)
+                self.logger.info(f"Execution success: {msg}")
+            else:
+                if "file not found" in msg.lower():
+                    self.logger.info(f"Execution skipped: {msg}")
                 else:
-                    success, msg = self.executor.execute(action)
-                    exec_output = msg
-                    if success:
-                        self.logger.info(f"Execution success: {msg}")
-                    else:
-                        if "file not found" in msg.lower():
-                            self.logger.info(f"Execution skipped: {msg}")
-                        else:
-                            self.logger.error(f"Execution failed: {msg}")
-
-            results.append(self._build_result(
-                agent_name, action, risk_level, decision, explanation, simulation_mode, exec_output
-            ))
-
-        self._print_summary()
-        return results
+                    self.logger.error(f"Execution failed: {msg}")
+
+    def _record(self, command, step):
+        """Count, print and audit one step's final decision."""
+        if step["decision"] == "ALLOWED":
+            self.allowed_count += 1
+        else:
+            self.blocked_count += 1
+        if self.echo:
+            self._print_decision_block(step["agent"], step["action"], step["risk"], step["decision"],
+                                       step["verdict"].explanation)
+            if step["diff"]:
+                from workspace_snapshot import format_summary
+                print(f"Changes: {format_summary(step['diff'])}")
+        self._log_and_store(command, step["agent"], step["action"], step["risk"], step["decision"], step["verdict"],
+                            step["diff"])
+
+    def _job_active(self, job_id) -> bool:
+        job = self.jobs.get(job_id)
+        return job is not None and job["status"] in ("queued", "running")
 
-    def _build_result(self, agent, action, risk, decision, explanation, simulation_mode, exec_output=""):
+    def _runs_in_background(self, action) -> bool:
+        """Deletes and moves of directories at least min_files / min_bytes in size go to the job queue."""
+        cfg = self._jobs_config()
+        if not cfg.get("enabled") or action.get("action") not in ("delete", "move"):
+            return False
+        fp = self.fingerprints.fingerprint(action.get("path") or action.get("source") or "")
+        if fp is None or fp["kind"] != "dir":
+            return False
+        return fp["files"] >= cfg.get("min_files", 100) or fp["size"] >= cfg.get("min_bytes", 64 * 1024 * 1024)
+
+    def _job_finished(self, job):
+        """Job queue callback (worker thread): free quota, refresh fingerprints, log the outcome."""
+        self.scheduler.release(job["agent"], entered=False)   # the worker already left its slot
+        self._invalidate_fingerprints(job["action"])
+        self.coalescer.settle(job["action"], job["message"], job["status"] == "succeeded")
+        if job["status"] == "succeeded":
+            self.logger.info(f"Job {job['id']} succeeded: {job['message']}")
+        elif job["status"] == "cancelled":
+            self.logger.info(f"Job {job['id']} cancelled: {job['message']}")
+        else:
+            self.logger.error(f"Job {job['id']} failed: {job['message']}")
+
+    def show_jobs(self, limit: int = 20):
+        jobs = self.jobs.list_jobs(limit)
+        if not jobs:
+            print("No background jobs.")
+            return
+        print("\n--- Background Jobs ---")
+        for job in jobs:
+            action = job["action"]
+            target = action.get("path") or f"{action.get('source', '')} -> {action.get('dest', '')}"
+            print(f"{job['id']}  {job['status']:<11} {job['progress']:>6.0%}  "
+                  f"{job['agent']} {action.get('action')} {target}")
+            if job["message"]:
+                print(f"    {job['message']}")
+        print()
+
+    def show_logs(self, args: list[str]):
+        """Print the newest log lines ('show logs [N] [text]'), compressed archive included."""
+        from log_archive import tail
+        limit = int(args.pop(0)) if args and args[0].isdigit() else 50
+        archive_dir = (self.delegation.policies.get("logging") or {}).get("archive_dir", "logs_archive")
+        lines = tail(limit, archive_dir=archive_dir, contains=" ".join(args) or None)
+        if not lines:
+            print("No log lines found.")
+            return
+        print("\n--- Logs ---")
+        for line in lines:
+            print(line)
+        print()
+
+    def _estimate_bytes(self, agent, action) -> int:
+        """Bytes a delete/move will touch, for agents with a bytes/sec limit."""
+        if not self.scheduler.needs_bytes(agent) or action.get("action") not in ("delete", "move"):
+            return 0
+        fp = self.fingerprints.fingerprint(action.get("path") or action.get("source") or "")
+        return fp["size"] if fp else 0
+
+    def _invalidate_fingerprints(self, action):
+        """Drop cached content fingerprints for paths the Executor may have changed."""
+        for cp in action_paths(action):
+            self.fingerprints.invalidate(cp.norm)
+
+    def _build_result(self, agent, action, risk, decision, explanation, simulation_mode,
+                      exec_output="", job_id=None, served_by=None, diff=None):
         act_type = action.get("action", "")
         if act_type in ("delete", "create", "read"):
             path_str = action.get("path", "N/A")
@@ -141,13 +429,16 @@ class Supervisor:
             "explanation": explanation,
             "simulation":  simulation_mode,
             "exec_output": exec_output,
+            "job_id":      job_id,
+            "served_by":   served_by,
+            "diff":        diff,
         }
 
-    def _log_and_store(self, command, agent, action, risk, decision, reason):
-        self.logger.decision_log(agent, action, risk, decision, reason)
-        self._add_history(command, agent, action, risk, decision, reason)
+    def _log_and_store(self, command, agent, action, risk, decision, verdict, diff=None):
+        self.logger.decision_log(agent, action, risk, decision, verdict)
+        self._add_history(command, agent, action, risk, decision, verdict.reason, diff)
 
-    def _add_history(self, command, agent, action, risk, decision, reason):
+    def _add_history(self, command, agent, action, risk, decision, reason, diff=None):
         act_type = action.get("action", "unknown")
         if act_type in ("delete", "create", "read") and "path" in action:
             path = action["path"]
@@ -155,7 +446,7 @@ class Supervisor:
             path = f"{action['source']} -> {action['dest']}"
         else:
             path = action.get("path", "N/A")
-        self.history.add_entry(command, agent, act_type, path, risk, decision, reason)
+        self.history.add_entry(command, agent, act_type, path, risk, decision, reason, diff)
 
     def _print_decision_block(self, agent, action, risk, decision, explanation_lines):
         print("--- SECURITY DECISION ---")
@@ -179,3 +470,9 @@ class Supervisor:
         print(f"  Blocked     : {self.blocked_count}")
         print(f"  Warnings    : {self.warning_count}")
         print()
+
+
+def _describe(action: dict) -> str:
+    if action.get("action") == "move":
+        return f"move {action.get('source', '')} -> {action.get('dest', '')}"
+    return f"{action.get('action')} {action.get('path', '')}"
@@ -0,0 +1,265 @@
+"""
+Workspace Snapshot: Merkle-style snapshots of the paths an action touches, and
+O(changed) diffs between them for post-execution verification.
+
+A snapshot is a tree of Nodes that mirrors the filesystem under a root:
+- A file records its size and mtime. With content_hash it also records a
+  digest of its bytes.
+- A directory records its children.
+- Every node has a hash over those fields and its children's hashes. The hash
+  leaves out the node's own name, so a moved subtree keeps its hash.
+
+Taking a snapshot costs one lstat per node. Nodes are cached by (inode,
+mtime, size), so content is hashed only once per version of a file. A
+directory whose key is unchanged has the same entries, so it is not listed
+again: its cached children are re-checked and, if none changed, its stored
+node and subtree hash are reused. (Its mtime does not move when something
+deeper changes, so the children are still checked.)
+diff() descends only into subtrees whose hashes differ, and reports an added
+or removed directory as one change carrying its file count.
+
+verify_action() checks the post-execution state against what the action
+should have done:
+- delete leaves nothing at the path, or a directory with no files directly in it
+- create leaves a file
+- move leaves the source's exact tree at the destination, or inside it when
+  the destination was a directory
+- a failed execution changes nothing
+"""
+
+import hashlib
+import os
+import stat
+import threading
+from collections import OrderedDict, namedtuple
+
+from canonical_path import action_paths
+
+
+Change = namedtuple("Change", "change path kind files size_before size_after")   # change: + - ~
+
+
+def _digest(*parts) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8", "surrogateescape"))
+        h.update(b"\0")
+    return h.digest()
+
+
+class Node:
+    """One snapshotted path: kind, total size and file count, Merkle hash, children (directories)."""
+
+    __slots__ = ("kind", "size", "files", "hash", "children")
+
+    def __init__(self, kind: str, size: int, files: int, digest: bytes, children: dict | None = None):
+        self.kind = kind
+        self.size = size
+        self.files = files
+        self.hash = digest
+        self.children = children
+
+
+class WorkspaceSnapshotter:
+    def __init__(self, base_dir=None, content_hash=False, max_hash_bytes=1 << 20, max_entries=100_000):
+        self.base_dir = base_dir if base_dir else os.getcwd()
+        self.content_hash = content_hash
+        self.max_hash_bytes = max_hash_bytes
+        self.max_entries = max_entries
+        self._nodes = OrderedDict()     # abs path -> (stat key, Node), LRU
+        self._lock = threading.Lock()   # PlanScheduler threads snapshot concurrently
+
+    # ─────────────── Snapshots ───────────────
+
+    def snapshot(self, path: str) -> Node | None:
+        """Tree under path (relative to base_dir), or None if nothing is there. Symlinks are not followed."""
+        abs_path = os.path.normpath(os.path.join(self.base_dir, path))
+        try:
+            st = os.lstat(abs_path)
+        except OSError:
+            return None
+        return self._node(abs_path, st)
+
+    def capture(self, action: dict) -> dict:
+        """Snapshot of every path the action touches: {normalized path: Node or None}."""
+        return {cp.norm: self.snapshot(cp.norm) for cp in action_paths(action)}
+
+    def _node(self, abs_path: str, st: os.stat_result) -> Node:
+        key = (st.st_ino, st.st_mtime_ns, st.st_size, st.st_mode)
+        with self._lock:
+            cached = self._nodes.get(abs_path)
+            if cached and cached[0] == key:
+                self._nodes.move_to_end(abs_path)
+                cached = cached[1]
+            else:
+                cached = None
+        if stat.S_ISDIR(st.st_mode):
+            node = self._dir_node(abs_path, cached)
+            if node is cached:
+                return node
+        elif cached is not None:
+            return cached
+        elif stat.S_ISREG(st.st_mode):
+            node = Node("file", st.st_size, 1, self._file_digest(abs_path, st))
+        elif stat.S_ISLNK(st.st_mode):
+            try:
+                target = os.readlink(abs_path)
+            except OSError:
+                target = ""
+            node = Node("symlink", 0, 0, _digest("l", target))
+        else:
+            node = Node("other", 0, 0, _digest("o", stat.S_IFMT(st.st_mode)))
+        with self._lock:
+            self._nodes[abs_path] = (key, node)
+            while len(self._nodes) > self.max_entries:
+                self._nodes.popitem(last=False)
+        return node
+
+    def _file_digest(self, abs_path: str, st: os.stat_result) -> bytes:
+        if self.content_hash and st.st_size <= self.max_hash_bytes:
+            try:
+                with open(abs_path, 'rb') as f:
+                    return _digest("f", st.st_size, hashlib.blake2b(f.read(), digest_size=16).digest())
+            except OSError:
+                pass
+        return _digest("f", st.st_size, st.st_mtime_ns)
+
+    def _dir_node(self, abs_path: str, cached: Node | None) -> Node:
+        """Node for a directory; cached is its node from a snapshot with the same stat key, if any."""
+        if cached is not None:
+            children = self._known_children(abs_path, cached.children)
+            if children is not None:
+                if all(children[name] is child for name, child in cached.children.items()):
+                    return cached
+                return self._dir_from(children)
+        children = {}
+        try:
+            with os.scandir(abs_path) as entries:
+                for entry in entries:
+                    try:
+                        children[entry.name] = self._node(entry.path, entry.stat(follow_symlinks=False))
+                    except OSError:
+                        continue   # removed while scanning
+        except OSError:
+            pass
+        return self._dir_from(children)
+
+    def _known_children(self, abs_path: str, names) -> dict | None:
+        """Nodes for a directory's known entries, or None if one has gone (list it again)."""
+        children = {}
+        for name in names:
+            child_path = os.path.join(abs_path, name)
+            try:
+                children[name] = self._node(child_path, os.lstat(child_path))
+            except OSError:
+                return None
+        return children
+
+    @staticmethod
+    def _dir_from(children: dict) -> Node:
+        h = hashlib.blake2b(b"d", digest_size=16)
+        size = files = 0
+        for name in sorted(children):
+            child = children[name]
+            h.update(name.encode("utf-8", "surrogateescape") + b"\0" + child.hash)
+            size += child.size
+            files += child.files
+        return Node("dir", size, files, h.digest(), children)
+
+    # ─────────────── Verification ───────────────
+
+    def verify_action(self, action: dict, before: dict, success: bool, limit: int = 10) -> dict:
+        """
+        Snapshot the action's paths again, diff them against before (from capture())
+        and check the result is what the action should have produced. Returns a
+        compact summary for the history entry.
+        """
+        after = self.capture(action)
+        changes = []
+        for path in before:
+            changes += diff(before[path], after.get(path), path)
+        problem = expected_state(action, before, after, success)
+        return summarize(changes, problem, limit)
+
+
+def diff(before: Node | None, after: Node | None, path: str) -> list[Change]:
+    """Changes from before to after under path, skipping every subtree whose hash is unchanged."""
+    changes = []
+    _diff(before, after, path, changes)
+    return changes
+
+
+def _diff(before, after, path, out):
+    if before is None and after is None:
+        return
+    if before is not None and after is not None and before.hash == after.hash:
+        return
+    if before is None:
+        out.append(Change("+", path, after.kind, after.files, 0, after.size))
+    elif after is None:
+        out.append(Change("-", path, before.kind, before.files, before.size, 0))
+    elif before.kind == "dir" and after.kind == "dir":
+        for name in sorted(before.children.keys() | after.children.keys()):
+            _diff(before.children.get(name), after.children.get(name), f"{path}/{name}", out)
+    else:
+        out.append(Change("~", path, after.kind, after.files, before.size, after.size))
+
+
+def expected_state(action: dict, before: dict, after: dict, success: bool) -> str | None:
+    """Why the post-execution state is not what the action should leave, or None if it is."""
+    if not success:
+        if any(not _same(before[p], after.get(p)) for p in before):
+            return "workspace changed although the execution failed"
+        return None
+    action_type = action.get("action")
+    if action_type == "delete":
+        path = next(iter(before), None)
+        node = after.get(path)
+        if node is not None and node.kind != "dir":
+            return f"'{path}' still exists after delete"
+        if node is not None and any(c.kind == "file" for c in node.children.values()):
+            return f"'{path}' still holds files after delete"
+    elif action_type == "create":
+        path = next(iter(before), None)
+        node = after.get(path)
+        if path is not None and (node is None or node.kind != "file"):
+            return f"'{path}' is not a file after create"
+    elif action_type == "move":
+        source = os.path.normpath(action.get("source", ""))
+        dest = os.path.normpath(action.get("dest", ""))
+        moved, target = before.get(source), after.get(dest)
+        if after.get(source) is not None:
+            return f"source '{source}' still exists after move"
+        if before.get(dest) is not None and before[dest].kind == "dir":
+            target = target.children.get(os.path.basename(source)) if target and target.kind == "dir" else None
+        if moved is None or target is None or target.hash != moved.hash:
+            return f"'{dest}' does not hold the contents moved from '{source}'"
+    return None
+
+
+def _same(a: Node | None, b: Node | None) -> bool:
+    return (a is None and b is None) or (a is not None and b is not None and a.hash == b.hash)
+
+
+def summarize(changes: list[Change], problem: str | None, limit: int = 10) -> dict:
+    """History form of a verification: file counts, byte delta and the first changed paths."""
+    summary = {
+        "verified": problem is None,
+        "added":    sum(c.files for c in changes if c.change == "+"),
+        "removed":  sum(c.files for c in changes if c.change == "-"),
+        "modified": sum(1 for c in changes if c.change == "~"),
+        "bytes":    sum(c.size_after - c.size_before for c in changes),
+        "changes":  [f"{c.change}{c.path}" + ("/" if c.kind == "dir" else "") for c in changes[:limit]],
+    }
+    if len(changes) > limit:
+        summary["more"] = len(changes) - limit
+    if problem:
+        summary["problem"] = problem
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    """One line for consoles and show_history, e.g. '+1 -0 ~0 files, -12 B, verified'."""
+    state = "verified" if summary.get("verified") else f"VERIFICATION FAILED: {summary.get('problem')}"
+    return (f"+{summary.get('added', 0)} -{summary.get('removed', 0)} ~{summary.get('modified', 0)} files, "
+            f"{summary.get('bytes', 0):+d} B, {state}")